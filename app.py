@@ -18,13 +18,19 @@ for key, default in [("base_asset_code", ""),
                      ("price_interval_percent", 1),
                      ("stellar_key", ""),
                      ("balances", None),
+                     ("balances_fetched_at", 0),
                      ("min_price", 10000),
+                     ("max_price", 0),
+                     ("price_low", 0),
+                     ("price_high", 0),
+                     ("price_percentile", None),
                      ("mean_price", 0),
                      ("price_std_dev", 0),
                      ("current_price", 0),
-                     ("trade_list", []),
-                     ("new_trade_list", []),
+                     ("candles", None),
+                     ("market_data", None),
                      ("exchanges_list", []),
+                     ("trading_bot", None),
                      ("trade_df", pd.DataFrame()),
                      ("last_trade_time", datetime.now()),
                      ("last_update_time", datetime.now()),
@@ -36,6 +42,12 @@ for key, default in [("base_asset_code", ""),
 from app_data import *
 from app_draw import *
 from engine.trading_bot import TradingBot
+from engine.exchange_book import exchange_from_dict
+from engine.state_channel import get_state_subscriber, engine_topic
+from engine.engine_process import start_engine_process, stop_engine_process, read_engine_run_file, engine_process_failure
+from utils.stellar_api import fetch_account_balances
+from stellar_sdk import Keypair
+from utils.candles import CANDLE_RESOLUTIONS
 
 # Set page configuration
 st.set_page_config(page_title="Stellar Auto Trader", layout="wide")
@@ -65,6 +77,18 @@ with col1:
                                           disabled=st.session_state['algo_active'])
         counter_asset_balance_placeholder = st.empty()
 
+    # Chart type selection
+    col13, col14 = st.columns([1, 1])
+    with col13:
+        chart_type = st.radio("**Chart Type**", 
+                              ["Line Chart", "Candlestick Chart"], 
+                              horizontal=True)
+    with col14:
+        candle_resolution = st.selectbox("**Candle Interval**", 
+                                         list(CANDLE_RESOLUTIONS), 
+                                         index=1,
+                                         disabled=chart_type != "Candlestick Chart")
+
     chart_placeholder = st.empty()
 
     # _, col13, col14 = st.columns([2,2,2])
@@ -109,6 +133,19 @@ if stellar_key:
     #     st.session_state["num_trade_data"] = num_trade_data
     #     st.rerun()
 
+# "process": the bot trades in a separate engine process and the UI only shows its published state
+engine_mode = config.get('trading_engine', 'process')
+engine_topic_name = ""
+account_id = ""
+if stellar_key:
+    try:
+        account_id = Keypair.from_secret(stellar_key).public_key
+        engine_topic_name = engine_topic(account_id, base_asset_code, counter_asset_code)
+    except Exception as e:
+        st.sidebar.error(f"Invalid Stellar Key: {e}")
+if engine_mode == "process" and engine_topic_name and not st.session_state["algo_active"] and read_engine_run_file(engine_topic_name):
+    st.session_state["algo_active"] = True  # An engine started before the UI (re)started is still trading
+
 def apply_settings():
     st.session_state["stellar_key"] = stellar_key
     st.session_state["base_asset_code"] = base_asset_code
@@ -121,25 +158,39 @@ if stellar_key:
         if st.sidebar.button("Stop Bot Action", use_container_width=True):
             st.session_state["algo_active"] = False
             apply_settings()
+            if engine_mode == "process":
+                stop_engine_process(engine_topic_name)
             st.rerun()
     else:
         if st.sidebar.button("Start Bot Action", use_container_width=True):
             st.session_state["algo_active"] = True
             apply_settings()
+            if engine_mode == "process":
+                start_engine_process(base_asset_code=base_asset_code,
+                                     counter_asset_code=counter_asset_code,
+                                     stellar_key=stellar_key,
+                                     trading_capital_percent=trading_capital_percent,
+                                     price_interval_percent=price_interval_percent,
+                                     topic=engine_topic_name)
             st.rerun()
 
 
 # %% Initialize when start or rerun
-bot = TradingBot(base_asset_code=st.session_state['base_asset_code'],
-                 counter_asset_code=st.session_state['counter_asset_code'])
-if stellar_key:
-    bot.set_account(stellar_key=stellar_key,
-                    trading_capital_percent=st.session_state["trading_capital_percent"],
-                    price_interval_percent=st.session_state["price_interval_percent"])
+if st.session_state["trading_bot"]:
+    st.session_state["trading_bot"].stop()  # The bot of the previous run
+bot = None
+if engine_mode != "process":
+    bot = TradingBot(base_asset_code=st.session_state['base_asset_code'],
+                     counter_asset_code=st.session_state['counter_asset_code'])
+    if stellar_key:
+        bot.set_account(stellar_key=stellar_key,
+                        trading_capital_percent=st.session_state["trading_capital_percent"],
+                        price_interval_percent=st.session_state["price_interval_percent"])
+st.session_state["trading_bot"] = bot
 
 # %% Cotinuously updating
 while True:
-    if stellar_key and stellar_key != st.session_state["stellar_key"]:
+    if stellar_key and stellar_key != st.session_state["stellar_key"] and bot:
         st.session_state["stellar_key"] = stellar_key
         bot.set_account(stellar_key=stellar_key,
                         trading_capital_percent=st.session_state["trading_capital_percent"],
@@ -181,9 +232,29 @@ while True:
     update_trade_list()
     update_trade_df()
     with chart_placeholder.container():
-        draw_chart()
+        if chart_type == "Candlestick Chart":
+            draw_candle_chart(candle_resolution)
+        else:
+            draw_chart()
 
-    if stellar_key and st.session_state['algo_active']:
+    if stellar_key and engine_mode == "process":
+        engine_failure = engine_process_failure(engine_topic_name)
+        if engine_failure:
+            with trading_actions_placeholder.container():
+                st.error(engine_failure)
+        # Read-only view of what the engine process published last, on the port in its run file
+        engine_run = read_engine_run_file(engine_topic_name)
+        state = get_state_subscriber(host=engine_run['host'], port=engine_run['port']).latest(engine_topic_name) if engine_run else None
+        if not state and time.monotonic() - st.session_state["balances_fetched_at"] > 10:
+            # No engine publishing the balances (yet), fetched from Horizon every 10 seconds
+            st.session_state["balances_fetched_at"] = time.monotonic()
+            st.session_state['balances'] = fetch_account_balances(account_id)
+        if state:
+            st.session_state['exchanges_list'] = [exchange_from_dict(record) for record in state['exchanges']]
+            st.session_state['balances'] = state['balances']
+            with trading_actions_placeholder.container():
+                trading_actions_table()
+    elif stellar_key and st.session_state['algo_active']:
         bot.do_exchange(current_price=st.session_state["current_price"],
                         mean_price=st.session_state["mean_price"],
                         price_std_dev=st.session_state["price_std_dev"])
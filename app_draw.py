@@ -64,17 +64,18 @@ import plotly.graph_objects as go
 
 def draw_chart():
     if not st.session_state['trade_df'].empty:
-        # Extract timestamps and prices, and calculate range
+        # Extract timestamps and calculate range
         timestamps = st.session_state['trade_df']['timestamp']
-        prices = st.session_state['trade_df']['price']
         x_min = timestamps.min()
         x_max = timestamps.max()
         x_range = x_max - x_min
         extra_space = x_range / 4  # Calculate 1/4th of the x-axis range
 
-        # Calculate ymin and ymax
-        ymin = prices.min()
-        ymax = prices.max()
+        # Calculate ymin and ymax from the window's 1st and 99th price percentiles, so a stray
+        # outlier trade does not flatten the chart, keeping the current price in view
+        current_price = st.session_state["current_price"]
+        ymin = min(st.session_state["price_low"] or st.session_state["min_price"], current_price)
+        ymax = max(st.session_state["price_high"] or st.session_state["max_price"], current_price)
         
         # Calculate padding (1/8th of the y-axis range)
         y_range = ymax - ymin
@@ -146,6 +147,17 @@ def draw_chart():
             textfont=dict(size=12, color='green')
         ))
         
+        # Percentile of the current price within the trade window
+        if st.session_state["price_percentile"] is not None:
+            fig_line.add_trace(go.Scatter(
+                x=[x_max],
+                y=[current_price],
+                mode='text',
+                text=[f"Percentile: {st.session_state['price_percentile']:.1f}%"],
+                textposition='top right',
+                textfont=dict(size=12, color='blue')
+            ))
+
         # Add horizontal dotted line at the upper and lower std_dev prices
         upper_std_dev_price = st.session_state["mean_price"] + st.session_state["price_std_dev"]
         lower_std_dev_price = st.session_state["mean_price"] - st.session_state["price_std_dev"]
@@ -378,3 +390,63 @@ def draw_chart():
         fig_line.update_layout(**chart_layout_adjustments)
         st.plotly_chart(fig_line, use_container_width=True)
 
+
+
+def draw_candle_chart(resolution: str = "5m"):
+    candles = st.session_state['candles']
+    candle_df = candles.get_candles(resolution) if candles else pd.DataFrame()
+
+    # Define chart layout adjustments
+    chart_layout_adjustments = {
+        "margin": dict(l=20, r=20, t=20, b=20),
+        "xaxis": {
+            "title": "Time (UTC-0)",
+            "automargin": True,
+            "rangeslider": {"visible": False}
+        },
+        "yaxis": {
+            "title": f"{st.session_state['base_asset_code']}/{st.session_state['counter_asset_code']}",
+            "automargin": True,
+        },
+        "yaxis2": {
+            "title": "Volume",
+            "overlaying": "y",
+            "side": "right"
+        },
+        "height": 500,
+        "showlegend": False
+    }
+
+    fig_candle = go.Figure()
+    if not candle_df.empty:
+        # Add OHLC candle trace
+        fig_candle.add_trace(go.Candlestick(
+            x=candle_df['timestamp'],
+            open=candle_df['open'],
+            high=candle_df['high'],
+            low=candle_df['low'],
+            close=candle_df['close'],
+            name='Price'
+        ))
+
+        # Add volume bar trace
+        fig_candle.add_trace(go.Bar(
+            x=candle_df['timestamp'],
+            y=candle_df['volume'],
+            name='Volume',
+            yaxis='y2',
+            opacity=0.3
+        ))
+
+        # Add horizontal dotted line at the current price
+        current_price = st.session_state["current_price"]
+        fig_candle.add_trace(go.Scatter(
+            x=[candle_df['timestamp'].iloc[0], candle_df['timestamp'].iloc[-1]],
+            y=[current_price, current_price],
+            mode='lines',
+            line=dict(width=1, dash='dot', color='blue'),
+            name='Current Price'
+        ))
+
+    fig_candle.update_layout(**chart_layout_adjustments)
+    st.plotly_chart(fig_candle, use_container_width=True)
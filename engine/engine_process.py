@@ -0,0 +1,207 @@
+"""
+Headless trading engine.
+
+Runs trading bots in their own process, apart from the Streamlit UI, and publishes their state
+(prices, stats, balances and exchanges) through a StatePublisher. Start one bot with the
+account's secret key in the STELLAR_SECRET_KEY environment variable:
+
+    STELLAR_SECRET_KEY=S... python -m engine.engine_process --base VELO --counter XLM
+
+or, without --base, every bot listed under engine_bots in config/config.yaml.
+
+An engine started from the UI publishes on a port of its own and records its pid and port
+in a run file under data/engines, where the UI finds it.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import logging
+
+from engine.scheduler import EngineScheduler
+from engine.state_channel import StatePublisher, ENGINE_HOST, ENGINE_PORT
+from utils.stellar_api import load_config
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SECRET_KEY_ENV = "STELLAR_SECRET_KEY"
+ENGINE_RUN_DIR = "data/engines"
+
+_engine_processes: dict[str, subprocess.Popen] = {}  # topic -> engine process started by this process
+
+
+def engine_run_path(topic: str, extension: str = "json") -> str:
+    """Path of the run file (or, with extension "log", the log) of the engine trading a topic."""
+    return os.path.join(ENGINE_RUN_DIR, f"{topic.replace(':', '_').replace('/', '_')}.{extension}")
+
+
+def write_engine_run_file(run_path: str, host: str, port: int):
+    """Record the running engine's pid and address, through a temporary file and an atomic rename."""
+    os.makedirs(os.path.dirname(run_path), exist_ok=True)
+    with open(run_path + ".tmp", "w") as run_file:
+        json.dump({'pid': os.getpid(), 'host': host, 'port': port}, run_file)
+    os.replace(run_path + ".tmp", run_path)
+
+
+def read_engine_run_file(topic: str) -> dict | None:
+    """
+    Returns:
+    - {pid, host, port} of the running engine trading a topic, or None if none is running
+    """
+    try:
+        with open(engine_run_path(topic)) as run_file:
+            engine_run = json.load(run_file)
+        os.kill(engine_run['pid'], 0)  # Raises if the process is gone
+        return engine_run
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def start_engine_process(base_asset_code: str,
+                         counter_asset_code: str,
+                         stellar_key: str,
+                         trading_capital_percent: float,
+                         price_interval_percent: float,
+                         topic: str) -> subprocess.Popen | None:
+    """
+    Start the engine for a bot in a separate process, unless one already trades the topic.
+    Each engine publishes on a free port of its own, so engines of several pairs and accounts
+    run side by side. The secret key is handed over in the environment, not on the command line,
+    and the engine's output goes to its log file.
+
+    Returns:
+    - The engine process, or None if an engine this process did not start already trades the topic
+    """
+    process = _engine_processes.get(topic)
+    if process is not None and process.poll() is None:
+        return process
+    if read_engine_run_file(topic):
+        return None
+    os.makedirs(ENGINE_RUN_DIR, exist_ok=True)
+    with open(engine_run_path(topic, "log"), "ab") as log_file:
+        process = subprocess.Popen([sys.executable, "-m", "engine.engine_process",
+                                    "--base", base_asset_code,
+                                    "--counter", counter_asset_code,
+                                    "--capital-percent", str(trading_capital_percent),
+                                    "--interval-percent", str(price_interval_percent),
+                                    "--port", "0",
+                                    "--run-file", engine_run_path(topic)],
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   env={**os.environ, SECRET_KEY_ENV: stellar_key},
+                                   stdout=log_file,
+                                   stderr=subprocess.STDOUT,
+                                   start_new_session=True)  # Keeps trading when the UI goes away
+    _engine_processes[topic] = process
+    logging.info(f"Started engine process {process.pid} for {topic}")
+    return process
+
+
+def engine_process_failure(topic: str, num_lines: int = 5) -> str | None:
+    """
+    Returns:
+    - Exit code and last log lines of the engine this process started for a topic, if it exited, else None
+    """
+    process = _engine_processes.get(topic)
+    if process is None or process.poll() is None:
+        return None
+    try:
+        with open(engine_run_path(topic, "log"), errors="replace") as log_file:
+            log_tail = "".join(log_file.readlines()[-num_lines:])
+    except OSError:
+        log_tail = ""
+    return f"Engine process for {topic} exited with code {process.returncode}.\n{log_tail}"
+
+
+def stop_engine_process(topic: str, timeout: float = 10.0):
+    """
+    Stop the engine trading a topic, whether this process started it or it is found through its
+    run file (e.g. started before the UI restarted).
+    """
+    process = _engine_processes.pop(topic, None)
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        logging.info(f"Stopped engine process {process.pid} for {topic}")
+        return
+
+    engine_run = read_engine_run_file(topic)
+    if engine_run is None:
+        return
+    pid = engine_run['pid']
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            break  # Gone
+        time.sleep(0.1)
+    else:
+        os.kill(pid, signal.SIGKILL)
+    logging.info(f"Stopped engine process {pid} for {topic}")
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Run the trading bot as a headless engine process.")
+    parser.add_argument("--base", help="Base asset code, e.g. VELO (default: the engine_bots of the config)")
+    parser.add_argument("--counter", default="XLM", help="Counter asset code")
+    parser.add_argument("--capital-percent", type=float, default=1, help="Trading capital percent of the counter asset balance")
+    parser.add_argument("--interval-percent", type=float, default=1, help="Price interval percent")
+    parser.add_argument("--host", default=config.get('engine_host', ENGINE_HOST), help="Address the state is published on")
+    parser.add_argument("--port", type=int, default=config.get('engine_port', ENGINE_PORT), help="Port the state is published on, 0 for any free port")
+    parser.add_argument("--run-file", help="File to record the engine's pid and port in while it runs")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between two ticks")
+    parser.add_argument("--workers", type=int, default=config.get('engine_workers', 16), help="Number of bots ticking at the same time at most")
+    args = parser.parse_args()
+
+    if args.base:
+        bot_configs = [{'base': args.base,
+                        'counter': args.counter,
+                        'secret_env': SECRET_KEY_ENV,
+                        'capital_percent': args.capital_percent,
+                        'interval_percent': args.interval_percent}]
+    else:
+        bot_configs = config.get('engine_bots') or []
+    if not bot_configs:
+        parser.error("Give a pair with --base or list the bots under engine_bots in the config.")
+    for bot_config in bot_configs:
+        if not os.environ.get(bot_config.get('secret_env', SECRET_KEY_ENV)):
+            parser.error(f"Set the account's secret key in the {bot_config.get('secret_env', SECRET_KEY_ENV)} environment variable.")
+
+    stop_event = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: stop_event.set())
+
+    publisher = StatePublisher(host=args.host, port=args.port)
+    publisher.start()
+    if args.run_file:
+        write_engine_run_file(args.run_file, publisher.host, publisher.port)
+    scheduler = EngineScheduler(publisher=publisher,
+                                tick_interval=args.tick,
+                                max_workers=args.workers)
+    try:
+        for bot_config in bot_configs:
+            scheduler.add_bot(base_asset_code=bot_config['base'],
+                              counter_asset_code=bot_config.get('counter', 'XLM'),
+                              stellar_key=os.environ[bot_config.get('secret_env', SECRET_KEY_ENV)],
+                              trading_capital_percent=bot_config.get('capital_percent', 1),
+                              price_interval_percent=bot_config.get('interval_percent', 1))
+        scheduler.run(stop_event)
+    finally:
+        scheduler.stop()
+        publisher.stop()
+        if args.run_file and os.path.exists(args.run_file):
+            os.remove(args.run_file)
+
+
+if __name__ == "__main__":
+    main()
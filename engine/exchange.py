@@ -1,4 +1,9 @@
+import uuid
+
+
 class Order:
+    __slots__ = ('order_type', 'base_amount', 'offer_id', 'history', 'fills', 'filled_amount', 'filled_counter_amount', '_fill_trade_ids')
+
     def __init__(self,
                 #  base_asset_code: str, 
                 #  counter_asset_code: str, 
@@ -14,6 +19,47 @@ class Order:
 
         self.history: list[dict] = []
 
+        # Fills of the order's offer, as they happened on the network
+        self.fills: list[dict] = []
+        self.filled_amount: float = 0.0
+        self.filled_counter_amount: float = 0.0
+        self._fill_trade_ids: set[str] = set()
+
+    @property
+    def average_fill_price(self) -> float | None:
+        if self.filled_amount <= 0:
+            return None
+        return self.filled_counter_amount / self.filled_amount
+
+    @property
+    def is_filled(self) -> bool:
+        """True once the filled amount covers the order (up to the 7-decimal amount precision)."""
+        return self.filled_amount >= self.base_amount - 1e-7
+
+    def fill_append(self,
+                    trade_id: str,
+                    ledger_num: int,
+                    timestamp: str,
+                    base_amount: float,
+                    price: float) -> bool:
+        """
+        Record a fill of the order, once per trade.
+
+        Returns:
+        - True if the fill was new
+        """
+        if trade_id in self._fill_trade_ids:
+            return False
+        self._fill_trade_ids.add(trade_id)
+        self.fills.append({'trade_id': trade_id,
+                           'ledger_num': ledger_num,
+                           'timestamp': timestamp,
+                           'base_amount': base_amount,
+                           'price': price})
+        self.filled_amount += base_amount
+        self.filled_counter_amount += base_amount * price
+        return True
+
     def history_append(self, 
                        ledger_num: int, 
                        timestamp: str, 
@@ -25,6 +71,8 @@ class Order:
                              'status': status})
 
 class Exchange:
+    __slots__ = ('exchange_id', 'base_amount', 'buy_order', 'sell_order', 'status')
+
     def __init__(self, 
                 #  base_asset_code: str, 
                 #  counter_asset_code: str, 
@@ -33,6 +81,7 @@ class Exchange:
                  sell_offer_id: str='') -> None:
         # self.base_asset_code = base_asset_code
         # self.counter_asset_code = counter_asset_code
+        self.exchange_id = uuid.uuid4().hex
         self.base_amount = base_amount
 
         self.buy_order = Order(order_type='buy',
@@ -43,6 +92,19 @@ class Exchange:
                                 base_amount=base_amount,
                                 offer_id=sell_offer_id)
         self.status: str = ''
+
+    @property
+    def state(self) -> str:
+        """
+        Where the exchange stands: 'new' (nothing placed yet), 'open_buy', 'bought' (the sell
+        order still has to be placed), 'open_sell' or 'done'.
+        """
+        if self.status == 'buy' and self.buy_order.history:
+            return 'open_buy' if self.buy_order.history[-1]['status'] == 'open' else 'bought'
+        if self.status == 'sell' and self.sell_order.history:
+            return 'open_sell' if self.sell_order.history[-1]['status'] == 'open' else 'done'
+        return 'new'
+
     def history_append(self, 
                        order_type: str, 
                        ledger_num: int,
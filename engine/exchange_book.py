@@ -0,0 +1,170 @@
+import json
+import os
+import logging
+from collections import OrderedDict, deque
+
+from engine.exchange import Exchange
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EXCHANGE_ARCHIVE_PATH = "data/exchange_archive.jsonl"
+LIVE_STATES = ('open_buy', 'bought', 'open_sell')
+
+
+def exchange_to_dict(exchange: Exchange) -> dict:
+    """Plain dictionary of an exchange and its orders (for the archive and the journal)."""
+    return {'exchange_id': exchange.exchange_id,
+            'base_amount': exchange.base_amount,
+            'status': exchange.status,
+            'orders': {order.order_type: {'offer_id': order.offer_id,
+                                          'base_amount': order.base_amount,
+                                          'history': order.history,
+                                          'fills': order.fills,
+                                          'filled_amount': order.filled_amount,
+                                          'filled_counter_amount': order.filled_counter_amount}
+                       for order in (exchange.buy_order, exchange.sell_order)}}
+
+
+def exchange_from_dict(record: dict) -> Exchange:
+    """Rebuild an exchange from exchange_to_dict() output."""
+    exchange = Exchange(base_amount=record['base_amount'])
+    exchange.exchange_id = record['exchange_id']
+    exchange.status = record['status']
+    for order_type, order_record in record['orders'].items():
+        order = exchange.buy_order if order_type == 'buy' else exchange.sell_order
+        order.offer_id = order_record['offer_id']
+        order.base_amount = order_record['base_amount']
+        order.history = order_record['history']
+        order.fills = order_record['fills']
+        order.filled_amount = order_record['filled_amount']
+        order.filled_counter_amount = order_record['filled_counter_amount']
+        order._fill_trade_ids = {fill['trade_id'] for fill in order.fills}
+    return exchange
+
+
+class ExchangeBook:
+    """
+    The bot's exchanges, indexed by state and by open offer id.
+
+    Per-tick work only touches the live exchanges (open buy, bought, open sell). Completed
+    exchanges are written to an append-only JSON lines archive and only the most recent ones
+    stay in memory for display; order histories beyond max_history entries are archived
+    the same way. Memory therefore stays bounded however long the bot runs.
+
+    With a journal, every change of an exchange is also recorded there, so the book can be
+    rebuilt after a restart.
+    """
+    def __init__(self,
+                 archive_path: str | None = EXCHANGE_ARCHIVE_PATH,
+                 max_done: int = 100,
+                 max_history: int = 20,
+                 journal=None):
+        """
+        Parameters:
+        - archive_path: JSON lines file completed exchanges and old history go to, None to drop them
+        - max_done: Number of completed exchanges kept in memory
+        - max_history: Number of history entries kept in memory per order
+        - journal: StateJournal recording every change, or None
+        """
+        self.archive_path = archive_path
+        self.journal = journal
+        self.max_history = max_history
+        self._states: dict[str, OrderedDict[str, Exchange]] = {state: OrderedDict() for state in LIVE_STATES}
+        self._state_of: dict[str, str] = {}  # exchange_id -> state
+        self._offer_ids: dict[str, tuple[Exchange, str]] = {}  # open offer id -> (exchange, 'buy'/'sell')
+        self._offer_ids_of: dict[str, list[str]] = {}  # exchange_id -> its open offer ids
+        self.done: deque[Exchange] = deque(maxlen=max_done)
+
+    def __len__(self) -> int:
+        return len(self._state_of)
+
+    def __iter__(self):
+        """Iterate over the live exchanges, then the recently completed ones."""
+        yield from self.live()
+        yield from self.done
+
+    def __contains__(self, exchange: Exchange) -> bool:
+        return exchange.exchange_id in self._state_of
+
+    def live(self) -> list[Exchange]:
+        return [exchange for state in LIVE_STATES for exchange in self._states[state].values()]
+
+    def in_state(self, state: str) -> list[Exchange]:
+        return list(self._states[state].values())
+
+    def find_open_order(self, offer_id: str) -> tuple[Exchange, str] | None:
+        """
+        Returns:
+        - Tuple of (exchange, 'buy' or 'sell') of the open order with the given offer id, or None
+        """
+        return self._offer_ids.get(offer_id)
+
+    def add(self, exchange: Exchange):
+        self.update(exchange)
+
+    def remove(self, exchange: Exchange):
+        """Drop a live exchange without archiving it (e.g. a cancelled buy that never filled)."""
+        self._unindex(exchange)
+        if self.journal:
+            self.journal.record_removed(exchange.exchange_id)
+
+    def _unindex(self, exchange: Exchange):
+        state = self._state_of.pop(exchange.exchange_id, None)
+        if state:
+            self._states[state].pop(exchange.exchange_id, None)
+        for offer_id in self._offer_ids_of.pop(exchange.exchange_id, []):
+            self._offer_ids.pop(offer_id, None)
+
+    def update(self, exchange: Exchange, journal: bool = True):
+        """
+        Re-index an exchange after its state or offers changed; completed exchanges are archived.
+
+        Parameters:
+        - exchange: The changed exchange
+        - journal: False when the change is being restored from the journal itself
+        """
+        self._unindex(exchange)
+        state = exchange.state
+        if state == 'done':
+            self._archive({'type': 'exchange', **exchange_to_dict(exchange)})
+            self.done.append(exchange)
+            if self.journal and journal:
+                self.journal.record_removed(exchange.exchange_id)
+            return
+        if state not in LIVE_STATES:
+            return
+
+        self._compact(exchange)
+        if self.journal and journal:
+            self.journal.record_exchange(exchange_to_dict(exchange))
+        self._states[state][exchange.exchange_id] = exchange
+        self._state_of[exchange.exchange_id] = state
+        offer_ids = []
+        for order_type, order in (('buy', exchange.buy_order), ('sell', exchange.sell_order)):
+            if order.offer_id and order.history and order.history[-1]['status'] == 'open':
+                self._offer_ids[order.offer_id] = (exchange, order_type)
+                offer_ids.append(order.offer_id)
+        self._offer_ids_of[exchange.exchange_id] = offer_ids
+
+    def _compact(self, exchange: Exchange):
+        """Move the oldest history entries of the exchange's orders beyond max_history to the archive."""
+        for order in (exchange.buy_order, exchange.sell_order):
+            num_old = len(order.history) - self.max_history
+            if num_old > 0:
+                self._archive({'type': 'history',
+                               'exchange_id': exchange.exchange_id,
+                               'order_type': order.order_type,
+                               'history': order.history[:num_old]})
+                del order.history[:num_old]
+
+    def _archive(self, record: dict):
+        if not self.archive_path:
+            return
+        try:
+            if os.path.dirname(self.archive_path):
+                os.makedirs(os.path.dirname(self.archive_path), exist_ok=True)
+            with open(self.archive_path, 'a') as archive_file:
+                archive_file.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logging.error(f"Error writing to the exchange archive: {e}")
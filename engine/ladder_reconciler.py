@@ -0,0 +1,101 @@
+import math
+
+
+class LadderReconciler:
+    """
+    Keeps a ladder of limit buy offers below the current price with as few operations as possible.
+
+    The target ladder sits on a fixed price grid of one step per level, so a price move of one
+    step changes one level rather than all of them. It is diffed against the offers that are
+    actually on the book: offers within a fraction of a step of a target level are kept, the
+    remaining offers are moved onto the remaining levels, and only what is left over is
+    deleted or created.
+    """
+    def __init__(self,
+                 num_levels: int = 5,
+                 price_tolerance: float = 0.5,
+                 amount_tolerance: float = 0.05):
+        """
+        Parameters:
+        - num_levels: Number of buy offers in the ladder
+        - price_tolerance: Largest price distance, in steps, at which an offer still counts as on its level
+        - amount_tolerance: Largest relative amount difference at which an offer is left unchanged
+        """
+        self.num_levels = num_levels
+        self.price_tolerance = price_tolerance
+        self.amount_tolerance = amount_tolerance
+
+    def target_ladder(self,
+                      current_price: float,
+                      step: float,
+                      counter_amount: float) -> list[dict]:
+        """
+        Compute the target buy levels.
+
+        Parameters:
+        - current_price: Current market price
+        - step: Price distance between two levels
+        - counter_amount: Counter asset amount to spend on each level
+
+        Returns:
+        - List of {price, base_amount} dictionaries, highest price first
+        """
+        if step <= 0 or current_price <= 0:
+            return []
+        top_level = math.ceil(current_price / step) - 1  # Highest grid level strictly below the price
+        ladder = []
+        for level in range(top_level, top_level - self.num_levels, -1):
+            price = round(level * step, 7)
+            if price <= 0:
+                break
+            ladder.append({'price': price, 'base_amount': counter_amount / price})
+        return ladder
+
+    def diff(self,
+             ladder: list[dict],
+             offers: dict[str, dict],
+             step: float) -> list[dict]:
+        """
+        Compute the operations that turn the current buy offers into the target ladder.
+
+        Parameters:
+        - ladder: Target levels from target_ladder()
+        - offers: Current buy offers as {offer_id: {price, base_amount}}
+        - step: Price distance between two levels
+
+        Returns:
+        - List of {action, offer_id, price, base_amount} dictionaries, action being 'create',
+          'modify' or 'delete' (offer_id is None for creates)
+        """
+        targets = sorted(ladder, key=lambda level: level['price'], reverse=True)
+        current = sorted(offers.items(), key=lambda item: item[1]['price'], reverse=True)
+
+        # Pair offers already on a target level (both lists are sorted, so one merge pass does it)
+        actions = []
+        unmatched_targets, unmatched_offers = [], []
+        target_index, offer_index = 0, 0
+        while target_index < len(targets) and offer_index < len(current):
+            target = targets[target_index]
+            offer_id, offer = current[offer_index]
+            if abs(offer['price'] - target['price']) <= self.price_tolerance * step:
+                if abs(offer['base_amount'] - target['base_amount']) > self.amount_tolerance * target['base_amount']:
+                    actions.append({'action': 'modify', 'offer_id': offer_id, **target})
+                target_index += 1
+                offer_index += 1
+            elif offer['price'] > target['price']:
+                unmatched_offers.append(offer_id)
+                offer_index += 1
+            else:
+                unmatched_targets.append(target)
+                target_index += 1
+        unmatched_targets.extend(targets[target_index:])
+        unmatched_offers.extend(offer_id for offer_id, _ in current[offer_index:])
+
+        # Move the leftover offers onto the leftover levels, then delete or create the rest
+        for offer_id, target in zip(unmatched_offers, unmatched_targets):
+            actions.append({'action': 'modify', 'offer_id': offer_id, **target})
+        for offer_id in unmatched_offers[len(unmatched_targets):]:
+            actions.append({'action': 'delete', 'offer_id': offer_id, 'price': offers[offer_id]['price'], 'base_amount': 0.0})
+        for target in unmatched_targets[len(unmatched_offers):]:
+            actions.append({'action': 'create', 'offer_id': None, **target})
+        return actions
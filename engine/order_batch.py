@@ -0,0 +1,37 @@
+from typing import Callable
+
+# Protocol limit on the number of operations in one transaction
+MAX_OPERATIONS_PER_TRANSACTION = 100
+
+
+class OrderBatch:
+    """
+    Offer operations decided during a tick, to be submitted together at the end of it.
+
+    Every operation comes with a callback, which is called with the submit response and the
+    operation's own decoded offer result once its transaction is through (or with None for
+    both if the transaction failed).
+    """
+    def __init__(self, max_operations: int = MAX_OPERATIONS_PER_TRANSACTION):
+        self.max_operations = max_operations
+        self.operations: list = []
+        self.callbacks: list[Callable[[dict | None, dict | None], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def add(self, operation, on_result: Callable[[dict | None, dict | None], None]):
+        self.operations.append(operation)
+        self.callbacks.append(on_result)
+
+    def take(self) -> list[tuple[list, list]]:
+        """
+        Empty the batch.
+
+        Returns:
+        - List of (operations, callbacks) chunks, each small enough for one transaction
+        """
+        chunks = [(self.operations[start:start + self.max_operations], self.callbacks[start:start + self.max_operations])
+                  for start in range(0, len(self.operations), self.max_operations)]
+        self.operations, self.callbacks = [], []
+        return chunks
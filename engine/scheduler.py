@@ -0,0 +1,176 @@
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from engine.exchange_book import exchange_to_dict
+from engine.state_channel import StatePublisher, engine_topic
+from engine.trading_bot import TradingBot
+from utils.market_data import MarketData
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def bot_state(bot: TradingBot, stats: dict, tick_seconds: float | None = None) -> dict:
+    """
+    Returns:
+    - Dictionary of a bot's market stats, balances and exchanges, as published to the UI
+    """
+    return {'account_id': bot.account_id,
+            'base_asset_code': bot.base_asset_code,
+            'counter_asset_code': bot.counter_asset_code,
+            'stats': stats,
+            'balances': bot.balances if isinstance(bot.balances, list) else [],
+            'exchanges': [exchange_to_dict(exchange) for exchange in bot.exchanges],
+            'tick_seconds': tick_seconds,
+            'published_at': time.time()}
+
+
+class EngineScheduler:
+    """
+    Runs many trading bots (pairs x accounts) side by side in one engine process.
+
+    Market data is kept once per pair, however many bots trade it. Each tick, every pair's
+    market data is updated and every bot ticks on a thread pool; the bots trade on the prices
+    of their pair's latest completed update. A pair update or bot tick still running from an
+    earlier round (e.g. waiting on a slow Horizon request) is skipped for the round instead of
+    queuing up, so one slow pair or bot never holds up the others. All bots share the process-wide Horizon connection pool, and the bots of
+    one account submit through its one submission pipeline.
+    """
+    def __init__(self,
+                 publisher: StatePublisher | None = None,
+                 tick_interval: float = 1.0,
+                 max_workers: int = 16):
+        """
+        Parameters:
+        - publisher: Started StatePublisher the bots' states are published on, or None
+        - tick_interval: Seconds between the starts of two ticks
+        - max_workers: Number of bots ticking at the same time at most
+        """
+        self.publisher = publisher
+        self.tick_interval = tick_interval
+        self.bots: dict[str, TradingBot] = {}  # topic -> bot
+        self.market_data: dict[tuple[str, str], MarketData] = {}  # (base, counter) -> shared market data
+        self._ticks: dict[str, Future] = {}  # topic -> running tick of the bot
+        self._updates: dict[tuple[str, str], Future] = {}  # (base, counter) -> running update of the pair's market data
+        self._prices: dict[tuple[str, str], tuple] = {}  # (base, counter) -> (current, mean, std dev, stats) of the latest update
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BotTick")
+
+    def add_bot(self,
+                base_asset_code: str,
+                counter_asset_code: str,
+                stellar_key: str,
+                trading_capital_percent: float,
+                price_interval_percent: float) -> str:
+        """
+        Set up a bot for a pair and an account, along with the pair's market data if it is new.
+
+        Returns:
+        - Topic the bot's state is published under
+        """
+        pair = (base_asset_code, counter_asset_code)
+        if pair not in self.market_data:
+            market_data = MarketData(base_asset_code=base_asset_code,
+                                     counter_asset_code=counter_asset_code)
+            market_data.init()
+            self.market_data[pair] = market_data
+
+        bot = TradingBot(base_asset_code=base_asset_code,
+                         counter_asset_code=counter_asset_code)
+        bot.set_account(stellar_key=stellar_key,
+                        trading_capital_percent=trading_capital_percent,
+                        price_interval_percent=price_interval_percent)
+        topic = engine_topic(bot.account_id, base_asset_code, counter_asset_code)
+        if topic in self.bots:
+            bot.stop()
+            raise ValueError(f"A bot already trades {topic}")
+        self.bots[topic] = bot
+        logging.info(f"Scheduler trading {topic}")
+        return topic
+
+    def remove_bot(self, topic: str):
+        """Stop a bot, and the market data of its pair once no other bot trades it."""
+        bot = self.bots.pop(topic)
+        self._ticks.pop(topic, None)
+        bot.stop()
+        pair = (bot.base_asset_code, bot.counter_asset_code)
+        if all((other.base_asset_code, other.counter_asset_code) != pair for other in self.bots.values()):
+            self.market_data.pop(pair).stop()
+            self._updates.pop(pair, None)
+            self._prices.pop(pair, None)
+
+    def tick(self) -> int:
+        """
+        Start an update of every pair's market data and a tick of every bot that is not still busy.
+
+        Returns:
+        - Number of bots skipped because their previous tick is still running
+        """
+        for pair, market_data in self.market_data.items():
+            running_update = self._updates.get(pair)
+            if running_update is not None and not running_update.done():
+                logging.info(f"Market data of {market_data.name} still updating, skipped this round.")
+                continue
+            self._updates[pair] = self._executor.submit(self._update_market_data, pair, market_data)
+
+        num_skipped = 0
+        for topic, bot in self.bots.items():
+            running_tick = self._ticks.get(topic)
+            if running_tick is not None and not running_tick.done():
+                num_skipped += 1
+                continue
+            prices = self._prices.get((bot.base_asset_code, bot.counter_asset_code))
+            if prices is None:
+                continue  # No prices yet; the market data retries its initial fetch on update()
+            self._ticks[topic] = self._executor.submit(self._tick_bot, topic, bot, *prices)
+        if num_skipped:
+            logging.info(f"{num_skipped} bots still busy with their previous tick, skipped this round.")
+        return num_skipped
+
+    def _update_market_data(self, pair: tuple[str, str], market_data: MarketData):
+        try:
+            market_data.update()
+        except Exception as e:
+            logging.error(f"Error updating market data of {market_data.name}: {e}")
+        if market_data.ready:
+            # Replaced as a whole, so bots always read the prices of one update
+            self._prices[pair] = (market_data.current_price,
+                                  market_data.mean_price,
+                                  market_data.price_std_dev,
+                                  market_data.stats())
+
+    def _tick_bot(self,
+                  topic: str,
+                  bot: TradingBot,
+                  current_price: float,
+                  mean_price: float,
+                  price_std_dev: float,
+                  stats: dict):
+        tick_start = time.monotonic()
+        try:
+            bot.do_exchange(current_price=current_price,
+                            mean_price=mean_price,
+                            price_std_dev=price_std_dev)
+        except Exception as e:
+            logging.error(f"Error in the tick of {topic}: {e}")
+        tick_seconds = time.monotonic() - tick_start
+        if self.publisher:
+            self.publisher.publish(topic, bot_state(bot, stats, tick_seconds))
+
+    def run(self, stop_event: threading.Event):
+        """Tick until stop_event is set, then stop every bot."""
+        try:
+            while not stop_event.is_set():
+                tick_start = time.monotonic()
+                self.tick()
+                stop_event.wait(max(0.0, self.tick_interval - (time.monotonic() - tick_start)))
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Wait for the running ticks and stop every bot and market data feed."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for topic in list(self.bots):
+            self.remove_bot(topic)
+        logging.info("Scheduler stopped.")
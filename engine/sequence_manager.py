@@ -0,0 +1,98 @@
+import threading
+import logging
+
+from stellar_sdk import Account, Server
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Transaction result codes after which the sequence number was consumed (the transaction made it into a ledger)
+CONSUMED_RESULT_CODES = ('tx_success', 'tx_failed')
+
+_sequence_managers: dict[str, "SequenceManager"] = {}
+_sequence_managers_lock = threading.Lock()
+
+
+class SequenceManager:
+    """
+    Hands out the account's sequence numbers locally, so submitting a transaction needs no
+    load_account request first.
+
+    The sequence number is loaded from Horizon once at startup and again only after a
+    tx_bad_seq rejection, by the account's submission pipeline once none of the handed out
+    sequence numbers is outstanding. A rejected transaction that never reached a ledger gives
+    its sequence number back, as long as no later one has been handed out.
+    """
+    def __init__(self, server: Server, account_id: str):
+        self.server = server
+        self.account_id = account_id
+        self._lock = threading.Lock()
+        self.needs_sync = False  # Set by a tx_bad_seq rejection
+        self.sync()
+
+    def sync(self):
+        """Reload the account's current sequence number from Horizon."""
+        account = self.server.load_account(self.account_id)
+        with self._lock:
+            self.account = account
+            self.next_sequence = account.sequence + 1
+            self.confirmed_sequence = account.sequence
+            self.needs_sync = False
+        logging.info(f"Synced sequence number of {self.account_id}: {account.sequence}")
+
+    def reserve(self) -> Account:
+        """
+        Reserve the next sequence number.
+
+        Returns:
+        - Source account to build the transaction with (TransactionBuilder uses its sequence + 1)
+        """
+        with self._lock:
+            sequence = self.next_sequence
+            self.next_sequence += 1
+        return Account(self.account_id, sequence - 1)
+
+    def confirm(self, sequence: int):
+        """Record that the transaction with the given sequence number was included in a ledger."""
+        with self._lock:
+            self.confirmed_sequence = max(self.confirmed_sequence, sequence)
+
+    def reject(self, sequence: int, result_codes: dict | None):
+        """
+        Handle a rejected transaction.
+
+        Parameters:
+        - sequence: Sequence number of the rejected transaction
+        - result_codes: The result_codes extras of the Horizon error, if any
+        """
+        transaction_code = (result_codes or {}).get('transaction')
+        if transaction_code == 'tx_bad_seq':
+            # Syncing now would hand out again the numbers of transactions still on their way
+            logging.info(f"Sequence number {sequence} rejected as bad, resyncing once nothing is outstanding.")
+            self.needs_sync = True
+        elif transaction_code in CONSUMED_RESULT_CODES:
+            self.confirm(sequence)
+        else:
+            with self._lock:
+                if sequence == self.next_sequence - 1:
+                    self.next_sequence = sequence  # Not consumed and nothing handed out after it
+
+
+def get_sequence_manager(server: Server, account_id: str) -> SequenceManager:
+    """
+    Get the process-wide sequence manager of an account, so bots trading several pairs with
+    the same account never hand out the same sequence number twice.
+
+    Parameters:
+    - server: Horizon server to load the account from on first use
+    - account_id: Public key of the account
+
+    Returns:
+    - A SequenceManager shared by all callers
+    """
+    with _sequence_managers_lock:
+        sequence_manager = _sequence_managers.get(account_id)
+        if sequence_manager is None:
+            sequence_manager = SequenceManager(server, account_id)
+            _sequence_managers[account_id] = sequence_manager
+    return sequence_manager
@@ -0,0 +1,198 @@
+import json
+import socket
+import threading
+import logging
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENGINE_HOST = "127.0.0.1"
+ENGINE_PORT = 8765
+
+_state_subscribers: dict[tuple[str, int], "StateSubscriber"] = {}
+_state_subscribers_lock = threading.Lock()
+
+
+def engine_topic(account_id: str, base_asset_code: str, counter_asset_code: str) -> str:
+    """Topic the engine publishes the state of a bot under."""
+    return f"{account_id}:{base_asset_code}/{counter_asset_code}"
+
+
+class StatePublisher:
+    """
+    Publishes the trading engine's state to local subscribers over a loopback TCP socket.
+
+    Messages are JSON objects, one per line, each under a topic. Only the latest message of
+    each topic is kept and a background thread sends it to the subscribers, so publish() never
+    waits on a subscriber; one that falls behind skips straight to the latest state. A new
+    subscriber gets the latest message of every topic as soon as it connects.
+    """
+    def __init__(self,
+                 host: str = ENGINE_HOST,
+                 port: int = ENGINE_PORT,
+                 send_timeout: float = 1.0):
+        """
+        Parameters:
+        - host: Address to listen on, keep it a loopback address
+        - port: Port to listen on, 0 for any free port
+        - send_timeout: Seconds after which a subscriber that does not take a message is dropped
+        """
+        self.host = host
+        self.port = port
+        self.send_timeout = send_timeout
+
+        self._latest: dict[str, bytes] = {}  # topic -> latest message line
+        self._dirty: set[str] = set()  # Topics published since the last send
+        self._subscribers: list[socket.socket] = []
+        self._new_subscribers: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop_event = threading.Event()
+        self._server_socket: socket.socket | None = None
+
+    def start(self):
+        """
+        Start listening. Binding fails if another engine already publishes on the port,
+        which also keeps two engines from trading side by side.
+        """
+        self._server_socket = socket.create_server((self.host, self.port))
+        self.port = self._server_socket.getsockname()[1]  # The port picked by the system for port 0
+        self._server_socket.settimeout(1.0)
+        self._stop_event.clear()
+        threading.Thread(target=self._accept, name="StatePublisher-accept", daemon=True).start()
+        threading.Thread(target=self._send, name="StatePublisher-send", daemon=True).start()
+        logging.info(f"Publishing engine state on {self.host}:{self.port}")
+
+    def stop(self):
+        self._stop_event.set()
+        self._changed.set()
+        if self._server_socket:
+            self._server_socket.close()
+
+    def publish(self, topic: str, data: dict):
+        """Make data the latest message of the topic; it is sent in the background."""
+        line = (json.dumps({'topic': topic, 'data': data}, default=str) + '\n').encode()
+        with self._lock:
+            self._latest[topic] = line
+            self._dirty.add(topic)
+        self._changed.set()
+
+    def _accept(self):
+        while not self._stop_event.is_set():
+            try:
+                subscriber, address = self._server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            subscriber.settimeout(self.send_timeout)
+            logging.info(f"Engine state subscriber connected from {address}")
+            with self._lock:
+                self._new_subscribers.append(subscriber)
+            self._changed.set()
+
+    def _send(self):
+        while not self._stop_event.is_set():
+            self._changed.wait()
+            self._changed.clear()
+            with self._lock:
+                new_subscribers, self._new_subscribers = self._new_subscribers, []
+                latest = b''.join(self._latest.values())
+                dirty = b''.join(self._latest[topic] for topic in self._dirty)
+                self._dirty.clear()
+
+            for subscriber in new_subscribers:
+                if self._send_to(subscriber, latest):
+                    self._subscribers.append(subscriber)
+            if dirty:
+                self._subscribers = [subscriber for subscriber in self._subscribers
+                                     if subscriber in new_subscribers or self._send_to(subscriber, dirty)]
+
+    def _send_to(self, subscriber: socket.socket, data: bytes) -> bool:
+        try:
+            subscriber.sendall(data)
+            return True
+        except OSError as e:
+            logging.info(f"Dropped engine state subscriber: {e}")
+            subscriber.close()
+            return False
+
+
+class StateSubscriber:
+    """
+    Read-only view of the trading engine's state.
+
+    A background thread keeps a connection to the engine's StatePublisher (reconnecting with
+    exponential backoff) and keeps the latest message of each topic for the UI to read.
+    """
+    def __init__(self,
+                 host: str = ENGINE_HOST,
+                 port: int = ENGINE_PORT,
+                 min_backoff: float = 1.0,
+                 max_backoff: float = 30.0):
+        self.host = host
+        self.port = port
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._latest: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.connected = False
+
+    def start(self):
+        """Start receiving in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="StateSubscriber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def latest(self, topic: str) -> dict | None:
+        """
+        Returns:
+        - Latest state published under the topic, or None if none was received
+        """
+        with self._lock:
+            return self._latest.get(topic)
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop_event.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5.0) as connection:
+                    connection.settimeout(None)
+                    self.connected = True
+                    backoff = self.min_backoff
+                    for line in connection.makefile('rb'):
+                        if self._stop_event.is_set():
+                            return
+                        message = json.loads(line)
+                        with self._lock:
+                            self._latest[message['topic']] = message['data']
+            except (OSError, ValueError) as e:
+                logging.debug(f"Engine state connection failed: {e}")
+            self.connected = False
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+def get_state_subscriber(host: str = ENGINE_HOST, port: int = ENGINE_PORT) -> StateSubscriber:
+    """
+    Get the process-wide, started subscriber to the engine at the given address.
+
+    Returns:
+    - A StateSubscriber shared by all callers
+    """
+    key = (host, port)
+    with _state_subscribers_lock:
+        subscriber = _state_subscribers.get(key)
+        if subscriber is None:
+            subscriber = StateSubscriber(host=host, port=port)
+            subscriber.start()
+            _state_subscribers[key] = subscriber
+    return subscriber
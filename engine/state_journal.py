@@ -0,0 +1,148 @@
+import json
+import os
+import logging
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+JOURNAL_DIR = "data/journal"
+
+
+class StateJournal:
+    """
+    Crash-safe record of a bot's live exchanges.
+
+    Every change is appended to a JSON lines journal and synced to disk before the call
+    returns. Every snapshot_interval records, the whole live state is written to a snapshot
+    file (through a temporary file and an atomic rename) and the journal starts over. Recovery
+    therefore reads one snapshot plus at most snapshot_interval journal records, however long
+    the trading history is.
+
+    Records carry a sequence number and the snapshot the last one it covers, so a journal that
+    was not yet cleared when the process died is replayed without going back in time.
+    """
+    def __init__(self,
+                 name: str,
+                 journal_dir: str = JOURNAL_DIR,
+                 snapshot_interval: int = 200):
+        """
+        Parameters:
+        - name: Name of the journal, unique per account and pair
+        - journal_dir: Directory of the snapshot and journal files
+        - snapshot_interval: Number of journal records after which a snapshot is taken
+        """
+        self.snapshot_path = os.path.join(journal_dir, f"{name}.snapshot.json")
+        self.journal_path = os.path.join(journal_dir, f"{name}.journal.jsonl")
+        self.snapshot_interval = snapshot_interval
+        os.makedirs(journal_dir, exist_ok=True)
+
+        self.sequence = 0
+        self.exchanges: dict[str, dict] = {}  # exchange_id -> exchange_to_dict() record of the live exchanges
+        self.fill_cursor: str | None = None  # paging_token of the last account trade applied
+        self._journal_file = None
+        self._num_records = 0  # Journal records since the last snapshot
+
+    def load(self) -> tuple[list[dict], str | None]:
+        """
+        Restore the state from the latest snapshot and the journal records after it, then
+        take a fresh snapshot so the next recovery starts from here.
+
+        Returns:
+        - Tuple of (list of exchange records, fill cursor or None)
+        """
+        self.sequence = 0
+        self.exchanges = {}
+        self.fill_cursor = None
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            self.sequence = snapshot['sequence']
+            self.exchanges = snapshot['exchanges']
+            self.fill_cursor = snapshot['fill_cursor']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Error reading the snapshot {self.snapshot_path}: {e}")
+
+        num_replayed = 0
+        try:
+            with open(self.journal_path) as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Journal {self.journal_path} ends in a partly written record, ignoring it.")
+                        break
+                    if record['sequence'] <= self.sequence:
+                        continue  # Already in the snapshot
+                    self._apply(record)
+                    self.sequence = record['sequence']
+                    num_replayed += 1
+        except FileNotFoundError:
+            pass
+
+        logging.info(f"Loaded {len(self.exchanges)} exchanges from {self.snapshot_path} and {num_replayed} journal records")
+        self.snapshot()
+        return list(self.exchanges.values()), self.fill_cursor
+
+    def record_exchange(self, record: dict):
+        """Record the new state of a live exchange (an exchange_to_dict() record)."""
+        self._append({'type': 'exchange', 'exchange': record})
+
+    def record_removed(self, exchange_id: str):
+        """Record that an exchange is no longer live (completed or dropped)."""
+        self._append({'type': 'removed', 'exchange_id': exchange_id})
+
+    def record_fill_cursor(self, cursor: str):
+        """Record the paging_token of the last account trade applied to the exchanges."""
+        if cursor and cursor != "now" and cursor != self.fill_cursor:
+            self._append({'type': 'fill_cursor', 'cursor': cursor})
+
+    def snapshot(self):
+        """Write the whole state to the snapshot file and start a new journal."""
+        tmp_path = self.snapshot_path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as snapshot_file:
+                json.dump({'sequence': self.sequence,
+                           'fill_cursor': self.fill_cursor,
+                           'exchanges': self.exchanges}, snapshot_file)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            if self._journal_file:
+                self._journal_file.close()
+            self._journal_file = open(self.journal_path, 'w')
+            self._num_records = 0
+        except OSError as e:
+            logging.error(f"Error writing the snapshot {self.snapshot_path}: {e}")
+
+    def close(self):
+        if self._journal_file:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def _apply(self, record: dict):
+        if record['type'] == 'exchange':
+            self.exchanges[record['exchange']['exchange_id']] = record['exchange']
+        elif record['type'] == 'removed':
+            self.exchanges.pop(record['exchange_id'], None)
+        elif record['type'] == 'fill_cursor':
+            self.fill_cursor = record['cursor']
+
+    def _append(self, record: dict):
+        self.sequence += 1
+        record['sequence'] = self.sequence
+        self._apply(record)
+        if self._journal_file is None:
+            self._journal_file = open(self.journal_path, 'a')
+        try:
+            self._journal_file.write(json.dumps(record) + '\n')
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+        except OSError as e:
+            logging.error(f"Error writing to the journal {self.journal_path}: {e}")
+
+        self._num_records += 1
+        if self._num_records >= self.snapshot_interval:
+            self.snapshot()
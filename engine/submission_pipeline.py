@@ -0,0 +1,274 @@
+import json
+import queue
+import threading
+import time
+import logging
+
+from stellar_sdk import Server
+from stellar_sdk.exceptions import BaseHorizonError, NotFoundError
+from stellar_sdk.xdr import TransactionResult
+
+from engine.sequence_manager import SequenceManager, get_sequence_manager
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def result_code_name(result_xdr: str) -> str:
+    """Convert the transaction result code of a result XDR to Horizon's name for it (e.g. txBAD_SEQ -> tx_bad_seq)."""
+    code = TransactionResult.from_xdr(result_xdr).result.code
+    return 'tx_' + code.name[2:].lower()
+
+
+def async_submit_response(error: BaseHorizonError) -> dict | None:
+    """
+    Get Horizon's answer to an async submission out of the error the SDK raises for it.
+    POST /transactions_async answers ERROR with 400, DUPLICATE with 409 and TRY_AGAIN_LATER with 503,
+    and the SDK raises on each of them.
+
+    Returns:
+    - The {tx_status, hash, errorResultXdr} answer, or None if the error is not an answer of the endpoint
+    """
+    try:
+        response = json.loads(error.message)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(response, dict) or 'tx_status' not in response:
+        return None
+    return response
+
+
+_submission_pipelines: dict[str, "SubmissionPipeline"] = {}
+_submission_pipelines_lock = threading.Lock()
+
+
+class SubmissionPipeline:
+    """
+    Non-blocking transaction submission for one account.
+
+    Signed transactions are queued and a background thread sends them to Horizon's async
+    submit endpoint, which answers as soon as Stellar Core has accepted (or rejected) the
+    transaction. The same thread then polls the accepted transaction hashes until each one is
+    in a ledger or past its time bounds. Outcomes are kept until drain() is called on the
+    caller's thread, so results are applied to the bot's state between ticks and never
+    concurrently with them.
+
+    All bots of an account submit through the account's one pipeline (get_submission_pipeline).
+    Sequence numbers are reserved as transactions are queued, so they are sent in sequence
+    order. Each bot submits and drains under its own owner key, so it only ever runs its own
+    callbacks.
+    """
+    def __init__(self,
+                 server: Server,
+                 sequence_manager: SequenceManager,
+                 poll_interval: float = 1.0,
+                 timeout: float = 60.0):
+        """
+        Parameters:
+        - server: Horizon server to submit to
+        - sequence_manager: Sequence numbers of the submitting account, confirmed or given back per outcome
+        - poll_interval: Seconds between two polls of the pending transaction hashes
+        - timeout: Seconds after which a transaction that never showed up in a ledger counts as failed
+        """
+        self.server = server
+        self.sequence_manager = sequence_manager
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+        self._submissions: queue.Queue = queue.Queue()
+        self._completed: dict[str, queue.Queue] = {}  # owner -> resolved (on_result, response)
+        self._pending: dict[str, tuple] = {}  # hash -> (sequence, owner, on_result, submitted_at)
+        self._num_in_flight: dict[str, int] = {}  # owner -> submitted and not drained yet
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()  # Keeps sequence order and queue order the same
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Start submitting in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name=f"SubmissionPipeline-{self.sequence_manager.account_id}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def release(self, owner: str):
+        """
+        Drop an owner's undrained outcomes. Its transactions already queued are still sent,
+        as later sequence numbers depend on them, but their outcomes are discarded.
+        """
+        with self._lock:
+            self._completed.pop(owner, None)
+            self._num_in_flight.pop(owner, None)
+
+    def in_flight(self, owner: str) -> int:
+        """Number of the owner's submitted transactions whose outcome has not been drained yet."""
+        with self._lock:
+            return self._num_in_flight.get(owner, 0)
+
+    def submit(self, build_transaction, on_result, owner: str) -> bool:
+        """
+        Reserve the account's next sequence number, build a transaction on it and queue it.
+
+        Parameters:
+        - build_transaction: Called with the source account to build from, returns the signed TransactionEnvelope
+        - on_result: Called by drain() with the Horizon transaction record once it is in a ledger, or None if it failed
+        - owner: Key of the submitter, whose drain() runs on_result
+
+        Returns:
+        - False if the transaction could not be built (its sequence number is given back)
+        """
+        with self._submit_lock:
+            source_account = self.sequence_manager.reserve()
+            sequence = source_account.sequence + 1  # Building increments the source account's sequence
+            try:
+                transaction = build_transaction(source_account)
+            except Exception as e:
+                logging.error(f"Error building a transaction: {e}")
+                self.sequence_manager.reject(sequence, None)
+                return False
+            with self._lock:
+                self._completed.setdefault(owner, queue.Queue())
+                self._num_in_flight[owner] = self._num_in_flight.get(owner, 0) + 1
+            self._submissions.put((transaction, owner, on_result))
+        self.start()
+        return True
+
+    def drain(self, owner: str) -> int:
+        """
+        Run the callbacks of the owner's transactions resolved since the last call, on the caller's thread.
+
+        Returns:
+        - Number of resolved transactions
+        """
+        with self._lock:
+            completed = self._completed.get(owner)
+        num_resolved = 0
+        while completed is not None:
+            try:
+                on_result, response = completed.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._num_in_flight[owner] = self._num_in_flight.get(owner, 1) - 1
+            num_resolved += 1
+            try:
+                on_result(response)
+            except Exception as e:
+                logging.error(f"Error handling a transaction result: {e}")
+        return num_resolved
+
+    def _resolve(self, owner: str, on_result, response: dict | None):
+        with self._lock:
+            completed = self._completed.get(owner)
+        if completed is not None:
+            completed.put((on_result, response))
+
+    def _send(self, transaction, owner: str, on_result):
+        sequence = transaction.transaction.sequence
+        while True:
+            try:
+                response = self.server.submit_transaction_async(transaction)
+            except BaseHorizonError as e:
+                response = async_submit_response(e)
+                if response is None:
+                    logging.error(f"Error submitting transaction {sequence}: {e.status} {e.message}")
+                    self.sequence_manager.reject(sequence, None)
+                    self._resolve(owner, on_result, None)
+                    return
+            except Exception as e:
+                logging.error(f"Error submitting transaction {sequence}: {e}")
+                self.sequence_manager.reject(sequence, None)
+                self._resolve(owner, on_result, None)
+                return
+            if response.get('tx_status') != 'TRY_AGAIN_LATER' or self._stop_event.is_set():
+                break
+            # Submitted again right away, before the transactions queued after it
+            logging.info(f"Transaction {sequence} not accepted yet, submitting again.")
+            self._stop_event.wait(self.poll_interval)
+
+        status = response.get('tx_status')
+        if status in ('PENDING', 'DUPLICATE'):
+            # A duplicate was accepted by an earlier submission and is on its way into a ledger
+            self._pending[response.get('hash') or transaction.hash_hex()] = (sequence, owner, on_result, time.monotonic())
+        else:
+            error_result_xdr = response.get('errorResultXdr') or response.get('error_result_xdr')
+            result_code = result_code_name(error_result_xdr) if error_result_xdr else None
+            logging.error(f"Transaction {sequence} {'rejected' if status == 'ERROR' else 'not accepted'}: {result_code or status}")
+            self.sequence_manager.reject(sequence, {'transaction': result_code})
+            self._resolve(owner, on_result, None)
+
+    def _poll(self):
+        for transaction_hash, (sequence, owner, on_result, submitted_at) in list(self._pending.items()):
+            try:
+                record = self.server.transactions().transaction(transaction_hash).call()
+            except NotFoundError:
+                if time.monotonic() - submitted_at > self.timeout:
+                    logging.error(f"Transaction {transaction_hash} did not make it into a ledger.")
+                    del self._pending[transaction_hash]
+                    self.sequence_manager.reject(sequence, {'transaction': 'tx_too_late'})
+                    self._resolve(owner, on_result, None)
+                continue
+            except Exception as e:
+                logging.warning(f"Error polling transaction {transaction_hash}: {e}")
+                continue
+
+            del self._pending[transaction_hash]
+            self.sequence_manager.confirm(sequence)  # In a ledger, successful or not
+            if record.get('successful'):
+                self._resolve(owner, on_result, record)
+            else:
+                logging.error(f"Transaction {transaction_hash} failed: {result_code_name(record['result_xdr'])}")
+                self._resolve(owner, on_result, None)
+
+    def _sync_sequence(self):
+        """
+        Resync the sequence number after a tx_bad_seq, once no handed out sequence number is outstanding,
+        so that none is handed out twice.
+        """
+        with self._submit_lock:
+            if self._pending or not self._submissions.empty():
+                return
+            try:
+                self.sequence_manager.sync()
+            except Exception as e:
+                logging.error(f"Error syncing the sequence number: {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # Send everything queued, then poll the outstanding hashes
+            try:
+                transaction, owner, on_result = self._submissions.get(timeout=self.poll_interval if self._pending else 1.0)
+                self._send(transaction, owner, on_result)
+                continue
+            except queue.Empty:
+                pass
+            if self._pending:
+                self._poll()
+            if self.sequence_manager.needs_sync:
+                self._sync_sequence()
+
+
+def get_submission_pipeline(server: Server, account_id: str) -> SubmissionPipeline:
+    """
+    Get the process-wide submission pipeline of an account, so transactions of bots trading
+    several pairs with the same account reach Stellar Core in sequence order.
+
+    Parameters:
+    - server: Horizon server to submit to and to load the account from on first use
+    - account_id: Public key of the account
+
+    Returns:
+    - A SubmissionPipeline shared by all callers
+    """
+    with _submission_pipelines_lock:
+        submission_pipeline = _submission_pipelines.get(account_id)
+        if submission_pipeline is None:
+            submission_pipeline = SubmissionPipeline(server, get_sequence_manager(server, account_id))
+            _submission_pipelines[account_id] = submission_pipeline
+    return submission_pipeline
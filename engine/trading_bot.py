@@ -1,19 +1,40 @@
 from datetime import datetime
+import math
+from functools import partial
 import requests
-import yaml
 import logging
 import pandas as pd
-from stellar_sdk import Server, Keypair, TransactionBuilder, Network, Asset, ManageBuyOffer, ManageSellOffer
+from stellar_sdk import Keypair, TransactionBuilder, Network, ManageBuyOffer, ManageSellOffer
 from stellar_sdk.exceptions import NotFoundError
 
-from engine.exchange import Exchange
+from engine.exchange import Exchange, Order
+from engine.exchange_book import ExchangeBook, exchange_from_dict
+from engine.state_journal import StateJournal
+from engine.order_batch import OrderBatch
+from engine.ladder_reconciler import LadderReconciler
+from engine.submission_pipeline import get_submission_pipeline
+from utils.stellar_api import (get_server, get_asset, load_config, fetch_account_offers, fetch_account_balances, fetch_account_trades_since,
+                               fetch_account_trade_cursor, fetch_offer_trades, trade_ledger)
+from utils.trade_stream import TradeStream
+from utils.ledger_cache import get_ledger_cache
+from utils.account_history import AccountHistory, TRADING_HISTORY_COLUMNS
+from utils.offer_results import decode_offer_results
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Load configuration
-with open("config/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+config = load_config()
+
+# Ticks during which an account trade is retried before it is taken as not filling any of the bot's orders
+UNMATCHED_FILL_TICKS = 10
+
+# Horizon sets this bit in the offer id of trades whose order never rested on the book (filled when submitted)
+SYNTHETIC_OFFER_ID_FLAG = 1 << 62
+
+# With fills coming from the account's trade stream, the offer snapshot is kept up to date locally
+# and only refetched from Horizon every this many ticks, as a safety net
+OFFERS_REFRESH_TICKS = 60
 
 bin_id = "66f94566acd3cb34a88e402b"  # Replace with your bin ID once created
 headers = {
@@ -43,14 +64,39 @@ class TradingBot:
                  counter_asset_code: str):
         print("#################################################################")
         self.config = config  # Use the loaded config
-        self.server = Server(horizon_url="https://horizon.stellar.org")
+        self.server = get_server()
         self.network_passphrase = Network.PUBLIC_NETWORK_PASSPHRASE
 
         self.base_asset_code = base_asset_code
         self.counter_asset_code = counter_asset_code
-        self.exchanges: list[Exchange] = []
+        self.book = ExchangeBook()
+        self.journal: StateJournal | None = None
+
+        # Snapshot of the account's open offers keyed by offer id, refreshed once per tick
+        self.offers: dict[str, dict] | None = None
+        self.offers_stale = True
+        self.ticks_since_offers_refresh = 0
+
+        # Close times of ledgers, filled from submit responses and trade records
+        self.ledger_cache = get_ledger_cache()
+
+        # Offer operations decided during a tick, submitted together by flush_orders()
+        self.order_batch = OrderBatch()
+
+        # Target ladder of buy offers below the current price
+        self.ladder = LadderReconciler(num_levels=self.config.get('ladder_levels', 5))
         logging.info("Successfully initialized bot.")
 
+    @property
+    def exchanges(self) -> list[Exchange]:
+        """Live exchanges, then the recently completed ones."""
+        return list(self.book)
+
+    @property
+    def pair_name(self) -> str:
+        """Pair of the bot, the key its transactions go through the account's submission pipeline under."""
+        return f"{self.base_asset_code}/{self.counter_asset_code}"
+
     def set_account(self, 
                     stellar_key, 
                     trading_capital_percent,
@@ -65,7 +111,20 @@ class TradingBot:
         self.keypair = Keypair.from_secret(stellar_key)
         self.account_id = self.keypair.public_key
         try:
-            self.account = self.server.load_account(self.account_id)
+            self.stop()  # Background threads of a previously set account
+            self.submissions = get_submission_pipeline(self.server, self.account_id)  # Shared by the account's bots
+            self.account = self.submissions.sequence_manager.account
+            self.unmatched_fill_trades: list[tuple[dict, int]] = []  # (trade, ticks left to find its order)
+
+            # Exchanges of an earlier run of the bot, brought in line with the account
+            self.journal = StateJournal(f"{self.account_id}_{self.base_asset_code}_{self.counter_asset_code}")
+            self.book = ExchangeBook(journal=self.journal)
+            fill_cursor = self.restore_state()
+
+            # Fills of the account's offers, as they happen
+            self.fill_stream = TradeStream(self.base_asset_code, self.counter_asset_code,
+                                           cursor=fill_cursor, account_id=self.account_id)
+            self.fill_stream.start()
             self.balances = self.get_all_balances()
             self.trading_capital_percent = trading_capital_percent
             self.price_interval_percent = price_interval_percent
@@ -74,28 +133,126 @@ class TradingBot:
             logging.error("The Stellar account was not found. Check the Stellar Key or the network.")
             raise e
     
+    def stop(self):
+        """Stop the account's background threads (fill stream and submission pipeline) and close its journal."""
+        if getattr(self, 'fill_stream', None):
+            self.fill_stream.stop()
+        if getattr(self, 'submissions', None):
+            self.submissions.release(self.pair_name)
+        if self.journal:
+            self.journal.close()
+
+    def restore_state(self) -> str:
+        """
+        Rebuild the book from the journal and reconcile it with the account in one pass:
+        the account's trades since the journal's fill cursor are applied, open orders whose
+        offers are gone are settled and open offers of the pair the journal does not know
+        (e.g. submitted just before a crash) are adopted.
+
+        Returns:
+        - Cursor to start the fill stream from
+        """
+        records, fill_cursor = self.journal.load()
+        for record in records:
+            self.book.update(exchange_from_dict(record), journal=False)
+        logging.info(f"Restored {len(records)} exchanges from the journal")
+
+        if fill_cursor:
+            fetched = fetch_account_trades_since(self.account_id, fill_cursor)
+            if fetched is not None:
+                trade_list, fill_cursor = fetched
+                for trade in reversed(trade_list):
+                    self.apply_fill_trade(trade)
+        else:
+            # First run: fills are followed from the account's latest trade, journaled right away so
+            # that fills while the bot is down before its first fill are still caught up on
+            fill_cursor = fetch_account_trade_cursor(self.account_id)
+            if fill_cursor:
+                self.journal.record_fill_cursor(fill_cursor)
+        if self.refresh_offers() is None:
+            logging.warning("The account's offers are unknown, reconciliation of the restored exchanges is postponed.")
+            return fill_cursor or "now"
+
+        for exchange in self.book.live():
+            for order_type, order in (('buy', exchange.buy_order), ('sell', exchange.sell_order)):
+                if self.book.find_open_order(order.offer_id) and order.offer_id not in self.offers:
+                    self.settle_missing_offer(exchange, order_type)
+
+        for offer in self.offers.values():
+            if self.book.find_open_order(offer['id']) is None:
+                self.adopt_offer(offer)
+
+        if fill_cursor:
+            self.journal.record_fill_cursor(fill_cursor)
+        self.journal.snapshot()
+        return fill_cursor or "now"
+
+    def settle_missing_offer(self, exchange: Exchange, order_type: str):
+        """Settle a restored open order whose offer is no longer on the account."""
+        order = exchange.buy_order if order_type == 'buy' else exchange.sell_order
+        if order_type == 'buy' and order.filled_amount == 0:
+            # Filled while the bot was down, before its fill cursor: the offer's own trades tell
+            self.catch_up_offer_fills(order)
+            if self.book.find_open_order(order.offer_id) is None:
+                return  # Completed by the caught up fills
+        if order.filled_amount > 0:
+            # Bought or sold what was filled, the rest was taken off the book
+            logging.info(f"Offer {order.offer_id} is gone after {order.filled_amount}/{order.base_amount} filled")
+            self.complete_order(exchange, order_type)
+        elif order_type == 'buy':
+            logging.info(f"Offer {order.offer_id} is gone without fills, dropping its exchange")
+            self.book.remove(exchange)
+        else:
+            # No fills on record (e.g. from before the fill cursor): taken as executed at its price
+            last_history = order.history[-1]
+            logging.warning(f"Offer {order.offer_id} is gone without recorded fills, taking it as executed")
+            exchange.history_append(order_type=order_type,
+                                    ledger_num=last_history['ledger_num'],
+                                    timestamp=self.get_ledger_close_time(last_history['ledger_num']),
+                                    price=last_history['price'],
+                                    status='executed')
+            self.book.update(exchange)
+
+    def catch_up_offer_fills(self, order: Order):
+        """Apply the trades of an open order's offer that are not on record, e.g. from before the fill cursor."""
+        trade_list = fetch_offer_trades(order.offer_id)
+        for trade in trade_list or []:
+            self.apply_fill_trade(trade)
+
+    def adopt_offer(self, offer: dict):
+        """Take an open offer of the bot's pair that no exchange knows into a new exchange."""
+        selling_code = 'XLM' if offer['selling']['asset_type'] == 'native' else offer['selling']['asset_code']
+        buying_code = 'XLM' if offer['buying']['asset_type'] == 'native' else offer['buying']['asset_code']
+        offer_price, offer_amount = float(offer['price']), float(offer['amount'])
+        ledger_num = offer['last_modified_ledger']
+        timestamp = offer.get('last_modified_time') or self.get_ledger_close_time(ledger_num)
+
+        if (selling_code, buying_code) == (self.counter_asset_code, self.base_asset_code):
+            # A buy offer sells the counter asset at a price in base asset per counter unit
+            exchange = Exchange(base_amount=offer_amount * offer_price, buy_offer_id=offer['id'])
+            exchange.history_append(order_type='buy', ledger_num=ledger_num, timestamp=timestamp,
+                                    price=1 / offer_price, status='open')
+            exchange.status = 'buy'
+        elif (selling_code, buying_code) == (self.base_asset_code, self.counter_asset_code):
+            # The buy side is unknown, it is recorded at the sell price
+            exchange = Exchange(base_amount=offer_amount, sell_offer_id=offer['id'])
+            exchange.history_append(order_type='buy', ledger_num=ledger_num, timestamp=timestamp,
+                                    price=offer_price, status='executed')
+            exchange.history_append(order_type='sell', ledger_num=ledger_num, timestamp=timestamp,
+                                    price=offer_price, status='open')
+            exchange.status = 'sell'
+        else:
+            return  # Another pair
+        logging.info(f"Adopted offer {offer['id']} into exchange {exchange.exchange_id}")
+        self.book.add(exchange)
+
     def get_all_balances(self):
-        try:
-            account = self.server.accounts().account_id(self.account_id).call()
-            balances = account['balances']
-
-            balance_data = []
-            asset_issuers = self.config.get('asset_issuers', {})
-            for asset_code, asset_issuer in asset_issuers.items():
-                for balance in balances:
-                    current_asset_code = "XLM" if balance['asset_type'] == 'native' else balance.get('asset_code', 'Unknown')
-                    current_asset_issuer = balance.get('asset_issuer', 'Stellar Foundation')
-                    if current_asset_code == asset_code and current_asset_issuer == asset_issuer:
-                        balance_data.append({
-                            'Asset': current_asset_code,
-                            'Balance': float(balance['balance']),
-                        })
-            logging.info(f"Fetched balances: \n{pd.DataFrame(balance_data)}")
-            self.balances = balance_data
-            return balance_data
-        except Exception as e:
-            logging.error(f"Error fetching balances: {e}")
+        balance_data = fetch_account_balances(self.account_id)
+        if balance_data is None:
             return pd.DataFrame(columns=['Asset', 'Balance'])
+        logging.info(f"Fetched balances: \n{pd.DataFrame(balance_data)}")
+        self.balances = balance_data
+        return balance_data
 
     def get_asset_balance(self, asset_code):
         self.balances = self.get_all_balances()
@@ -104,121 +261,41 @@ class TradingBot:
                 return balance['Balance']
 
 
-    def place_order(self, amount, price, buy=True, base_fee=10000):
-        try:
-            self.account = self.server.load_account(self.account_id)
-            base_issuer = self.config['asset_issuers'].get(self.base_asset_code)
-            counter_issuer = self.config['asset_issuers'].get(self.counter_asset_code)
-            amount=str(round(amount, 7))
-
-            base_asset = Asset.native() if self.base_asset_code == "XLM" else Asset(self.base_asset_code, base_issuer)
-            counter_asset = Asset.native() if self.counter_asset_code == "XLM" else Asset(self.counter_asset_code, counter_issuer)
-
-            transaction = (
-                TransactionBuilder(
-                    source_account=self.account,
-                    network_passphrase=self.network_passphrase,
-                    base_fee=base_fee
-                )
-                .append_operation(
-                    ManageBuyOffer(
-                        buying=base_asset,
-                        selling=counter_asset,
-                        amount=amount,
-                        price=str(price)
-                    ) if buy else ManageSellOffer(
-                        selling=base_asset,
-                        buying=counter_asset,
-                        amount=amount,
-                        price=str(price)
-                    )
-                )
-                .set_timeout(30)
-                .build()
-            )
-
-            transaction.sign(self.keypair)
-            response = self.server.submit_transaction(transaction)
-
-            # Check if the transaction was successful
-            if response['successful']:
-                logging.info(f"Order placed successfully: {response}")
-                return response
-            else:
-                logging.error(f"Order placement failed: {response}")
-                return None
-
-        except Exception as e:
-            logging.error(f"Error placing order: {e}")
-            return None
-
-
-    def change_buy_order_price(self, 
-                               offer_id: str, 
-                               amount: float, 
-                               new_price: float, 
-                               base_fee=10000):
-        try:
-            offer_id = int(offer_id)  # Ensure offer_id is an integer
-            amount = float(amount)  # Ensure amount is a float
-
-            # Determine the asset types
-            base_issuer = self.config['asset_issuers'].get(self.base_asset_code)
-            counter_issuer = self.config['asset_issuers'].get(self.counter_asset_code)
-            base_asset = Asset.native() if self.base_asset_code == "XLM" else Asset(self.base_asset_code, base_issuer)
-            counter_asset = Asset.native() if self.counter_asset_code == "XLM" else Asset(self.counter_asset_code, counter_issuer)
-
-            # Create a transaction to modify the existing order
-            transaction = (
-                TransactionBuilder(
-                    source_account=self.account,
-                    network_passphrase=self.network_passphrase,
-                    base_fee=base_fee
-                )
-                .append_operation(
-                    ManageBuyOffer(
-                        buying=base_asset,
-                        selling=counter_asset,
-                        amount=str(round(amount, 7)),  # Limit amount to 7 decimal places
-                        price=str(new_price),
-                        offer_id=offer_id  # Pass the correct integer value for offer_id
-                    )
-                )
-                .set_timeout(30)
-                .build()
-            )
-
-            # Sign the transaction
-            transaction.sign(self.keypair)
-            
-            # Submit the transaction
-            response = self.server.submit_transaction(transaction)
-
-            # Debugging: Log the entire response for inspection
-            logging.debug(f"Transaction response: {response}")
-
-            if response:
-                logging.info(f"Successfully changed order price. Order {offer_id} price changed to {new_price}")
-                return response
-            else:
-                logging.error("Failed in changing order price.")
-                return None
-
-        except Exception as e:
-            logging.error(f"Error changing order price: {e}")
-            return None
+    def refresh_offers(self) -> dict[str, dict] | None:
+        """
+        Fetch all of the account's open offers into the offer snapshot.
+
+        Returns:
+        - Dictionary of offer dictionaries keyed by offer id, or None if the fetch failed
+        """
+        self.offers = fetch_account_offers(self.account_id)
+        self.offers_stale = self.offers is None
+        return self.offers
+
+    def get_offers(self) -> dict[str, dict] | None:
+        """
+        Get the offer snapshot, refetching it only if an order was submitted since it was taken.
+
+        Returns:
+        - Dictionary of offer dictionaries keyed by offer id, or None if the offers are unknown
+        """
+        if self.offers_stale:
+            return self.refresh_offers()
+        return self.offers
+
+    def apply_offer_result(self, offer_result: dict, ledger_num: int):
+        """Keep the offer snapshot in step with an offer the bot just created, updated or deleted."""
+        if self.offers is None or offer_result['offer_id'] is None:
+            return
+        offer = self.offers.setdefault(offer_result['offer_id'], {'id': offer_result['offer_id']})
+        offer['amount'] = offer_result['amount']
+        offer['price'] = offer_result['price']
+        offer['last_modified_ledger'] = ledger_num
 
-    def get_offer_id_from_ledger(self, ledger_num):
-        offers = self.server.offers().for_account(self.account_id).call()
-        for offer in offers['_embedded']['records']:
-            # print('offer: ', offer)
-            if offer['last_modified_ledger'] == ledger_num:
-                offer_id = offer['id']
-                return offer_id # Means the offer is still open
-        
-        return None # Means the offer was excuted
-    
     def get_ledger_close_time(self, ledger_num: int) -> str:
+        close_time = self.ledger_cache.get(ledger_num)
+        if close_time:
+            return close_time
         try:
             # Fetch details about the specific ledger
             ledger = self.server.ledgers().ledger(ledger_num).call()
@@ -227,6 +304,7 @@ class TradingBot:
             if not close_time:
                 raise ValueError(f"Close time not found for ledger {ledger_num}")
             
+            self.ledger_cache.put(ledger_num, close_time)
             return close_time
         except NotFoundError:
             logging.error(f"Ledger {ledger_num} not found.")
@@ -237,72 +315,242 @@ class TradingBot:
 
     def check_offer_executed(self, offer_id: str) -> bool:
         try:
-            offers = self.server.offers().for_account(self.account_id).call()
-            for offer in offers['_embedded']['records']:
-                if offer['id'] == offer_id:
-                    return False # Means the offer is still open
-            return True
+            offers = self.get_offers()
+            if offers is None:
+                return False # Unknown, treat the offer as still open
+            return offer_id not in offers
 
         except Exception as e:
             logging.error(f"Error checking trade execution: {e}")
             return False
 
     ############################################################################   
+    def build_offer_operation(self,
+                              amount: float,
+                              price: float,
+                              buy: bool,
+                              offer_id: int = 0):
+        """Build a ManageBuyOffer (buy) or ManageSellOffer (sell) operation for the bot's pair; offer_id 0 creates a new offer."""
+        base_asset = get_asset(self.base_asset_code)
+        counter_asset = get_asset(self.counter_asset_code)
+        if buy:
+            return ManageBuyOffer(buying=base_asset,
+                                  selling=counter_asset,
+                                  amount=str(round(amount, 7)),
+                                  price=str(price),
+                                  offer_id=offer_id)
+        return ManageSellOffer(selling=base_asset,
+                               buying=counter_asset,
+                               amount=str(round(amount, 7)),
+                               price=str(price),
+                               offer_id=offer_id)
+
+    def flush_orders(self, base_fee=10000):
+        """
+        Submit the offer operations queued during this tick in as few transactions as possible.
+        The transactions go through the submission pipeline, so this returns without waiting for a ledger.
+        """
+        for operations, callbacks in self.order_batch.take():
+            # Built on the sequence number the pipeline reserves, so the account's transactions go out in order
+            if self.submissions.submit(partial(self.build_transaction, operations, base_fee),
+                                       partial(self.on_orders_submitted, operations, callbacks),
+                                       owner=self.pair_name):
+                logging.info(f"Queued {len(operations)} offer operations in one transaction")
+            else:
+                logging.error(f"Dropped a transaction of {len(operations)} offer operations that could not be built")
+
+    def build_transaction(self, operations: list, base_fee: int, source_account):
+        """
+        Returns:
+        - Signed transaction of the operations from the source account
+        """
+        transaction_builder = TransactionBuilder(source_account=source_account,
+                                                 network_passphrase=self.network_passphrase,
+                                                 base_fee=base_fee)
+        for operation in operations:
+            transaction_builder.append_operation(operation)
+        transaction = transaction_builder.set_timeout(30).build()
+        transaction.sign(self.keypair)
+        return transaction
+
+    def on_orders_submitted(self,
+                            operations: list,
+                            callbacks: list,
+                            response: dict | None):
+        """
+        Hand every operation's decoded result of a resolved transaction back to its callback.
+        If the result cannot be decoded, the results are worked out from the account's offers instead.
+        """
+        offer_results = [None] * len(callbacks)
+        if response:
+            self.ledger_cache.put(response['ledger'], response['created_at'])  # created_at is the ledger's close time
+            try:
+                offer_results = decode_offer_results(response['result_xdr'])
+            except Exception as e:
+                logging.error(f"Error decoding the transaction result, matching the account's offers instead: {e}")
+                offer_results = self.offer_results_from_offers(operations)
+        if not response or None in offer_results:
+            self.offers_stale = True  # Unknown change to the account's offers, refetch on the next lookup
+
+        for callback, offer_result in zip(callbacks, offer_results):
+            if offer_result is not None:
+                self.apply_offer_result(offer_result, ledger_num=response['ledger'])
+            try:
+                callback(response if offer_result else None, offer_result)
+            except Exception as e:
+                logging.error(f"Error handling an offer result: {e}")
+
+    def offer_results_from_offers(self, operations: list) -> list[dict | None]:
+        """
+        Work out the offer results of a successful transaction from a fresh fetch of the account's offers,
+        for when its result cannot be decoded. A new offer is matched to the bot's unknown offer of the
+        same side and price with the closest amount. Fills at submission are not known this way; they
+        come in with the account's trades.
+
+        Parameters:
+        - operations: The transaction's ManageBuyOffer/ManageSellOffer operations, in order
+
+        Returns:
+        - List with one offer result per operation, as decode_offer_results returns them,
+          or None for every operation if the offers cannot be fetched
+        """
+        offers = self.refresh_offers()
+        if offers is None:
+            return [None] * len(operations)
+
+        offer_results = []
+        matched_offer_ids = set()
+        for operation_index, operation in enumerate(operations):
+            buy = isinstance(operation, ManageBuyOffer)
+            # Horizon records a buy offer as selling the counter asset, at the inverse price
+            offer_price = operation.price.d / operation.price.n if buy else operation.price.n / operation.price.d
+            offer_amount = float(operation.amount) * (1 / offer_price if buy else 1)
+            if float(operation.amount) == 0:
+                offer = None  # Deleted on request
+            elif operation.offer_id:
+                offer = offers.get(str(operation.offer_id))
+            else:
+                candidates = [offer for offer in offers.values()
+                              if offer['id'] not in matched_offer_ids
+                              and self.book.find_open_order(offer['id']) is None
+                              and self.offer_is_buy(offer) is buy
+                              and math.isclose(float(offer['price']), offer_price, rel_tol=1e-6)
+                              and float(offer['amount']) <= offer_amount * (1 + 1e-6)]
+                offer = min(candidates, key=lambda candidate: offer_amount - float(candidate['amount']), default=None)
+
+            if offer is None:
+                # Deleted on request, or nothing left on the book: claimed in full at submission
+                offer_results.append({'offer_id': None,
+                                      'effect': 'deleted',
+                                      'amount': 0.0,
+                                      'price': None,
+                                      'fully_claimed': float(operation.amount) > 0,
+                                      'fills': [],
+                                      'operation_index': operation_index})
+            else:
+                matched_offer_ids.add(offer['id'])
+                offer_results.append({'offer_id': offer['id'],
+                                      'effect': 'updated' if operation.offer_id else 'created',
+                                      'amount': float(offer['amount']),
+                                      'price': float(offer['price']),
+                                      'fully_claimed': False,
+                                      'fills': [],
+                                      'operation_index': operation_index})
+        return offer_results
+
+    def offer_is_buy(self, offer: dict) -> bool | None:
+        """
+        Returns:
+        - True for a buy offer of the bot's pair, False for a sell offer, None for an offer of another pair
+        """
+        selling_code = 'XLM' if offer['selling']['asset_type'] == 'native' else offer['selling']['asset_code']
+        buying_code = 'XLM' if offer['buying']['asset_type'] == 'native' else offer['buying']['asset_code']
+        if (selling_code, buying_code) == (self.counter_asset_code, self.base_asset_code):
+            return True
+        if (selling_code, buying_code) == (self.base_asset_code, self.counter_asset_code):
+            return False
+        return None
+
     def make_exchange_order_new(self, 
                                 exchange: Exchange,
                                 price: float,
                                 buy: bool):
-        placed_order = self.place_order(amount=exchange.base_amount,
-                                        price=price,
-                                        buy=buy)
+        """Queue a new buy or sell order of the exchange; a new exchange joins the book once its order is placed."""
+        operation = self.build_offer_operation(amount=exchange.base_amount,
+                                               price=price,
+                                               buy=buy)
+        self.order_batch.add(operation, partial(self.on_exchange_order_placed, exchange, price, buy))
+
+    def on_exchange_order_placed(self,
+                                 exchange: Exchange,
+                                 price: float,
+                                 buy: bool,
+                                 placed_order: dict | None,
+                                 offer_result: dict | None):
         # print('placed_order: ', placed_order)
         if placed_order:
             ledger_num = placed_order['ledger']
-            offer_id = self.get_offer_id_from_ledger(ledger_num)
-            print('placed offer_id: ', offer_id)
+            offer_id = offer_result['offer_id']
+            logging.info(f"Placed offer {offer_id} with {len(offer_result['fills'])} fills at submission")
+            order = exchange.buy_order if buy else exchange.sell_order
+            self.apply_submission_fills(order, placed_order, offer_result)
 
             if offer_id:
-                exchange.buy_order.offer_id=offer_id if buy else '',
-                exchange.sell_order.offer_id='' if buy else offer_id
+                if buy:
+                    exchange.buy_order.offer_id = offer_id
+                else:
+                    exchange.sell_order.offer_id = offer_id
                 exchange.history_append(order_type='buy' if buy else 'sell',
                                         ledger_num=ledger_num,
                                         timestamp=placed_order['created_at'],
                                         price=price,
                                         status='open')
             elif offer_id is None:
-                ledger_close_time = self.get_ledger_close_time(ledger_num=ledger_num)
+                # Claimed in full at submission; created_at is the close time of its ledger
                 exchange.history_append(order_type='buy' if buy else 'sell',
                                         ledger_num=ledger_num,
-                                        timestamp=ledger_close_time,
-                                        price=price,
+                                        timestamp=placed_order['created_at'],
+                                        price=order.average_fill_price or price,
                                         status='executed')
             exchange.status = 'buy' if buy else 'sell'
-            return exchange
-        else:
-            return None
+            self.book.update(exchange)
 
     def create_new_exchange(self, 
                             base_amount: float,
                             price: float):
         exchange = Exchange(base_amount=base_amount)
-        exchange = self.make_exchange_order_new(exchange=exchange,
-                                                price=price,
-                                                buy=True)
-        if exchange:
-            self.exchanges.append(exchange)
+        self.make_exchange_order_new(exchange=exchange,
+                                     price=price,
+                                     buy=True)
 
 
     def make_exchange_buy_order_price_changed(self, 
                                               exchange: Exchange,
-                                              new_price: float):
-        changed_order = self.change_buy_order_price(offer_id=exchange.buy_order.offer_id,
-                                                    amount=exchange.base_amount,
-                                                    new_price=new_price,)
+                                              new_price: float,
+                                              new_base_amount: float | None = None):
+        """Queue a price (and optionally amount) change of the exchange's open buy order."""
+        new_base_amount = exchange.base_amount if new_base_amount is None else new_base_amount
+        operation = self.build_offer_operation(amount=new_base_amount,
+                                               price=new_price,
+                                               buy=True,
+                                               offer_id=int(exchange.buy_order.offer_id))
+        self.order_batch.add(operation, partial(self.on_exchange_buy_order_price_changed, exchange, new_price, new_base_amount))
+
+    def on_exchange_buy_order_price_changed(self,
+                                            exchange: Exchange,
+                                            new_price: float,
+                                            new_base_amount: float,
+                                            changed_order: dict | None,
+                                            offer_result: dict | None):
         # print('changed_order: ', changed_order)
         if changed_order:
+            # The new amount is what is left to buy, on top of what was already filled
+            base_amount = exchange.buy_order.filled_amount + new_base_amount
+            exchange.base_amount = exchange.buy_order.base_amount = exchange.sell_order.base_amount = base_amount
             ledger_num = changed_order['ledger']
-            offer_id = self.get_offer_id_from_ledger(ledger_num)
-            print('changed offer_id: ', offer_id)
+            offer_id = offer_result['offer_id']
+            logging.info(f"Changed offer {exchange.buy_order.offer_id} with {len(offer_result['fills'])} fills at submission")
+            self.apply_submission_fills(exchange.buy_order, changed_order, offer_result)
 
             if offer_id: # Open
                 exchange.history_append(order_type='buy',
@@ -311,15 +559,219 @@ class TradingBot:
                                         price=new_price,
                                         status='open')
             elif offer_id is None: # Excuted
-                ledger_close_time = self.get_ledger_close_time(ledger_num=ledger_num)
+                exchange.base_amount = exchange.sell_order.base_amount = exchange.buy_order.filled_amount
                 exchange.history_append(order_type='buy',
                                         ledger_num=ledger_num,
-                                        timestamp=ledger_close_time,
-                                        price=new_price,
+                                        timestamp=changed_order['created_at'],
+                                        price=exchange.buy_order.average_fill_price or new_price,
                                         status='executed')
-            return exchange
-        else:
+            self.book.update(exchange)
+
+    def cancel_exchange_buy_order(self, exchange: Exchange):
+        """Queue the deletion of the exchange's open buy order; the exchange is dropped once it is gone."""
+        operation = self.build_offer_operation(amount=0,
+                                               price=exchange.buy_order.history[-1]['price'],
+                                               buy=True,
+                                               offer_id=int(exchange.buy_order.offer_id))
+        self.order_batch.add(operation, partial(self.on_exchange_buy_order_cancelled, exchange))
+
+    def on_exchange_buy_order_cancelled(self,
+                                        exchange: Exchange,
+                                        cancelled_order: dict | None,
+                                        offer_result: dict | None):
+        if cancelled_order:
+            if self.offers is not None:
+                self.offers.pop(exchange.buy_order.offer_id, None)
+            if exchange.buy_order.filled_amount > 0:
+                # Partly filled: the bought part still needs its sell order
+                self.complete_order(exchange, 'buy')
+            else:
+                self.book.remove(exchange)
+
+    def apply_submission_fills(self,
+                               order: Order,
+                               response: dict,
+                               offer_result: dict):
+        """
+        Record the fills an order got when it was submitted (it crossed offers already on the book).
+
+        The fills get the ids Horizon gives their trades ("<operation id>-<index>", the operation id
+        being the transaction's paging_token plus the operation's index + 1), so the same trades
+        coming in from the account's trade stream are recognized and not counted twice.
+        """
+        operation_id = int(response['paging_token']) + offer_result['operation_index'] + 1
+        for fill_index, fill in enumerate(offer_result['fills']):
+            if order.order_type == 'buy':
+                base_amount, counter_amount = fill['bought_amount'], fill['sold_amount']
+            else:
+                base_amount, counter_amount = fill['sold_amount'], fill['bought_amount']
+            if base_amount > 0:
+                order.fill_append(trade_id=f"{operation_id}-{fill_index}",
+                                  ledger_num=response['ledger'],
+                                  timestamp=response['created_at'],
+                                  base_amount=base_amount,
+                                  price=counter_amount / base_amount)
+
+    def trade_to_fill(self, trade: dict) -> dict:
+        """Convert an account trade record into base amount and price in the bot's pair orientation."""
+        trade_base_code = 'XLM' if trade['base_asset_type'] == 'native' else trade['base_asset_code']
+        base_amount, counter_amount = float(trade['base_amount']), float(trade['counter_amount'])
+        if trade_base_code != self.base_asset_code:
+            # Horizon orders the trade's assets its own way; flip them to the bot's pair
+            base_amount, counter_amount = counter_amount, base_amount
+        return {'trade_id': trade['id'],
+                'ledger_num': trade_ledger(trade),
+                'timestamp': trade['ledger_close_time'],
+                'base_amount': base_amount,
+                'counter_amount': counter_amount,
+                'price': counter_amount / base_amount}
+
+    def complete_order(self, exchange: Exchange, order_type: str):
+        """Mark a filled order as executed at its average fill price, with the ledger and time of its last fill."""
+        order = exchange.buy_order if order_type == 'buy' else exchange.sell_order
+        last_fill = order.fills[-1]
+        if order_type == 'buy':
+            # The sell order sells exactly what was bought
+            exchange.base_amount = exchange.sell_order.base_amount = order.filled_amount
+        exchange.history_append(order_type=order_type,
+                                ledger_num=last_fill['ledger_num'],
+                                timestamp=last_fill['timestamp'],
+                                price=order.average_fill_price,
+                                status='executed')
+        self.book.update(exchange)
+
+    def process_fills(self):
+        """
+        Apply the account's trades received since the last tick to the orders they filled.
+        Trades of offers not known yet (their submission has not been drained) are retried for a few ticks.
+        """
+        new_trade_list = self.fill_stream.drain()[::-1]
+        trade_list = self.unmatched_fill_trades + [(trade, UNMATCHED_FILL_TICKS) for trade in new_trade_list]
+        self.unmatched_fill_trades = []
+        for trade, ticks_left in trade_list:
+            if self.fill_offer_id(trade) is None:
+                continue  # Another pair, or filled when submitted (taken from the submit result)
+            if not self.apply_fill_trade(trade) and ticks_left > 1:
+                self.unmatched_fill_trades.append((trade, ticks_left - 1))
+        if not self.unmatched_fill_trades:
+            # Trades still waiting for their order would be lost on a restart from a later cursor
+            self.journal.record_fill_cursor(self.fill_stream.drained_cursor)
+
+    def fill_offer_id(self, trade: dict) -> str | None:
+        """
+        Returns:
+        - Id of the account's offer an account trade filled, or None if the trade is of another
+          pair or its order never rested on the book
+        """
+        trade_codes = {'XLM' if trade['base_asset_type'] == 'native' else trade['base_asset_code'],
+                       'XLM' if trade['counter_asset_type'] == 'native' else trade['counter_asset_code']}
+        if trade_codes != {self.base_asset_code, self.counter_asset_code}:
+            return None
+        offer_id = trade.get('base_offer_id') if trade.get('base_account') == self.account_id else trade.get('counter_offer_id')
+        if not offer_id or int(offer_id) & SYNTHETIC_OFFER_ID_FLAG:
             return None
+        return offer_id
+
+    def apply_fill_trade(self, trade: dict) -> bool:
+        """
+        Apply an account trade to the open order it filled.
+
+        Returns:
+        - False if no open order of the bot's exchanges matches the trade
+        """
+        self.ledger_cache.put(trade_ledger(trade), trade['ledger_close_time'])
+        offer_id = self.fill_offer_id(trade)
+        match = self.book.find_open_order(offer_id) if offer_id else None
+        if match is None:
+            return False
+        exchange, order_type = match
+        order = exchange.buy_order if order_type == 'buy' else exchange.sell_order
+        fill = self.trade_to_fill(trade)
+        if not order.fill_append(trade_id=fill['trade_id'],
+                                 ledger_num=fill['ledger_num'],
+                                 timestamp=fill['timestamp'],
+                                 base_amount=fill['base_amount'],
+                                 price=fill['price']):
+            return True
+        logging.info(f"Offer {order.offer_id} filled {fill['base_amount']} at {fill['price']} ({order.filled_amount}/{order.base_amount})")
+
+        # Keep the offer snapshot in step: a buy offer sells the counter asset, a sell offer the base asset
+        offer = (self.offers or {}).get(order.offer_id)
+        if offer is not None:
+            offer['amount'] = float(offer['amount']) - (fill['counter_amount'] if order_type == 'buy' else fill['base_amount'])
+        if order.is_filled:
+            if self.offers is not None:
+                self.offers.pop(order.offer_id, None)
+            self.complete_order(exchange, order_type)
+        else:
+            self.book.update(exchange)  # Journal the fill
+        return True
+
+    def get_ladder_offers(self) -> dict[str, dict]:
+        """
+        Get the open buy offers of the bot's exchanges as they are on the book.
+
+        Returns:
+        - Dictionary of {price, base_amount} keyed by offer id, base_amount including what was already filled
+        """
+        offers = self.get_offers() or {}
+        ladder_offers = {}
+        for exchange in self.book.in_state('open_buy'):
+            offer = offers.get(exchange.buy_order.offer_id)
+            if offer is not None and offer.get('price'):
+                # A buy offer is stored as selling the counter asset at a price in base asset per counter unit
+                offer_price = float(offer['price'])
+                ladder_offers[exchange.buy_order.offer_id] = {'price': 1 / offer_price,
+                                                              'base_amount': float(offer['amount']) * offer_price + exchange.buy_order.filled_amount}
+            else:
+                ladder_offers[exchange.buy_order.offer_id] = {'price': exchange.buy_order.history[-1]['price'],
+                                                              'base_amount': exchange.base_amount}
+        return ladder_offers
+
+    def reconcile_ladder(self,
+                         current_price: float,
+                         step: float,
+                         counter_amount: float):
+        """
+        Queue the minimal set of create/modify/delete operations that turns the open buy offers into the target ladder.
+
+        Parameters:
+        - current_price: Current market price
+        - step: Price distance between two ladder levels
+        - counter_amount: Counter asset amount to spend on each level
+        """
+        if not all(math.isfinite(value) and value > 0 for value in (current_price, step, counter_amount)):
+            # E.g. market data not loaded yet or a window without price variation: keep the ladder as it is
+            logging.warning(f"Skipping ladder reconciliation, invalid inputs: price {current_price}, step {step}, amount {counter_amount}")
+            return
+        if self.get_offers() is None:
+            return  # The book is unknown this tick, leave the offers as they are
+        ladder = self.ladder.target_ladder(current_price=current_price,
+                                           step=step,
+                                           counter_amount=counter_amount)
+        if not ladder:
+            return  # An empty target would delete every open buy offer
+        actions = self.ladder.diff(ladder=ladder,
+                                   offers=self.get_ladder_offers(),
+                                   step=step)
+        if actions:
+            logging.info(f"Ladder reconciliation: {[action['action'] for action in actions]}")
+
+        for action in actions:
+            if action['action'] == 'create':
+                self.create_new_exchange(base_amount=action['base_amount'],
+                                         price=action['price'])
+            elif action['action'] == 'modify':
+                exchange, _ = self.book.find_open_order(action['offer_id'])
+                remaining_amount = action['base_amount'] - exchange.buy_order.filled_amount
+                if remaining_amount <= 0:
+                    continue  # Already bought the level's amount, the fill events complete it
+                self.make_exchange_buy_order_price_changed(exchange=exchange,
+                                                           new_price=action['price'],
+                                                           new_base_amount=remaining_amount)
+            elif action['action'] == 'delete':
+                exchange, _ = self.book.find_open_order(action['offer_id'])
+                self.cancel_exchange_buy_order(exchange=exchange)
 
     #######################################################################################
     def do_exchange(self, 
@@ -328,129 +780,111 @@ class TradingBot:
                     price_std_dev):
         # price_dict = new_trade_list[0]['price']
         # current_price = float(price_dict['n']) / float(price_dict['d'])
+        # Apply the outcome of orders submitted on earlier ticks
+        self.submissions.drain(self.pair_name)
+
+        # Fills from the account's trade stream drive the order states; polling the offers is the fallback.
+        # They are applied even while transactions are pending, so fill detection never waits on the pipeline
+        fills_driven = self.fill_stream.is_alive()
+        if fills_driven:
+            self.process_fills()
+
+        num_in_flight = self.submissions.in_flight(self.pair_name)
+        if num_in_flight:
+            # Decisions wait for the book to reflect the orders still on their way into a ledger
+            logging.info(f"{num_in_flight} order transactions still pending, skipping this tick's decisions.")
+            return
+
         one_percent_price = price_std_dev * 2 / 100
         counter_asset_balance = self.get_asset_balance(self.counter_asset_code)
         counter_amount = counter_asset_balance * self.trading_capital_percent / 100
-        
+
+        self.ticks_since_offers_refresh += 1
+        if not fills_driven or self.offers_stale or self.ticks_since_offers_refresh >= OFFERS_REFRESH_TICKS:
+            # One offers request answers every open/executed check below
+            self.refresh_offers()
+            self.ticks_since_offers_refresh = 0
+
+        step = self.price_interval_percent * one_percent_price
+
         try:
-            if len(self.exchanges) < 1:  # First exchange -- place a buy order
-                buy_price = current_price - self.price_interval_percent*one_percent_price
-                buy_price = round(buy_price, 7)
-                base_amount = counter_amount / buy_price
-
-                self.create_new_exchange(base_amount=base_amount,
-                                         price=buy_price)
-                
-            else:
-                for exchange in self.exchanges:
-                    # print('exchange.buy_offer_id:', exchange.buy_offer_id)
-                    # print('exchange.buy_offer_id:', exchange.buy_offer_id)
-                    if exchange.status == "buy":  # buy status
-                        if exchange.buy_order.history[-1]['status'] == 'open':
-                            if self.check_offer_executed(exchange.buy_order.offer_id):  # If the buy order was executed
-                                last_history = exchange.buy_order.history[-1]
-                                ledger_num = last_history['ledger_num']
-                                ledger_close_time = self.get_ledger_close_time(ledger_num)
-                                buy_price = last_history['price']
-                                exchange.history_append(order_type='buy',
-                                                        ledger_num=ledger_num,
-                                                        timestamp=ledger_close_time,
-                                                        price=buy_price,
-                                                        status='executed')
-                                
-                            else:  # Buy order not executed yet, modify the price if necessary
-                                if abs(current_price - exchange.buy_order.history[-1]['price']) > self.price_interval_percent * one_percent_price:
-                                    new_buy_price = current_price - self.price_interval_percent * one_percent_price
-                                    new_buy_price = round(new_buy_price, 7)
-                                    self.make_exchange_buy_order_price_changed(exchange=exchange,
-                                                                            new_price=new_buy_price)
-                        elif exchange.buy_order.history[-1]['status'] == 'executed':
-                                last_history = exchange.buy_order.history[-1]
-                                buy_price = last_history['price']
-
-                                # Place the sell order
-                                sell_price = max(buy_price, current_price) + self.price_interval_percent * one_percent_price
-                                sell_price = round(sell_price, 7)
-                                self.make_exchange_order_new(exchange=exchange,
-                                                            price=sell_price,
-                                                            buy=False)
-                                
-                                # Place a new exchange and buy order
-                                new_buy_price = min(buy_price, current_price) - self.price_interval_percent * one_percent_price
-                                new_buy_price = round(new_buy_price, 7)
-                                base_amount = counter_amount / new_buy_price
-                                self.create_new_exchange(base_amount=base_amount,
-                                                         price=new_buy_price)
-                        else:
-                            raise ValueError(f"exchange.buy_order.history[-1]['status'] is not 'open' or 'executed'. ")
-                                
-                    elif exchange.status == "sell": # Sell order placed last
-                        if exchange.sell_order.history[-1]['status'] == 'open':
-                            if self.check_offer_executed(exchange.sell_order.offer_id):  # If the sell order was executed
-                                last_history = exchange.sell_order.history[-1]
-                                ledger_num = last_history['ledger_num']
-                                ledger_close_time = self.get_ledger_close_time(ledger_num)
-                                price = last_history['price']
-                                exchange.history_append(order_type='sell',
-                                                        ledger_num=ledger_num,
-                                                        timestamp=ledger_close_time,
-                                                        price=price,
-                                                        status='executed')
-                                
-                                # Now place a new exchange-buy order below the sell price
-                                new_buy_price = sell_price - self.price_interval_percent * one_percent_price
-                                base_amount = counter_amount / new_buy_price
-
-                                self.create_new_exchange(base_amount=base_amount,
-                                                         price=new_buy_price)
-                            else:
-                                pass
-                        elif exchange.sell_order.history[-1]['status'] == 'executed':
-                            pass
-                        else:
-                            raise ValueError(f"exchange.sell_order.history[-1]['status'] is not 'open' or 'executed'. ")
+            # With fill events, only bought exchanges (waiting for their sell order) need a look each tick
+            for exchange in (self.book.in_state('bought') if fills_driven else self.book.live()):
+                # print('exchange.buy_offer_id:', exchange.buy_offer_id)
+                if exchange.status == "buy":  # buy status
+                    if exchange.buy_order.history[-1]['status'] == 'open':
+                        if not fills_driven and self.check_offer_executed(exchange.buy_order.offer_id):  # If the buy order was executed
+                            last_history = exchange.buy_order.history[-1]
+                            ledger_num = last_history['ledger_num']
+                            ledger_close_time = self.get_ledger_close_time(ledger_num)
+                            buy_price = last_history['price']
+                            exchange.history_append(order_type='buy',
+                                                    ledger_num=ledger_num,
+                                                    timestamp=ledger_close_time,
+                                                    price=buy_price,
+                                                    status='executed')
+                            self.book.update(exchange)
+                        # Open buy orders are kept on the ladder by reconcile_ladder below
+                    elif exchange.buy_order.history[-1]['status'] == 'executed':
+                            last_history = exchange.buy_order.history[-1]
+                            buy_price = last_history['price']
+
+                            # Place the sell order
+                            sell_price = max(buy_price, current_price) + step
+                            sell_price = round(sell_price, 7)
+                            self.make_exchange_order_new(exchange=exchange,
+                                                        price=sell_price,
+                                                        buy=False)
+                    else:
+                        raise ValueError(f"exchange.buy_order.history[-1]['status'] is not 'open' or 'executed'. ")
+                            
+                elif exchange.status == "sell": # Sell order placed last
+                    if exchange.sell_order.history[-1]['status'] == 'open':
+                        if not fills_driven and self.check_offer_executed(exchange.sell_order.offer_id):  # If the sell order was executed
+                            last_history = exchange.sell_order.history[-1]
+                            ledger_num = last_history['ledger_num']
+                            ledger_close_time = self.get_ledger_close_time(ledger_num)
+                            price = last_history['price']
+                            exchange.history_append(order_type='sell',
+                                                    ledger_num=ledger_num,
+                                                    timestamp=ledger_close_time,
+                                                    price=price,
+                                                    status='executed')
+                            self.book.update(exchange)
+                    elif exchange.sell_order.history[-1]['status'] == 'executed':
+                        pass
                     else:
-                            raise ValueError(f"exchange.status is not 'buy' or 'sell'. ")
+                        raise ValueError(f"exchange.sell_order.history[-1]['status'] is not 'open' or 'executed'. ")
+                else:
+                        raise ValueError(f"exchange.status is not 'buy' or 'sell'. ")
+
+            # Filled levels are replaced and the ladder follows the price with the fewest operations
+            self.reconcile_ladder(current_price=current_price,
+                                  step=step,
+                                  counter_amount=counter_amount)
         except Exception as e:
             logging.error(f"Error in do_exchange: {e}")
 
+        # Submit every order decided during this tick together
+        self.flush_orders()
+
 
 
 
 
     def fetch_trading_history(self):
         try:
-            transactions = self.server.transactions().for_account(self.keypair.public_key).limit(200).order(desc=True).call()
-            trades = []
-
-            for transaction in transactions['_embedded']['records']:
-                operations = self.server.operations().for_transaction(transaction['id']).call()['_embedded']['records']
-                
-                for operation in operations:
-                    if operation['type'] in ['manage_buy_offer', 'manage_sell_offer']:
-                        action = "Buy" if operation['type'] == 'manage_buy_offer' else "Sell"
-                        buy_asset = operation.get('buying_asset_code', 'XLM')
-                        sell_asset = operation.get('selling_asset_code', 'XLM')
-                        amount = float(operation.get('amount', 0))
-                        price = float(operation.get('price', 0))
-                        total = amount * price
-
-                        trades.append({
-                            "Time": transaction['created_at'],
-                            "Sell": sell_asset,
-                            "Buy": buy_asset,
-                            "Amount": amount,
-                            "Price": price,
-                            "Total": total
-                        })
-
-            trades_df = pd.DataFrame(trades) if trades else pd.DataFrame(columns=["Time", "Sell", "Buy", "Amount", "Price", "Total"])
+            if getattr(self, 'account_history', None) is None or self.account_history.account_id != self.account_id:
+                self.account_history = AccountHistory(self.account_id)
+            # Only operations newer than the stored cursor are fetched
+            self.account_history.update()
+            trades_df = self.account_history.to_df()
             logging.info(f"Fetched trades: {trades_df}")
             return trades_df
 
         except Exception as e:
             logging.error(f"Error fetching trading history: {e}")
-            return pd.DataFrame(columns=["Time", "Sell", "Buy", "Amount", "Price", "Total"])
+            return pd.DataFrame(columns=TRADING_HISTORY_COLUMNS)
 
 
     
\ No newline at end of file
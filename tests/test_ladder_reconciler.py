@@ -0,0 +1,50 @@
+from engine.ladder_reconciler import LadderReconciler
+
+STEP = 0.01
+
+
+def offers_on(ladder: list[dict]) -> dict[str, dict]:
+    return {f"offer-{index}": dict(level) for index, level in enumerate(ladder)}
+
+
+def test_target_ladder_sits_on_the_grid_below_the_price():
+    ladder = LadderReconciler(num_levels=3).target_ladder(current_price=0.1234, step=STEP, counter_amount=10.0)
+
+    assert [level['price'] for level in ladder] == [0.12, 0.11, 0.1]
+    assert ladder[0]['base_amount'] == 10.0 / 0.12
+
+
+def test_ladder_already_on_the_book_needs_no_operations():
+    reconciler = LadderReconciler(num_levels=3)
+    ladder = reconciler.target_ladder(0.1234, STEP, 10.0)
+
+    assert reconciler.diff(ladder, offers_on(ladder), STEP) == []
+
+
+def test_price_move_of_one_step_moves_one_offer():
+    reconciler = LadderReconciler(num_levels=3)
+    offers = offers_on(reconciler.target_ladder(0.1234, STEP, 10.0))  # 0.12, 0.11, 0.10
+
+    actions = reconciler.diff(reconciler.target_ladder(0.1334, STEP, 10.0), offers, STEP)  # 0.13, 0.12, 0.11
+    assert actions == [{'action': 'modify', 'offer_id': 'offer-2', 'price': 0.13, 'base_amount': 10.0 / 0.13}]
+
+
+def test_changed_amount_modifies_the_offer_in_place():
+    reconciler = LadderReconciler(num_levels=2)
+    ladder = reconciler.target_ladder(0.1234, STEP, 10.0)
+    offers = offers_on(ladder)
+    offers['offer-1']['base_amount'] *= 0.5  # Partly filled
+
+    actions = reconciler.diff(ladder, offers, STEP)
+    assert actions == [{'action': 'modify', 'offer_id': 'offer-1', **ladder[1]}]
+
+
+def test_leftover_offers_are_deleted_and_missing_levels_created():
+    reconciler = LadderReconciler(num_levels=3)
+    ladder = reconciler.target_ladder(0.1234, STEP, 10.0)
+
+    fewer_levels = LadderReconciler(num_levels=2).diff(ladder[:2], offers_on(ladder), STEP)
+    assert fewer_levels == [{'action': 'delete', 'offer_id': 'offer-2', 'price': 0.1, 'base_amount': 0.0}]
+
+    missing_level = reconciler.diff(ladder, offers_on(ladder[:2]), STEP)
+    assert missing_level == [{'action': 'create', 'offer_id': None, **ladder[2]}]
@@ -0,0 +1,102 @@
+from stellar_sdk import Asset, Keypair, xdr
+
+from utils.offer_results import decode_offer_results
+
+SELLER = Keypair.random()
+MAKER = Keypair.random()
+VELO = Asset("VELO", Keypair.random().public_key)
+
+
+def claimed_offer(offer_id: int, amount_sold: float, amount_bought: float) -> xdr.ClaimAtom:
+    """A maker's offer taken by the transaction: the maker sold VELO for XLM."""
+    return xdr.ClaimAtom(type=xdr.ClaimAtomType.CLAIM_ATOM_TYPE_ORDER_BOOK,
+                         order_book=xdr.ClaimOfferAtom(seller_id=MAKER.xdr_account_id(),
+                                                       offer_id=xdr.Int64(offer_id),
+                                                       asset_sold=VELO.to_xdr_object(),
+                                                       amount_sold=xdr.Int64(int(amount_sold * 10 ** 7)),
+                                                       asset_bought=Asset.native().to_xdr_object(),
+                                                       amount_bought=xdr.Int64(int(amount_bought * 10 ** 7))))
+
+
+def sell_offer_result(effect: xdr.ManageOfferEffect, claimed: list, offer_id: int = 0, amount: float = 0.0) -> xdr.OperationResult:
+    offer = None
+    if effect != xdr.ManageOfferEffect.MANAGE_OFFER_DELETED:
+        offer = xdr.OfferEntry(seller_id=SELLER.xdr_account_id(),
+                               offer_id=xdr.Int64(offer_id),
+                               selling=Asset.native().to_xdr_object(),
+                               buying=VELO.to_xdr_object(),
+                               amount=xdr.Int64(int(amount * 10 ** 7)),
+                               price=xdr.Price(n=xdr.Int32(1), d=xdr.Int32(4)),
+                               flags=xdr.Uint32(0),
+                               ext=xdr.OfferEntryExt(0))
+    success = xdr.ManageOfferSuccessResult(offers_claimed=claimed,
+                                           offer=xdr.ManageOfferSuccessResultOffer(effect=effect, offer=offer))
+    manage_sell_offer_result = xdr.ManageSellOfferResult(code=xdr.ManageSellOfferResultCode.MANAGE_SELL_OFFER_SUCCESS,
+                                                         success=success)
+    return xdr.OperationResult(code=xdr.OperationResultCode.opINNER,
+                               tr=xdr.OperationResultTr(type=xdr.OperationType.MANAGE_SELL_OFFER,
+                                                        manage_sell_offer_result=manage_sell_offer_result))
+
+
+def bump_sequence_result() -> xdr.OperationResult:
+    return xdr.OperationResult(code=xdr.OperationResultCode.opINNER,
+                               tr=xdr.OperationResultTr(type=xdr.OperationType.BUMP_SEQUENCE,
+                                                        bump_seq_result=xdr.BumpSequenceResult(xdr.BumpSequenceResultCode.BUMP_SEQUENCE_SUCCESS)))
+
+
+def transaction_result_xdr(operation_results: list) -> str:
+    return xdr.TransactionResult(fee_charged=xdr.Int64(100),
+                                 result=xdr.TransactionResultResult(code=xdr.TransactionResultCode.txSUCCESS,
+                                                                    results=operation_results),
+                                 ext=xdr.TransactionResultExt(0)).to_xdr()
+
+
+def test_created_offer_left_on_the_book():
+    offer_results = decode_offer_results(transaction_result_xdr([
+        sell_offer_result(xdr.ManageOfferEffect.MANAGE_OFFER_CREATED, [], offer_id=42, amount=10.0)]))
+
+    assert offer_results == [{'offer_id': '42',
+                              'effect': 'created',
+                              'amount': 10.0,
+                              'price': 0.25,
+                              'fully_claimed': False,
+                              'fills': [],
+                              'operation_index': 0}]
+
+
+def test_partly_filled_offer_keeps_its_fills():
+    offer_results = decode_offer_results(transaction_result_xdr([
+        sell_offer_result(xdr.ManageOfferEffect.MANAGE_OFFER_UPDATED, [claimed_offer(7, 20.0, 5.0)], offer_id=42, amount=5.0)]))
+
+    assert offer_results[0]['effect'] == 'updated'
+    assert offer_results[0]['amount'] == 5.0
+    assert not offer_results[0]['fully_claimed']
+    # Seen from the submitting account: it bought what the maker sold
+    assert offer_results[0]['fills'] == [{'offer_id': '7', 'bought_amount': 20.0, 'sold_amount': 5.0}]
+
+
+def test_fully_claimed_offer_is_deleted():
+    offer_results = decode_offer_results(transaction_result_xdr([
+        sell_offer_result(xdr.ManageOfferEffect.MANAGE_OFFER_DELETED, [claimed_offer(7, 20.0, 5.0), claimed_offer(8, 8.0, 2.0)])]))
+
+    assert offer_results[0]['offer_id'] is None
+    assert offer_results[0]['effect'] == 'deleted'
+    assert offer_results[0]['fully_claimed']
+    assert [fill['offer_id'] for fill in offer_results[0]['fills']] == ['7', '8']
+
+
+def test_cancelled_offer_is_deleted_without_fills():
+    offer_results = decode_offer_results(transaction_result_xdr([
+        sell_offer_result(xdr.ManageOfferEffect.MANAGE_OFFER_DELETED, [])]))
+
+    assert offer_results[0]['effect'] == 'deleted'
+    assert not offer_results[0]['fully_claimed']
+
+
+def test_other_operations_keep_their_index():
+    offer_results = decode_offer_results(transaction_result_xdr([
+        bump_sequence_result(),
+        sell_offer_result(xdr.ManageOfferEffect.MANAGE_OFFER_CREATED, [], offer_id=42, amount=10.0)]))
+
+    assert offer_results[0] is None
+    assert offer_results[1]['operation_index'] == 1
@@ -0,0 +1,27 @@
+import numpy as np
+
+from utils.price_range import PriceRange
+
+
+def test_price_range_slides_extremes_with_the_window():
+    price_range = PriceRange(capacity=3)
+    price_range.reset(np.array([3.0, 1.0, 2.0]))
+    price_range.update(np.array([5.0]), num_evicted=1)
+
+    assert (price_range.min, price_range.max) == (1.0, 5.0)
+    price_range.update(np.array([4.0]), num_evicted=1)
+    assert (price_range.min, price_range.max) == (2.0, 5.0)
+
+
+def test_price_range_percentiles_follow_the_window():
+    rng = np.random.default_rng(0)
+    price_range = PriceRange(capacity=10_000)
+    price_range.reset(rng.uniform(1.0, 2.0, 10_000))
+
+    assert abs(price_range.quantile(0.5) - 1.5) < 0.02
+    assert abs(price_range.percent_rank(1.25) - 25) < 2
+
+    # The window moves on to higher prices and the old block digests are dropped
+    price_range.update(rng.uniform(3.0, 4.0, 10_000), num_evicted=10_000)
+    assert abs(price_range.quantile(0.5) - 3.5) < 0.05
+    assert price_range.percent_rank(2.0) < 10
@@ -0,0 +1,75 @@
+import time
+
+from engine.scheduler import EngineScheduler
+
+
+class StubMarketData:
+    def __init__(self, name: str, price: float, update_seconds: float = 0.0):
+        self.name = name
+        self.current_price = price
+        self.mean_price = price
+        self.price_std_dev = 0.1
+        self.ready = True
+        self.update_seconds = update_seconds
+        self.num_updates = 0
+
+    def update(self):
+        time.sleep(self.update_seconds)
+        self.num_updates += 1
+
+    def stats(self) -> dict:
+        return {'current_price': self.current_price}
+
+    def stop(self):
+        pass
+
+
+class StubBot:
+    def __init__(self, base_asset_code: str):
+        self.account_id = "GACCOUNT"
+        self.base_asset_code = base_asset_code
+        self.counter_asset_code = "XLM"
+        self.prices = []
+
+    def do_exchange(self, current_price, mean_price, price_std_dev):
+        self.prices.append(current_price)
+
+    def stop(self):
+        pass
+
+
+def run_ticks(scheduler: EngineScheduler, num_ticks: int, interval: float = 0.05):
+    for _ in range(num_ticks):
+        scheduler.tick()
+        time.sleep(interval)
+
+
+def test_slow_pair_update_does_not_hold_up_the_ticks():
+    scheduler = EngineScheduler(tick_interval=0.05, max_workers=4)
+    scheduler.market_data = {('SLOW', 'XLM'): StubMarketData("SLOW/XLM", 1.0, update_seconds=1.0),
+                             ('VELO', 'XLM'): StubMarketData("VELO/XLM", 2.0)}
+    scheduler.bots = {'slow': StubBot('SLOW'), 'velo': StubBot('VELO')}
+
+    start = time.monotonic()
+    run_ticks(scheduler, 6)
+    elapsed = time.monotonic() - start
+    scheduler.stop()
+
+    assert elapsed < 1.0  # The scheduler never waited on the slow update
+
+
+def test_bots_tick_on_their_pair_prices_while_another_pair_is_slow():
+    scheduler = EngineScheduler(tick_interval=0.05, max_workers=4)
+    slow_market_data = StubMarketData("SLOW/XLM", 1.0, update_seconds=1.0)
+    velo_market_data = StubMarketData("VELO/XLM", 2.0)
+    scheduler.market_data = {('SLOW', 'XLM'): slow_market_data, ('VELO', 'XLM'): velo_market_data}
+    slow_bot, velo_bot = StubBot('SLOW'), StubBot('VELO')
+    scheduler.bots = {'slow': slow_bot, 'velo': velo_bot}
+
+    run_ticks(scheduler, 6)
+    num_slow_updates = slow_market_data.num_updates
+    scheduler._executor.shutdown(wait=True)
+
+    assert velo_market_data.num_updates >= 4
+    assert len(velo_bot.prices) >= 3 and set(velo_bot.prices) == {2.0}
+    assert num_slow_updates == 0 and slow_bot.prices == []  # No prices before its first update completes
@@ -0,0 +1,66 @@
+from stellar_sdk import Account, Keypair
+
+from engine.sequence_manager import SequenceManager
+
+ACCOUNT_ID = Keypair.random().public_key
+
+
+class StubServer:
+    def __init__(self, sequence: int):
+        self.sequence = sequence
+        self.num_loads = 0
+
+    def load_account(self, account_id: str) -> Account:
+        self.num_loads += 1
+        return Account(account_id, self.sequence)
+
+
+def test_reserve_hands_out_consecutive_sequence_numbers():
+    sequence_manager = SequenceManager(StubServer(100), ACCOUNT_ID)
+
+    # TransactionBuilder signs with the account sequence + 1
+    assert [sequence_manager.reserve().sequence + 1 for _ in range(3)] == [101, 102, 103]
+    assert sequence_manager.next_sequence == 104
+
+
+def test_rejected_last_sequence_number_is_given_back():
+    sequence_manager = SequenceManager(StubServer(100), ACCOUNT_ID)
+    sequence_manager.reserve()
+
+    sequence_manager.reject(101, {'transaction': 'tx_insufficient_fee'})
+    assert sequence_manager.next_sequence == 101
+    assert sequence_manager.reserve().sequence + 1 == 101
+
+
+def test_rejected_sequence_number_is_kept_once_a_later_one_is_out():
+    sequence_manager = SequenceManager(StubServer(100), ACCOUNT_ID)
+    sequence_manager.reserve()
+    sequence_manager.reserve()
+
+    sequence_manager.reject(101, None)
+    assert sequence_manager.next_sequence == 103
+
+
+def test_failed_transaction_consumed_its_sequence_number():
+    sequence_manager = SequenceManager(StubServer(100), ACCOUNT_ID)
+    sequence_manager.reserve()
+
+    sequence_manager.reject(101, {'transaction': 'tx_failed'})
+    assert sequence_manager.next_sequence == 102
+    assert sequence_manager.confirmed_sequence == 101
+
+
+def test_bad_sequence_waits_for_a_sync():
+    server = StubServer(100)
+    sequence_manager = SequenceManager(server, ACCOUNT_ID)
+    sequence_manager.reserve()
+
+    sequence_manager.reject(101, {'transaction': 'tx_bad_seq'})
+    assert sequence_manager.needs_sync
+    assert server.num_loads == 1  # Not reloaded while other transactions may be outstanding
+
+    server.sequence = 110
+    sequence_manager.sync()
+    assert not sequence_manager.needs_sync
+    assert sequence_manager.next_sequence == 111
+    assert sequence_manager.confirmed_sequence == 110
@@ -0,0 +1,61 @@
+import json
+
+from engine.state_journal import StateJournal
+
+
+def exchange(exchange_id: str, state: str) -> dict:
+    return {'exchange_id': exchange_id, 'state': state}
+
+
+def test_state_is_recovered_from_snapshot_and_journal(tmp_path):
+    journal = StateJournal("bot", journal_dir=str(tmp_path), snapshot_interval=3)
+    journal.load()
+    journal.record_exchange(exchange("a", "buying"))
+    journal.record_exchange(exchange("b", "buying"))
+    journal.record_removed("a")  # Third record: snapshot taken
+    journal.record_exchange(exchange("b", "selling"))
+    journal.record_fill_cursor("5-0")
+    journal.close()  # As if the process died here
+
+    records, fill_cursor = StateJournal("bot", journal_dir=str(tmp_path), snapshot_interval=3).load()
+    assert records == [exchange("b", "selling")]
+    assert fill_cursor == "5-0"
+
+
+def test_recovery_ignores_a_partly_written_record(tmp_path):
+    journal = StateJournal("bot", journal_dir=str(tmp_path))
+    journal.load()
+    journal.record_exchange(exchange("a", "buying"))
+    journal.close()
+    with open(journal.journal_path, 'a') as journal_file:
+        journal_file.write('{"type": "removed", "exchan')
+
+    records, _ = StateJournal("bot", journal_dir=str(tmp_path)).load()
+    assert records == [exchange("a", "buying")]
+
+
+def test_journal_records_already_in_the_snapshot_are_not_replayed(tmp_path):
+    journal = StateJournal("bot", journal_dir=str(tmp_path))
+    with open(journal.snapshot_path, 'w') as snapshot_file:
+        json.dump({'sequence': 2, 'fill_cursor': "4-0", 'exchanges': {"a": exchange("a", "selling")}}, snapshot_file)
+    # A journal that was not cleared before the process died after the snapshot
+    with open(journal.journal_path, 'w') as journal_file:
+        journal_file.write(json.dumps({'type': 'exchange', 'exchange': exchange("a", "buying"), 'sequence': 1}) + '\n')
+        journal_file.write(json.dumps({'type': 'fill_cursor', 'cursor': "3-0", 'sequence': 2}) + '\n')
+        journal_file.write(json.dumps({'type': 'exchange', 'exchange': exchange("b", "buying"), 'sequence': 3}) + '\n')
+
+    records, fill_cursor = journal.load()
+    assert sorted(records, key=lambda record: record['exchange_id']) == [exchange("a", "selling"), exchange("b", "buying")]
+    assert fill_cursor == "4-0"
+    assert journal.sequence == 3
+
+
+def test_unchanged_fill_cursor_is_not_recorded_again(tmp_path):
+    journal = StateJournal("bot", journal_dir=str(tmp_path))
+    journal.load()
+    journal.record_fill_cursor("5-0")
+    journal.record_fill_cursor("5-0")
+    journal.record_fill_cursor("now")
+
+    assert journal.sequence == 1
+    journal.close()
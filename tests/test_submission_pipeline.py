@@ -0,0 +1,135 @@
+import json
+import time
+
+import pytest
+from stellar_sdk import Account, Keypair, ManageSellOffer, Asset, Network, TransactionBuilder, xdr
+from stellar_sdk.client.response import Response
+from stellar_sdk.exceptions import BadRequestError, BadResponseError
+
+from engine.sequence_manager import SequenceManager
+from engine.submission_pipeline import SubmissionPipeline
+
+KEYPAIR = Keypair.random()
+ACCOUNT_SEQUENCE = 100
+
+
+def error_result_xdr(code: xdr.TransactionResultCode) -> str:
+    return xdr.TransactionResult(fee_charged=xdr.Int64(100),
+                                 result=xdr.TransactionResultResult(code=code),
+                                 ext=xdr.TransactionResultExt(0)).to_xdr()
+
+
+def horizon_answer(status_code: int, tx_status: str, **fields) -> Response:
+    return Response(status_code=status_code,
+                    text=json.dumps({'tx_status': tx_status, 'hash': 'abc', **fields}),
+                    headers={},
+                    url="http://horizon/transactions_async")
+
+
+class StubServer:
+    """Horizon stand-in answering async submissions from a script and finding every pending transaction in a ledger."""
+    def __init__(self, answers: list):
+        self.answers = answers
+        self.num_submissions = 0
+        self.num_loads = 0
+
+    def load_account(self, account_id: str) -> Account:
+        self.num_loads += 1
+        return Account(account_id, ACCOUNT_SEQUENCE)
+
+    def submit_transaction_async(self, transaction) -> dict:
+        self.num_submissions += 1
+        answer = self.answers.pop(0)
+        if 400 <= answer.status_code < 500:
+            raise BadRequestError(answer)
+        if answer.status_code >= 500:
+            raise BadResponseError(answer)
+        return json.loads(answer.text)
+
+    def transactions(self):
+        return self
+
+    def transaction(self, transaction_hash: str):
+        self.transaction_hash = transaction_hash
+        return self
+
+    def call(self) -> dict:
+        return {'hash': self.transaction_hash, 'successful': True}
+
+
+def build_transaction(source_account: Account):
+    transaction = (TransactionBuilder(source_account=source_account,
+                                      network_passphrase=Network.TESTNET_NETWORK_PASSPHRASE,
+                                      base_fee=100)
+                   .append_operation(ManageSellOffer(selling=Asset.native(),
+                                                     buying=Asset("VELO", KEYPAIR.public_key),
+                                                     amount="1",
+                                                     price="1"))
+                   .set_timeout(30)
+                   .build())
+    transaction.sign(KEYPAIR)
+    return transaction
+
+
+def submit_and_wait(server: StubServer, timeout: float = 5.0) -> tuple[SubmissionPipeline, list]:
+    pipeline = SubmissionPipeline(server, SequenceManager(server, KEYPAIR.public_key), poll_interval=0.01)
+    results = []
+    assert pipeline.submit(build_transaction, results.append, owner="VELO/XLM")
+    deadline = time.monotonic() + timeout
+    while not results and time.monotonic() < deadline:
+        pipeline.drain("VELO/XLM")
+        time.sleep(0.01)
+    pipeline.stop()
+    return pipeline, results
+
+
+def test_pending_transaction_resolves_with_its_record():
+    server = StubServer([horizon_answer(201, 'PENDING')])
+    pipeline, results = submit_and_wait(server)
+
+    assert results == [{'hash': 'abc', 'successful': True}]
+    assert pipeline.sequence_manager.confirmed_sequence == ACCOUNT_SEQUENCE + 1
+
+
+def test_duplicate_counts_as_accepted():
+    server = StubServer([horizon_answer(409, 'DUPLICATE')])
+    pipeline, results = submit_and_wait(server)
+
+    assert results == [{'hash': 'abc', 'successful': True}]
+    assert pipeline.sequence_manager.confirmed_sequence == ACCOUNT_SEQUENCE + 1
+
+
+def test_try_again_later_is_submitted_again():
+    server = StubServer([horizon_answer(503, 'TRY_AGAIN_LATER'), horizon_answer(201, 'PENDING')])
+    pipeline, results = submit_and_wait(server)
+
+    assert server.num_submissions == 2
+    assert results == [{'hash': 'abc', 'successful': True}]
+
+
+def test_bad_sequence_resyncs_the_account():
+    server = StubServer([horizon_answer(400, 'ERROR', errorResultXdr=error_result_xdr(xdr.TransactionResultCode.txBAD_SEQ))])
+    pipeline = SubmissionPipeline(server, SequenceManager(server, KEYPAIR.public_key), poll_interval=0.01)
+    results = []
+    pipeline.submit(build_transaction, results.append, owner="VELO/XLM")
+
+    deadline = time.monotonic() + 5.0
+    while server.num_loads < 2 and time.monotonic() < deadline:
+        pipeline.drain("VELO/XLM")
+        time.sleep(0.01)
+    pipeline.stop()
+    pipeline.drain("VELO/XLM")
+
+    assert results == [None]
+    assert server.num_loads == 2  # Loaded at startup, then resynced
+    assert not pipeline.sequence_manager.needs_sync
+
+
+@pytest.mark.parametrize('code', [xdr.TransactionResultCode.txINSUFFICIENT_FEE, xdr.TransactionResultCode.txBAD_AUTH])
+def test_rejected_transaction_gives_its_sequence_number_back(code):
+    server = StubServer([horizon_answer(400, 'ERROR', errorResultXdr=error_result_xdr(code))])
+    pipeline, results = submit_and_wait(server)
+
+    assert results == [None]
+    assert pipeline.sequence_manager.next_sequence == ACCOUNT_SEQUENCE + 1
+    assert not pipeline.sequence_manager.needs_sync
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import utils.trade_stream
+from utils.stellar_api import get_asset
+from utils.trade_store import TradeStore
+from utils.trade_stream import TradeStream
+
+ACCOUNT_ID = "GDM4RQUQQUVSKQA7S6EM7XBZP3FCGH4Q7CL6TABQ7B2BEJ5ERARM2M5M"
+TRADES = [{'id': f"{operation_id}-0", 'paging_token': f"{operation_id}-0"} for operation_id in range(1, 7)]
+
+
+class StandInHorizon(BaseHTTPRequestHandler):
+    """
+    Stand-in for Horizon's trades stream. The first connection sends the first three trades,
+    one of them twice, then drops; later connections send the trades after their cursor and
+    stay open.
+    """
+    protocol_version = 'HTTP/1.1'
+    cursors: list[str] = []
+    requests: list[tuple[str, dict]] = []  # (path, query parameters) of each connection
+
+    def log_message(self, *args):
+        pass
+
+    def send_event(self, data):
+        chunk = f"data: {json.dumps(data)}\n\n".encode()
+        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        self.requests.append((url.path, query))
+        cursor = query['cursor']
+        self.cursors.append(cursor)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.send_event("hello")
+
+        start = 0 if cursor == "now" else int(cursor.split('-')[0])
+        if len(self.cursors) == 1:
+            for trade in TRADES[start:start + 3] + [TRADES[1]]:
+                self.send_event(trade)
+            self.wfile.write(b"0\r\n\r\n")  # End of the stream
+            self.close_connection = True
+            return
+        for trade in TRADES[start:]:
+            self.send_event(trade)
+        time.sleep(30)
+
+
+@pytest.fixture
+def horizon_url():
+    StandInHorizon.cursors = []
+    StandInHorizon.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHorizon)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def drain_until(trade_stream: TradeStream, num_trades: int, timeout: float = 5.0) -> list[dict]:
+    trade_list = []
+    deadline = time.monotonic() + timeout
+    while len(trade_list) < num_trades and time.monotonic() < deadline:
+        trade_list = trade_stream.drain() + trade_list  # Newest first
+        time.sleep(0.05)
+    return trade_list
+
+
+def test_trade_stream_resumes_from_last_paging_token(horizon_url):
+    trade_stream = TradeStream("VELO", "XLM", cursor="0-0", account_id=ACCOUNT_ID,
+                               horizon_url=horizon_url, min_backoff=0.05)
+    trade_stream.start()
+    try:
+        trade_list = drain_until(trade_stream, len(TRADES))
+    finally:
+        trade_stream.stop()
+
+    assert [trade['paging_token'] for trade in reversed(trade_list)] == [trade['paging_token'] for trade in TRADES]
+    assert StandInHorizon.cursors[:2] == ["0-0", "3-0"]
+
+
+def test_trade_stream_skips_trades_already_delivered(horizon_url):
+    trade_stream = TradeStream("VELO", "XLM", cursor="0-0", account_id=ACCOUNT_ID,
+                               horizon_url=horizon_url, min_backoff=0.05)
+    trade_stream.start()
+    try:
+        trade_list = drain_until(trade_stream, len(TRADES))
+        time.sleep(0.2)
+        trade_list = trade_stream.drain() + trade_list
+    finally:
+        trade_stream.stop()
+
+    paging_tokens = [trade['paging_token'] for trade in trade_list]
+    assert len(paging_tokens) == len(set(paging_tokens)) == len(TRADES)
+
+
+def test_trade_stream_stops_without_waiting_for_a_trade(horizon_url):
+    trade_stream = TradeStream("VELO", "XLM", cursor="0-0", account_id=ACCOUNT_ID,
+                               horizon_url=horizon_url, min_backoff=0.05)
+    trade_stream.start()
+    drain_until(trade_stream, len(TRADES))  # The stand-in now keeps the stream open without sending
+
+    trade_stream.stop()
+    trade_stream._thread.join(2.0)
+    assert not trade_stream.is_alive()
+
+
+def test_pair_trade_stream_writes_through_to_the_trade_store(horizon_url, tmp_path, monkeypatch):
+    trade_store = TradeStore(str(tmp_path / "trades.sqlite3"))
+    monkeypatch.setattr(utils.trade_stream, 'get_trade_store', lambda: trade_store)
+    trade_store.append("VELO", "XLM", TRADES[:1])  # Stored before, e.g. by the backfill
+
+    trade_stream = TradeStream("VELO", "XLM", cursor=TRADES[0]['paging_token'], horizon_url=horizon_url, min_backoff=0.05)
+    trade_stream.start()
+    try:
+        trade_list = drain_until(trade_stream, len(TRADES) - 1)
+    finally:
+        trade_stream.stop()
+
+    velo = get_asset("VELO")
+    path, query = StandInHorizon.requests[0]
+    assert path == "/trades"
+    assert query == {'base_asset_type': velo.type,
+                     'base_asset_code': "VELO",
+                     'base_asset_issuer': velo.issuer,
+                     'counter_asset_type': "native",
+                     'cursor': TRADES[0]['paging_token']}
+
+    # Each drained batch follows the stored trades, so the store holds them as one gap-free range
+    assert len(trade_list) == len(TRADES) - 1
+    stored_trade_list = trade_store.load_last_trade_list("VELO", "XLM", 100)
+    assert [trade['paging_token'] for trade in stored_trade_list] == [trade['paging_token'] for trade in reversed(TRADES)]
+    assert trade_store.get_cursor("VELO", "XLM") == TRADES[-1]['paging_token']
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+
+import pandas as pd
+
+from utils.stellar_api import get_server
+from utils.utils import paging_token_key
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ACCOUNT_HISTORY_PATH = "data/account_history.sqlite3"
+OFFER_OPERATION_TYPES = ('manage_buy_offer', 'manage_sell_offer')
+TRADING_HISTORY_COLUMNS = ["Time", "Sell", "Buy", "Amount", "Price", "Total"]
+
+
+class AccountHistory:
+    """
+    Local, incrementally updated history of an account's offer operations.
+
+    It pages through the account's operations endpoint (with their transactions joined in)
+    from the last stored cursor, so the first update fetches the full history once and later
+    updates only fetch operations that are new since then.
+    """
+    def __init__(self, account_id: str, db_path: str = ACCOUNT_HISTORY_PATH):
+        self.account_id = account_id
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS operations (
+                account TEXT NOT NULL,
+                operation_id INTEGER NOT NULL,
+                operation TEXT NOT NULL,
+                PRIMARY KEY (account, operation_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS cursors (
+                account TEXT PRIMARY KEY,
+                cursor TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def get_cursor(self) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT cursor FROM cursors WHERE account = ?", (self.account_id,)).fetchone()
+        return row[0] if row else None
+
+    def update(self) -> int:
+        """
+        Fetch the account's operations since the stored cursor and store its offer operations.
+
+        Returns:
+        - Number of new offer operations
+        """
+        server = get_server()
+        cursor = self.get_cursor()
+        num_new = 0
+
+        while True:
+            # Fetch up to 200 operations per request (API limit)
+            operations_request = server.operations().for_account(self.account_id).join("transactions").order(desc=False).limit(200)
+            if cursor:
+                operations_request = operations_request.cursor(cursor)
+            records = operations_request.call()['_embedded']['records']
+            if not records:
+                break
+
+            rows = [(self.account_id, paging_token_key(operation['paging_token'])[0], json.dumps(operation))
+                    for operation in records if operation['type'] in OFFER_OPERATION_TYPES]
+            cursor = records[-1]['paging_token']
+            with self._lock:
+                self._conn.executemany("INSERT OR IGNORE INTO operations (account, operation_id, operation) VALUES (?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?)", (self.account_id, cursor))
+                self._conn.commit()
+            num_new += len(rows)
+
+            if len(records) < 200:
+                break
+
+        logging.info(f"Fetched {num_new} new offer operations for account {self.account_id} up to cursor {cursor}")
+        return num_new
+
+    def load_operations(self, limit: int | None = None) -> list[dict]:
+        """
+        Returns:
+        - List of stored offer operation dictionaries, newest first
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT operation FROM operations WHERE account = ? ORDER BY operation_id DESC LIMIT ?",
+                                      (self.account_id, -1 if limit is None else limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def to_df(self, limit: int | None = None) -> pd.DataFrame:
+        """
+        Returns:
+        - DataFrame of the offer operations (Time, Sell, Buy, Amount, Price, Total), newest first
+        """
+        trades = []
+        for operation in self.load_operations(limit):
+            amount = float(operation.get('amount', 0))
+            price = float(operation.get('price', 0))
+            transaction = operation.get('transaction') or {}
+            trades.append({
+                "Time": transaction.get('created_at', operation['created_at']),
+                "Sell": operation.get('selling_asset_code', 'XLM'),
+                "Buy": operation.get('buying_asset_code', 'XLM'),
+                "Amount": amount,
+                "Price": price,
+                "Total": amount * price
+            })
+        return pd.DataFrame(trades) if trades else pd.DataFrame(columns=TRADING_HISTORY_COLUMNS)
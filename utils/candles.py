@@ -0,0 +1,184 @@
+import asyncio
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils.stellar_api import fetch_trade_aggregations
+from utils.trade_buffer import RingBuffer
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CANDLE_RESOLUTIONS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+
+
+class CandleBuffer(RingBuffer):
+    """Ring buffer of OHLCV candles of one resolution, oldest first."""
+    def __init__(self, resolution: int, capacity: int):
+        super().__init__(capacity, {'starts': np.int64,
+                                    'opens': np.float64,
+                                    'highs': np.float64,
+                                    'lows': np.float64,
+                                    'closes': np.float64,
+                                    'volumes': np.float64})
+        self.resolution = resolution
+
+    def append_candles(self, candles: dict[str, np.ndarray]):
+        """Append candles newer than the last one, merging a first candle that continues it."""
+        if len(candles['starts']) == 0:
+            return
+        if self._size and candles['starts'][0] == self.column('starts')[-1]:
+            last_row = np.array([self._size - 1])
+            self._set_rows(last_row, {'highs': np.maximum(self.column('highs')[-1:], candles['highs'][:1]),
+                                      'lows': np.minimum(self.column('lows')[-1:], candles['lows'][:1]),
+                                      'closes': candles['closes'][:1],
+                                      'volumes': self.column('volumes')[-1:] + candles['volumes'][:1]})
+            candles = {name: column[1:] for name, column in candles.items()}
+        self._append(candles)
+
+    def to_df(self) -> pd.DataFrame:
+        return pd.DataFrame({'timestamp': pd.to_datetime(self.column('starts'), unit='s', utc=True),
+                             'open': self.column('opens'),
+                             'high': self.column('highs'),
+                             'low': self.column('lows'),
+                             'close': self.column('closes'),
+                             'volume': self.column('volumes')})
+
+
+def merge_candles(resolution: int, candles: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Merge time-ordered candles into candles of the given (coarser or equal) resolution, vectorized.
+
+    Parameters:
+    - resolution: Candle length in seconds
+    - candles: Dictionary of candle columns (starts, opens, highs, lows, closes, volumes), oldest first
+
+    Returns:
+    - Dictionary of the merged candle columns
+    """
+    if len(candles['starts']) == 0:
+        return candles
+    buckets = candles['starts'] - candles['starts'] % resolution
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+    ends = np.append(starts[1:], len(buckets)) - 1
+    return {'starts': buckets[starts],
+            'opens': candles['opens'][starts],
+            'highs': np.maximum.reduceat(candles['highs'], starts),
+            'lows': np.minimum.reduceat(candles['lows'], starts),
+            'closes': candles['closes'][ends],
+            'volumes': np.add.reduceat(candles['volumes'], starts)}
+
+
+def trades_to_candles(resolution: int,
+                      timestamps: np.ndarray,
+                      prices: np.ndarray,
+                      volumes: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Aggregate time-ordered trades into OHLCV candles of the given resolution.
+    Each trade is a one-trade candle, merged with merge_candles.
+    """
+    return merge_candles(resolution, {'starts': timestamps,
+                                      'opens': prices,
+                                      'highs': prices,
+                                      'lows': prices,
+                                      'closes': prices,
+                                      'volumes': volumes})
+
+
+def aggregations_to_candles(aggregation_list: list[dict]) -> dict[str, np.ndarray]:
+    """Convert Horizon trade aggregation records into candle columns."""
+    return {'starts': np.array([int(record['timestamp']) // 1000 for record in aggregation_list], dtype=np.int64),
+            'opens': np.array([record['open'] for record in aggregation_list], dtype=np.float64),
+            'highs': np.array([record['high'] for record in aggregation_list], dtype=np.float64),
+            'lows': np.array([record['low'] for record in aggregation_list], dtype=np.float64),
+            'closes': np.array([record['close'] for record in aggregation_list], dtype=np.float64),
+            'volumes': np.array([record['base_volume'] for record in aggregation_list], dtype=np.float64)}
+
+
+class CandleAggregator:
+    """
+    Multi-resolution OHLCV candles of an asset pair, kept up to date as trades are ingested.
+
+    Completed candles are backfilled from Horizon's trade_aggregations endpoint, so long
+    lookbacks cost a few requests instead of a scan of raw trades. After that, every ingested
+    trade batch updates each resolution in time proportional to the batch size.
+    """
+    def __init__(self,
+                 base_asset_code: str,
+                 counter_asset_code: str,
+                 resolutions: dict[str, int] = CANDLE_RESOLUTIONS,
+                 num_candles: int = 500):
+        self.base_asset_code = base_asset_code
+        self.counter_asset_code = counter_asset_code
+        self.resolutions = resolutions
+        self.candles = {name: CandleBuffer(resolution, num_candles) for name, resolution in resolutions.items()}
+
+    def backfill(self,
+                 timestamps: np.ndarray,
+                 prices: np.ndarray,
+                 volumes: np.ndarray):
+        """
+        Load the history of every resolution, then the trade window for the running candles.
+
+        Horizon returns completed candles only, so the running candle of each resolution is
+        built from the finer resolutions' candles of the same period, and the running minute
+        from the given trades.
+
+        Parameters:
+        - timestamps, prices, volumes: Columns of the current trade window, oldest first
+        """
+        if len(timestamps) == 0:
+            return
+        now = int(timestamps[-1])
+
+        # Completed candles of every resolution, fetched concurrently
+        resolutions = sorted(self.resolutions.items(), key=lambda item: item[1])
+
+        async def fetch_all_aggregations():
+            return await asyncio.gather(*[asyncio.to_thread(fetch_trade_aggregations,
+                                                            self.base_asset_code,
+                                                            self.counter_asset_code,
+                                                            resolution,
+                                                            now - now % resolution - self.candles[name].capacity * resolution,
+                                                            now - now % resolution)
+                                          for name, resolution in resolutions])
+
+        aggregation_lists = asyncio.run(fetch_all_aggregations())
+
+        # Running candle of the finest resolution, from the raw trades
+        finest = resolutions[0][1]
+        running = timestamps >= now - now % finest
+        finer_candles = trades_to_candles(finest, timestamps[running], prices[running], volumes[running])
+
+        for (name, resolution), aggregation_list in zip(resolutions, aggregation_lists):
+            candle_buffer = self.candles[name]
+            candle_buffer.clear()
+            candle_buffer.append_candles(aggregations_to_candles(aggregation_list))
+
+            # Running candle from the finer resolution's candles of the same period
+            in_period = finer_candles['starts'] >= now - now % resolution
+            candle_buffer.append_candles(merge_candles(resolution, {column: values[in_period] for column, values in finer_candles.items()}))
+            finer_candles = {column: candle_buffer.column(column).copy() for column in finer_candles}
+
+    def add_trades(self,
+                   timestamps: np.ndarray,
+                   prices: np.ndarray,
+                   volumes: np.ndarray):
+        """
+        Update every resolution with newly ingested trades.
+
+        Parameters:
+        - timestamps, prices, volumes: Columns of the new trades, oldest first
+        """
+        if len(timestamps) == 0:
+            return
+        for name, resolution in self.resolutions.items():
+            self.candles[name].append_candles(trades_to_candles(resolution, timestamps, prices, volumes))
+
+    def get_candles(self, name: str) -> pd.DataFrame:
+        """
+        Returns:
+        - DataFrame with timestamp/open/high/low/close/volume columns of the given resolution (e.g. "5m")
+        """
+        return self.candles[name].to_df()
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LEDGER_CACHE_PATH = "data/ledgers.sqlite3"
+
+_ledger_caches: dict[str | None, "LedgerCache"] = {}
+_ledger_caches_lock = threading.Lock()
+
+
+class LedgerCache:
+    """
+    Bounded LRU cache of ledger close times, optionally persisted to an SQLite file.
+
+    A closed ledger never changes, so entries never expire; the least recently used ones are
+    only evicted from memory beyond the capacity (and stay on disk when persisted).
+    """
+    def __init__(self,
+                 capacity: int = 10000,
+                 db_path: str | None = LEDGER_CACHE_PATH):
+        """
+        Parameters:
+        - capacity: Number of ledgers kept in memory
+        - db_path: Path of the SQLite file to persist to, None to keep the cache in memory only
+        """
+        self.capacity = capacity
+        self.db_path = db_path
+        self._close_times: OrderedDict[int, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if db_path:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS ledgers (ledger INTEGER PRIMARY KEY, closed_at TEXT NOT NULL)")
+            self._conn.commit()
+
+    def get(self, ledger_num: int) -> str | None:
+        """
+        Returns:
+        - Close time of the ledger, or None if it is not cached
+        """
+        with self._lock:
+            close_time = self._close_times.get(ledger_num)
+            if close_time is not None:
+                self._close_times.move_to_end(ledger_num)
+                return close_time
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT closed_at FROM ledgers WHERE ledger = ?", (ledger_num,)).fetchone()
+        if row is None:
+            return None
+        self.put(ledger_num, row[0], persist=False)
+        return row[0]
+
+    def put(self, ledger_num: int, close_time: str, persist: bool = True):
+        """Cache the close time of a ledger."""
+        with self._lock:
+            known = ledger_num in self._close_times
+            self._close_times[ledger_num] = close_time
+            self._close_times.move_to_end(ledger_num)
+            while len(self._close_times) > self.capacity:
+                self._close_times.popitem(last=False)
+            if persist and not known and self._conn is not None:
+                self._conn.execute("INSERT OR IGNORE INTO ledgers (ledger, closed_at) VALUES (?, ?)", (ledger_num, close_time))
+                self._conn.commit()
+
+
+def get_ledger_cache(db_path: str | None = LEDGER_CACHE_PATH) -> LedgerCache:
+    """
+    Get the process-wide ledger cache for the given database file.
+
+    Parameters:
+    - db_path: Path of the SQLite database, None for an in-memory cache
+
+    Returns:
+    - A LedgerCache shared by all callers
+    """
+    ledger_cache = _ledger_caches.get(db_path)
+    if ledger_cache is None:
+        with _ledger_caches_lock:
+            ledger_cache = _ledger_caches.get(db_path)
+            if ledger_cache is None:
+                ledger_cache = LedgerCache(db_path=db_path)
+                _ledger_caches[db_path] = ledger_cache
+                logging.info(f"Opened ledger cache at {db_path}")
+    return ledger_cache
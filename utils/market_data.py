@@ -0,0 +1,364 @@
+import threading
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.time_conversions import convert_time_to_utc, get_time_now_utc
+from utils.stellar_api import load_last_trade_list, fetch_trades_since, load_config
+from utils.trade_stream import TradeStream
+from utils.trade_buffer import TradeBuffer, SecondBuffer, parse_trade_list
+from utils.rolling_stats import RollingStats
+from utils.price_range import PriceRange
+from utils.candles import CandleAggregator
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class MarketData:
+    """
+    Market data of an asset pair: a window of its last trades with per-second aggregates,
+    multi-resolution candles, the window's extremes and price statistics.
+
+    It does not depend on Streamlit, so the UI and the headless trading engine keep their
+    market data the same way.
+    """
+    def __init__(self,
+                 base_asset_code: str,
+                 counter_asset_code: str,
+                 num_trades: int = 1000,
+                 trade_feed: str | None = None,
+                 init_retry_interval: float = 10.0):
+        """
+        Parameters:
+        - base_asset_code: Base asset code (e.g., "VELO")
+        - counter_asset_code: Counter asset code (e.g., "XLM")
+        - num_trades: Number of trades in the window
+        - trade_feed: "stream" or "poll", the configured trade feed if None
+        - init_retry_interval: Seconds between two attempts of update() to initialize market data whose init() failed
+        """
+        self.base_asset_code = base_asset_code
+        self.counter_asset_code = counter_asset_code
+        self.num_trades = num_trades
+        self.trade_feed = trade_feed or load_config().get('trade_feed', 'stream')
+        self.init_retry_interval = init_retry_interval
+        self._next_init_attempt = 0.0
+
+        self.trade_buffer: TradeBuffer | None = None
+        self.second_buffer: SecondBuffer | None = None
+        self.candles: CandleAggregator | None = None
+        self.price_range: PriceRange | None = None
+        self.price_stats: RollingStats | None = None
+        self.trade_stream: TradeStream | None = None
+
+        self.current_price = 0
+        self.mean_price = 0
+        self.price_std_dev = 0
+        self.min_price = 10000
+        self.max_price = 0
+        self.price_low = 0  # 1st percentile of the window's prices
+        self.price_high = 0  # 99th percentile of the window's prices
+        self.price_percentile = None  # Percentage of the window's trades at or below the current price
+        self.new_trade_list: list[dict] = []
+        self.last_paging_token = ""
+        self.last_trade_time = get_time_now_utc()
+        self.last_update_time = get_time_now_utc()
+        self.trade_df = pd.DataFrame()
+
+    @property
+    def name(self) -> str:
+        return f"{self.base_asset_code}/{self.counter_asset_code}"
+
+    @property
+    def ready(self) -> bool:
+        """True once the initial trade window is in, so prices and statistics are meaningful."""
+        return self.trade_buffer is not None
+
+    def init(self) -> bool:
+        """
+        Fetch the initial trade window, build the aggregates on it and start the trade feed.
+
+        Returns:
+        - False if the initial trade data could not be fetched; update() then tries again
+        """
+        logging.info(f"Initializing market data for pair: {self.name}")
+        self._next_init_attempt = time.monotonic() + self.init_retry_interval
+        try:
+            # Fetch the trade data
+            trade_list = load_last_trade_list(base_asset_code=self.base_asset_code,
+                                              counter_asset_code=self.counter_asset_code,
+                                              num_trades=self.num_trades)
+            trade_buffer = TradeBuffer(capacity=self.num_trades)
+            trade_buffer.append(*parse_trade_list(trade_list))
+            self.trade_buffer = trade_buffer
+
+            # Aggregate the window per second, the trade DataFrame is rebuilt from it on the next update
+            self.second_buffer = SecondBuffer(capacity=trade_buffer.capacity)
+            self.second_buffer.add(trade_buffer.timestamps, trade_buffer.prices, trade_buffer.volumes)
+            self.trade_df = pd.DataFrame()
+
+            # Multi-resolution candles: history from Horizon's trade aggregations, running candles from the window
+            self.candles = CandleAggregator(base_asset_code=self.base_asset_code,
+                                            counter_asset_code=self.counter_asset_code)
+            self.candles.backfill(trade_buffer.timestamps, trade_buffer.prices, trade_buffer.volumes)
+            logging.info(f"Initial trade data fetched: {len(trade_list)} trades.")
+
+            # Update last trade time and the cursor of the newest trade
+            self.last_trade_time = convert_time_to_utc(trade_list[0]['ledger_close_time'])
+            self.last_paging_token = trade_list[0]['paging_token']
+            logging.info(f"Last trade time: {self.last_trade_time}")
+
+            prices = trade_buffer.prices
+            self.price_range = PriceRange(capacity=trade_buffer.capacity)
+            self.price_range.reset(prices)
+            self.min_price = self.price_range.min            # Minimum price of the trade window
+            self.max_price = self.price_range.max            # Maximum price of the trade window
+
+            self.price_stats = RollingStats(reset_interval=trade_buffer.capacity)
+            self.price_stats.reset(prices, trade_buffer.volumes)
+            self.update_price_stats()
+            self.current_price = self.second_buffer.prices[-1]
+            self.update_price_percentiles()
+
+        except Exception as e:
+            logging.error(f"Error fetching initial trade data: {e}")
+            self.trade_buffer = None  # Not ready, whatever part was built
+            return False
+
+        if self.trade_feed == 'stream':
+            self.start_trade_stream()
+        return True
+
+    def start_trade_stream(self):
+        """Start the streaming trade feed, resuming after the newest known trade."""
+        self.stop_trade_stream()
+        self.trade_stream = TradeStream(base_asset_code=self.base_asset_code,
+                                        counter_asset_code=self.counter_asset_code,
+                                        cursor=self.last_paging_token or "now")
+        self.trade_stream.start()
+
+    def stop_trade_stream(self):
+        """Stop the streaming trade feed, if one is running."""
+        if self.trade_stream:
+            self.trade_stream.stop()
+            self.trade_stream = None
+
+    def stop(self):
+        self.stop_trade_stream()
+
+    def update(self) -> list[dict]:
+        """
+        Take the trades since the last update and move the window and its aggregates by them.
+
+        Returns:
+        - List of new trade dictionaries, newest first
+        """
+        if not self.ready:
+            # The initial fetch failed: try again every init_retry_interval seconds
+            if time.monotonic() >= self._next_init_attempt:
+                self.init()
+            return []
+        try:
+            if self.trade_stream:
+                # Streaming mode: take the trades pushed by the SSE feed, no request is made
+                new_trade_list = self.trade_stream.drain()
+            elif self.last_paging_token:
+                # Polling mode: one ascending request from the last seen trade
+                new_trade_list, _ = fetch_trades_since(base_asset_code=self.base_asset_code,
+                                                       counter_asset_code=self.counter_asset_code,
+                                                       cursor=self.last_paging_token)
+            else:
+                new_trade_list = []
+            self.new_trade_list = new_trade_list
+            if not new_trade_list:
+                if not self.trade_stream:
+                    logging.info("No new trades found.")
+                return new_trade_list
+
+            logging.info(f"Fetched {len(new_trade_list)} new trades.")
+            trade_buffer = self.trade_buffer
+            new_timestamps, new_prices, new_volumes = parse_trade_list(new_trade_list)
+            evicted_timestamps, evicted_prices, evicted_volumes = trade_buffer.append(new_timestamps, new_prices, new_volumes)
+
+            # Move the per-second aggregate by the trades that left and entered the window
+            self.second_buffer.remove(evicted_timestamps, evicted_prices, evicted_volumes)
+            self.second_buffer.add(new_timestamps[-trade_buffer.capacity:], new_prices[-trade_buffer.capacity:], new_volumes[-trade_buffer.capacity:])
+            self.candles.add_trades(new_timestamps, new_prices, new_volumes)
+
+            # Update last trade time and the cursor of the newest trade
+            self.last_trade_time = convert_time_to_utc(new_trade_list[0]['ledger_close_time'])
+            self.last_paging_token = new_trade_list[0]['paging_token']
+            logging.info(f"Last trade time: {self.last_trade_time}")
+
+            # Prices and volumes are views on the buffer, no copy is made
+            prices = trade_buffer.prices
+
+            # Slide the window extremes and quantiles with the trades that entered and left the window
+            self.price_range.update(new_prices[-trade_buffer.capacity:], num_evicted=len(evicted_prices))
+            self.min_price = self.price_range.min
+            self.max_price = self.price_range.max
+
+            # Update the mean and standard deviation with the trades that entered and left the window
+            if self.price_stats.needs_reset:
+                self.price_stats.reset(prices, trade_buffer.volumes)
+            else:
+                self.price_stats.update(added=(new_prices[-trade_buffer.capacity:], new_volumes[-trade_buffer.capacity:]),
+                                        evicted=(evicted_prices, evicted_volumes))
+            self.update_price_stats()
+            self.current_price = self.second_buffer.prices[-1]
+            self.update_price_percentiles()
+            return new_trade_list
+
+        except Exception as e:
+            logging.error(f"Error updating trade list: {e}")
+            return []
+
+    def update_price_stats(self):
+        """Take the window's mean price and standard deviation, volume-weighted if configured."""
+        if load_config().get('volume_weighted_stats', False):
+            self.mean_price = self.price_stats.weighted_mean            # Volume-weighted mean price
+            self.price_std_dev = self.price_stats.weighted_std_dev            # Volume-weighted standard deviation of prices
+        else:
+            self.mean_price = self.price_stats.mean            # Mean price
+            self.price_std_dev = self.price_stats.std_dev            # Price standard deviation
+
+    def update_price_percentiles(self):
+        """Take the window's outlier-free price range and the current price's percentile from the quantile sketch."""
+        self.price_low = self.price_range.quantile(0.01)
+        self.price_high = self.price_range.quantile(0.99)
+        self.price_percentile = self.price_range.percent_rank(self.current_price)
+
+    def update_trade_df(self) -> pd.DataFrame:
+        """
+        Returns:
+        - DataFrame of the per-second trades (timestamp, price, volume) for display,
+          with a trailing row at the current time
+        """
+        if self.second_buffer is None or len(self.second_buffer) == 0:
+            logging.info("No valid trades to process.")
+            return pd.DataFrame(columns=['timestamp',
+                                         'price',
+                                         'volume'])
+
+        time_now_utc = get_time_now_utc() # Ensure this is in UTC
+        if self.trade_df.empty or self.new_trade_list:
+            # Build the DataFrame from the per-second aggregate (duplicated timestamps already have
+            # their volume summed and their price averaged), plus a trailing row at the current time
+            prices = self.second_buffer.prices
+            timestamps = pd.to_datetime(self.second_buffer.seconds, unit='s', utc=True)
+            self.trade_df = pd.DataFrame({'timestamp': timestamps.append(pd.DatetimeIndex([time_now_utc])),
+                                          'price': np.append(prices, prices[-1]),
+                                          'volume': np.append(self.second_buffer.volumes, 0.0)})
+        else:
+            # Nothing traded since the last update: only move the trailing row to the current time
+            self.trade_df.iat[-1, self.trade_df.columns.get_loc('timestamp')] = time_now_utc
+
+        self.last_update_time = time_now_utc
+        return self.trade_df
+
+    def stats(self) -> dict:
+        """
+        Returns:
+        - Dictionary of the current price, window statistics and last trade time
+        """
+        return {'current_price': float(self.current_price),
+                'mean_price': float(self.mean_price),
+                'price_std_dev': float(self.price_std_dev),
+                'min_price': float(self.min_price),
+                'max_price': float(self.max_price),
+                'price_low': float(self.price_low),
+                'price_high': float(self.price_high),
+                'price_percentile': self.price_percentile,
+                'last_trade_time': str(self.last_trade_time),
+                'last_paging_token': self.last_paging_token}
+
+
+class MarketDataService:
+    """
+    Shared ingestion of a pair's market data for any number of viewers.
+
+    A single background thread updates the pair's MarketData once per interval and publishes
+    a snapshot of what the charts show (prices, stats and the trade DataFrame). Viewers only
+    read the latest snapshot, and candles are built once per update whoever asks for them
+    first, so Horizon traffic and CPU stay the same however many viewers there are.
+    """
+    def __init__(self,
+                 market_data: MarketData,
+                 interval: float = 1.0):
+        """
+        Parameters:
+        - market_data: Market data of the pair, not initialized yet
+        - interval: Seconds between two updates
+        """
+        self.market_data = market_data
+        self.interval = interval
+
+        self._snapshot: dict = {}
+        self._version = 0  # Number of updates with new trades so far
+        self._candles: dict[str, tuple[int, pd.DataFrame]] = {}  # resolution -> (version, candles)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Fetch the initial trade window, then keep updating it in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            self.market_data.init()
+            self._publish()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"MarketDataService-{self.market_data.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.market_data.stop()
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+        - Latest snapshot: current_price, mean_price, price_std_dev, min_price, max_price,
+          price_low, price_high, price_percentile, last_trade_time, last_update_time and trade_df (not to be modified)
+        """
+        return self._snapshot
+
+    def get_candles(self, name: str) -> pd.DataFrame:
+        """
+        Returns:
+        - Candles of the given resolution (same as CandleAggregator.get_candles), built at most once per update
+        """
+        with self._lock:
+            version, candle_df = self._candles.get(name, (None, None))
+            if version != self._version:
+                candle_df = self.market_data.candles.get_candles(name) if self.market_data.candles else pd.DataFrame()
+                self._candles[name] = (self._version, candle_df)
+        return candle_df
+
+    def _publish(self):
+        market_data = self.market_data
+        trade_df = market_data.update_trade_df()
+        if market_data.new_trade_list or not self._snapshot:
+            self._version += 1
+        # A copy, as the trailing row of the DataFrame is moved in place on updates without trades
+        self._snapshot = {'current_price': market_data.current_price,
+                          'mean_price': market_data.mean_price,
+                          'price_std_dev': market_data.price_std_dev,
+                          'min_price': market_data.min_price,
+                          'max_price': market_data.max_price,
+                          'price_low': market_data.price_low,
+                          'price_high': market_data.price_high,
+                          'price_percentile': market_data.price_percentile,
+                          'last_trade_time': market_data.last_trade_time,
+                          'last_update_time': market_data.last_update_time,
+                          'trade_df': trade_df.copy()}
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                with self._lock:
+                    self.market_data.update()
+                    self._publish()
+            except Exception as e:
+                logging.error(f"Error updating market data for pair: {self.market_data.name}: {e}")
@@ -0,0 +1,81 @@
+from stellar_sdk.xdr import TransactionResult, OperationType, ManageOfferEffect, ClaimAtomType
+
+STROOPS_PER_UNIT = 10 ** 7
+
+
+def _claim_atom_to_fill(claim_atom) -> dict:
+    """
+    Convert a claimed offer (or liquidity pool claim) into a fill seen from the submitting account.
+
+    The claimed offer's sold amount is what the submitting account bought, and vice versa.
+    """
+    if claim_atom.type == ClaimAtomType.CLAIM_ATOM_TYPE_V0:
+        atom = claim_atom.v0
+    elif claim_atom.type == ClaimAtomType.CLAIM_ATOM_TYPE_ORDER_BOOK:
+        atom = claim_atom.order_book
+    else:
+        atom = claim_atom.liquidity_pool
+    offer_id = getattr(atom, 'offer_id', None)
+    return {'offer_id': str(offer_id.int64) if offer_id is not None else None,
+            'bought_amount': atom.amount_sold.int64 / STROOPS_PER_UNIT,
+            'sold_amount': atom.amount_bought.int64 / STROOPS_PER_UNIT}
+
+
+def decode_offer_results(result_xdr: str) -> list[dict | None]:
+    """
+    Decode the ManageBuyOffer/ManageSellOffer results of a submitted transaction.
+
+    Parameters:
+    - result_xdr: The result_xdr field of the Horizon submit response
+
+    Returns:
+    - List with one entry per operation (None for operations that are not offer operations), each a
+      dictionary with:
+      - offer_id: Id of the created or updated offer, None if nothing is left on the book
+      - effect: 'created', 'updated' or 'deleted'
+      - amount: Amount of the offer left on the book (selling asset), 0 if nothing is left
+      - price: Price of the offer as units of buying asset per unit of selling asset (as in Horizon offer records)
+      - fully_claimed: True if the offer was filled in full when submitted
+      - fills: List of {offer_id, bought_amount, sold_amount} for each claimed offer
+      - operation_index: Index of the operation in the transaction
+    """
+    transaction_result = TransactionResult.from_xdr(result_xdr)
+    offer_results = []
+    for operation_index, operation_result in enumerate(transaction_result.result.results or []):
+        tr = operation_result.tr
+        if tr is None:
+            offer_results.append(None)
+            continue
+        if tr.type == OperationType.MANAGE_BUY_OFFER:
+            manage_offer_result = tr.manage_buy_offer_result
+        elif tr.type == OperationType.MANAGE_SELL_OFFER:
+            manage_offer_result = tr.manage_sell_offer_result
+        else:
+            offer_results.append(None)
+            continue
+
+        success = manage_offer_result.success
+        if success is None:
+            offer_results.append(None)
+            continue
+
+        fills = [_claim_atom_to_fill(claim_atom) for claim_atom in success.offers_claimed]
+        if success.offer.effect == ManageOfferEffect.MANAGE_OFFER_DELETED:
+            # Nothing left on the book: filled in full (or deleted on request with amount 0)
+            offer_results.append({'offer_id': None,
+                                  'effect': 'deleted',
+                                  'amount': 0.0,
+                                  'price': None,
+                                  'fully_claimed': bool(fills),
+                                  'fills': fills,
+                                  'operation_index': operation_index})
+        else:
+            offer = success.offer.offer
+            offer_results.append({'offer_id': str(offer.offer_id.int64),
+                                  'effect': 'created' if success.offer.effect == ManageOfferEffect.MANAGE_OFFER_CREATED else 'updated',
+                                  'amount': offer.amount.int64 / STROOPS_PER_UNIT,
+                                  'price': offer.price.n.int32 / offer.price.d.int32,
+                                  'fully_claimed': False,
+                                  'fills': fills,
+                                  'operation_index': operation_index})
+    return offer_results
@@ -0,0 +1,261 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class SlidingMinMax:
+    """
+    Minimum and maximum of a FIFO window in amortized O(1) per trade, using monotonic deques.
+
+    Each deque holds (sequence number, price) pairs. Prices that can never become the
+    window's extreme again are dropped on insert, and entries leaving the window are dropped
+    from the front when the oldest sequence number moves past them.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._min_deque: deque = deque()
+        self._max_deque: deque = deque()
+        self._next_seq = 0
+        self._oldest_seq = 0
+
+    @property
+    def min(self) -> float | None:
+        return self._min_deque[0][1] if self._min_deque else None
+
+    @property
+    def max(self) -> float | None:
+        return self._max_deque[0][1] if self._max_deque else None
+
+    def add(self, price: float):
+        while self._min_deque and self._min_deque[-1][1] >= price:
+            self._min_deque.pop()
+        while self._max_deque and self._max_deque[-1][1] <= price:
+            self._max_deque.pop()
+        self._min_deque.append((self._next_seq, price))
+        self._max_deque.append((self._next_seq, price))
+        self._next_seq += 1
+
+    def evict(self, num_trades: int):
+        """Remove the oldest num_trades trades from the window."""
+        self._oldest_seq = min(self._oldest_seq + num_trades, self._next_seq)
+        while self._min_deque and self._min_deque[0][0] < self._oldest_seq:
+            self._min_deque.popleft()
+        while self._max_deque and self._max_deque[0][0] < self._oldest_seq:
+            self._max_deque.popleft()
+
+
+class TDigest:
+    """
+    Mergeable t-digest quantile sketch (merging variant with the k1 scale function).
+
+    Values are buffered and periodically compressed into at most about `compression`
+    centroids, which are small near the tails, so extreme quantiles stay accurate.
+    Quantile and rank queries are O(log n) in the number of centroids.
+    """
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self._means = np.zeros(0)
+        self._weights = np.zeros(0)
+        self._buffer_means: list[float] = []
+        self._buffer_weights: list[float] = []
+        self.total_weight = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer_means.append(value)
+        self._buffer_weights.append(weight)
+        self.total_weight += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer_means) >= 5 * self.compression:
+            self._compress()
+
+    def add_batch(self, values: np.ndarray, weights: np.ndarray | None = None):
+        if len(values) == 0:
+            return
+        weights = np.ones(len(values)) if weights is None else weights
+        self._buffer_means.extend(values.tolist())
+        self._buffer_weights.extend(weights.tolist())
+        self.total_weight += float(np.sum(weights))
+        self.min = min(self.min, float(np.min(values)))
+        self.max = max(self.max, float(np.max(values)))
+        if len(self._buffer_means) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        """Fold another digest into this one."""
+        other._compress()
+        self._buffer_means.extend(other._means.tolist())
+        self._buffer_weights.extend(other._weights.tolist())
+        self.total_weight += other.total_weight
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer_means:
+            return
+        means = np.concatenate([self._means, self._buffer_means])
+        weights = np.concatenate([self._weights, self._buffer_weights])
+        self._buffer_means, self._buffer_weights = [], []
+
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order].tolist(), weights[order].tolist()
+        total = self.total_weight
+
+        new_means, new_weights = [], []
+        current_mean, current_weight = means[0], weights[0]
+        weight_so_far = 0.0
+        q_limit = self._k_inverse(self._k(0.0) + 1)
+        for mean, weight in zip(means[1:], weights[1:]):
+            if (weight_so_far + current_weight + weight) / total <= q_limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                new_means.append(current_mean)
+                new_weights.append(current_weight)
+                weight_so_far += current_weight
+                q_limit = self._k_inverse(self._k(weight_so_far / total) + 1)
+                current_mean, current_weight = mean, weight
+        new_means.append(current_mean)
+        new_weights.append(current_weight)
+
+        self._means = np.array(new_means)
+        self._weights = np.array(new_weights)
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the value below which a fraction q of the weight lies."""
+        self._compress()
+        if self.total_weight == 0:
+            return None
+        # Centroid centers sit at the middle of their cumulative weight
+        centers = np.cumsum(self._weights) - self._weights / 2
+        positions = np.concatenate([[0.0], centers, [self.total_weight]])
+        values = np.concatenate([[self.min], self._means, [self.max]])
+        return float(np.interp(q * self.total_weight, positions, values))
+
+    def cdf(self, value: float) -> float | None:
+        """Estimate the fraction of the weight at or below a value."""
+        self._compress()
+        if self.total_weight == 0:
+            return None
+        if value <= self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        centers = np.cumsum(self._weights) - self._weights / 2
+        positions = np.concatenate([[0.0], centers, [self.total_weight]])
+        values = np.concatenate([[self.min], self._means, [self.max]])
+        return float(np.interp(value, values, positions)) / self.total_weight
+
+
+class SlidingQuantiles:
+    """
+    Approximate quantiles over the last `capacity` trades.
+
+    The window is cut into blocks of `block_size` trades, each summarized by its own t-digest.
+    Whole blocks are dropped once the newer blocks cover the capacity, so the window is exact
+    up to one block. Queries merge the block digests once and cache the result until the next
+    change.
+    """
+    def __init__(self, capacity: int, num_blocks: int = 16, compression: float = 100):
+        self.capacity = capacity
+        self.block_size = max(math.ceil(capacity / num_blocks), 1)
+        self.compression = compression
+        self.reset()
+
+    def reset(self):
+        self._blocks: deque = deque()  # (number of trades, TDigest)
+        self._merged: TDigest | None = None
+
+    def add_batch(self, prices: np.ndarray, volumes: np.ndarray | None = None):
+        start = 0
+        while start < len(prices):
+            if not self._blocks or self._blocks[-1][0] >= self.block_size:
+                self._blocks.append([0, TDigest(self.compression)])
+            block = self._blocks[-1]
+            end = min(start + self.block_size - block[0], len(prices))
+            block[1].add_batch(prices[start:end], None if volumes is None else volumes[start:end])
+            block[0] += end - start
+            start = end
+
+        # Drop the oldest blocks that are no longer needed to cover the window
+        num_trades = sum(block[0] for block in self._blocks)
+        while self._blocks and num_trades - self._blocks[0][0] >= self.capacity:
+            num_trades -= self._blocks.popleft()[0]
+        self._merged = None
+
+    def _digest(self) -> TDigest:
+        if self._merged is None:
+            self._merged = TDigest(self.compression)
+            for _, digest in self._blocks:
+                self._merged.merge(digest)
+        return self._merged
+
+    def quantile(self, q: float) -> float | None:
+        return self._digest().quantile(q)
+
+    def percent_rank(self, price: float) -> float | None:
+        """Percentage (0-100) of the window's trades at or below the price."""
+        rank = self._digest().cdf(price)
+        return None if rank is None else rank * 100
+
+
+class PriceRange:
+    """
+    Streaming price range of the trade window: exact sliding min/max plus approximate quantiles.
+    It mirrors the TradeBuffer it is fed from, so trades are evicted in the same order.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.min_max = SlidingMinMax()
+        self.quantiles = SlidingQuantiles(capacity)
+
+    def reset(self, prices: np.ndarray):
+        self.min_max.reset()
+        self.quantiles.reset()
+        self.update(prices, num_evicted=0)
+
+    def update(self, added_prices: np.ndarray, num_evicted: int):
+        """
+        Parameters:
+        - added_prices: Prices of the trades entering the window, oldest first
+        - num_evicted: Number of trades that left the window
+        """
+        self.min_max.evict(num_evicted)
+        for price in added_prices.tolist():
+            self.min_max.add(price)
+        self.quantiles.add_batch(added_prices)
+
+    @property
+    def min(self) -> float | None:
+        return self.min_max.min
+
+    @property
+    def max(self) -> float | None:
+        return self.min_max.max
+
+    def quantile(self, q: float) -> float | None:
+        return self.quantiles.quantile(q)
+
+    def percent_rank(self, price: float) -> float | None:
+        return self.quantiles.percent_rank(price)
+
+    def to_percent_scale(self, price: float, current_price: float) -> float | None:
+        """
+        Map a price onto the strategy's percentage scale, where 0% is the lowest price of the
+        window and 100% is the current price (prices above the current one are above 100%).
+        """
+        if self.min is None or current_price <= self.min:
+            return None
+        return (price - self.min) / (current_price - self.min) * 100
@@ -0,0 +1,106 @@
+import math
+import numpy as np
+
+
+class RollingStats:
+    """
+    Sliding-window mean and variance of prices, plain and volume-weighted.
+
+    Adding or evicting a trade is O(1): Welford's update for the plain statistics and West's
+    weighted update for the volume-weighted ones, each with its exact inverse for removal.
+    Rounding error from long add/remove sequences is bounded by calling reset() with the
+    current window once needs_reset is set (about once per window length).
+    """
+    def __init__(self, reset_interval: int = 1000):
+        self.reset_interval = reset_interval
+        self.reset()
+
+    def reset(self,
+              prices: np.ndarray | None = None,
+              volumes: np.ndarray | None = None):
+        """Recompute all statistics exactly from the given window (or clear them)."""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.weight_sum = 0.0
+        self.weighted_mean = 0.0
+        self._weighted_m2 = 0.0
+        self.updates_since_reset = 0
+
+        if prices is not None and len(prices) > 0:
+            self.count = len(prices)
+            self.mean = float(np.mean(prices))
+            self._m2 = float(np.sum((prices - self.mean) ** 2))
+            self.weight_sum = float(np.sum(volumes))
+            if self.weight_sum > 0:
+                self.weighted_mean = float(np.sum(prices * volumes) / self.weight_sum)
+                self._weighted_m2 = float(np.sum(volumes * (prices - self.weighted_mean) ** 2))
+
+    @property
+    def needs_reset(self) -> bool:
+        return self.updates_since_reset >= self.reset_interval
+
+    @property
+    def variance(self) -> float:
+        return max(self._m2, 0.0) / self.count if self.count else 0.0
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def weighted_variance(self) -> float:
+        return max(self._weighted_m2, 0.0) / self.weight_sum if self.weight_sum > 0 else 0.0
+
+    @property
+    def weighted_std_dev(self) -> float:
+        return math.sqrt(self.weighted_variance)
+
+    def add(self, price: float, volume: float):
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (price - self.mean)
+
+        if volume > 0:
+            self.weight_sum += volume
+            delta = price - self.weighted_mean
+            self.weighted_mean += delta * volume / self.weight_sum
+            self._weighted_m2 += volume * delta * (price - self.weighted_mean)
+        self.updates_since_reset += 1
+
+    def remove(self, price: float, volume: float):
+        if self.count <= 1:
+            self.reset()
+            return
+        self.count -= 1
+        delta = price - self.mean
+        self.mean -= delta / self.count
+        self._m2 -= delta * (price - self.mean)
+
+        if volume > 0:
+            self.weight_sum -= volume
+            if self.weight_sum <= 0:
+                self.weight_sum = 0.0
+                self.weighted_mean = 0.0
+                self._weighted_m2 = 0.0
+            else:
+                delta = price - self.weighted_mean
+                self.weighted_mean -= delta * volume / self.weight_sum
+                self._weighted_m2 -= volume * delta * (price - self.weighted_mean)
+        self.updates_since_reset += 1
+
+    def update(self,
+               added: tuple[np.ndarray, np.ndarray],
+               evicted: tuple[np.ndarray, np.ndarray]):
+        """
+        Apply a window change: evict the oldest trades, then add the new ones.
+
+        Parameters:
+        - added: Tuple of (prices, volumes) of the trades entering the window
+        - evicted: Tuple of (prices, volumes) of the trades leaving the window
+        """
+        for price, volume in zip(evicted[0].tolist(), evicted[1].tolist()):
+            self.remove(price, volume)
+        for price, volume in zip(added[0].tolist(), added[1].tolist()):
+            self.add(price, volume)
@@ -1,18 +1,85 @@
 import yaml
+import math
+import asyncio
+import threading
 from datetime import datetime
+from functools import lru_cache
 from stellar_sdk import Server, Asset
+from stellar_sdk.client.requests_client import RequestsClient
 import pytz
 
-from utils.time_conversions import convert_time_to_utc
+from utils.trade_store import get_trade_store
+from utils.utils import paging_token_key
 
 # Set up logging configuration
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+HORIZON_URL = "https://horizon.stellar.org"
+HORIZON_POOL_SIZE = 10  # Maximum number of keep-alive connections per Horizon host
+BACKFILL_CONCURRENCY = HORIZON_POOL_SIZE  # Maximum number of concurrent history requests
+BACKFILL_MAX_WINDOWS = 500  # Maximum number of windows fetched in one backfill round
+BACKFILL_MAX_ROUNDS = 10
+
+_servers: dict[str, Server] = {}
+_servers_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def load_config(config_path: str = "config/config.yaml") -> dict:
+    """
+    Load and cache the configuration from 'config/config.yaml'.
+
+    Parameters:
+    - config_path: Path of the YAML configuration file
+
+    Returns:
+    - Dictionary with the parsed configuration
+    """
+    with open(config_path, "r") as file:
+        return yaml.safe_load(file)
+
+
+def get_horizon_url() -> str:
+    """
+    Returns:
+    - URL of the Horizon instance set as horizon_url in 'config/config.yaml', the public network's by default
+    """
+    return load_config().get('horizon_url') or HORIZON_URL
+
+
+def get_server(horizon_url: str | None = None) -> Server:
+    """
+    Get the process-wide Horizon server for the given URL.
+
+    The server is created once per URL and shared by all callers (fetchers, trading bots,
+    Streamlit sessions), so its pooled keep-alive connections are reused across ticks.
+
+    Parameters:
+    - horizon_url: URL of the Horizon instance, the configured one if None
+
+    Returns:
+    - A Server object backed by a bounded connection pool
+    """
+    horizon_url = horizon_url or get_horizon_url()
+    server = _servers.get(horizon_url)
+    if server is None:
+        with _servers_lock:
+            server = _servers.get(horizon_url)
+            if server is None:
+                client = RequestsClient(pool_size=HORIZON_POOL_SIZE)
+                server = Server(horizon_url=horizon_url, client=client)
+                _servers[horizon_url] = server
+                logging.info(f"Created pooled Horizon client for {horizon_url}")
+    return server
+
+
+@lru_cache(maxsize=None)
 def get_asset(asset_code:str="VELO") -> Asset:
     """
     Fetch an Asset object from the asset code based on 'config/config.yaml'.
+    The result is memoized, so repeated lookups do no file I/O.
 
     Parameters:
     - asset_code: Code of the asset (e.g., "XLM", "USDC")
@@ -20,13 +87,148 @@ def get_asset(asset_code:str="VELO") -> Asset:
     Returns:
     - An Asset object corresponding to the given asset code
     """
-    # Load configuration
-    with open("config/config.yaml", "r") as file:
-        config = yaml.safe_load(file)
-
+    config = load_config()
     return Asset.native() if asset_code == "XLM" else Asset(asset_code, config['asset_issuers'].get(asset_code))
 
 
+def trade_ledger(trade: dict) -> int:
+    """
+    Get the ledger sequence of a trade from its paging_token (the operation id encodes the ledger).
+
+    Parameters:
+    - trade: Trade record from Horizon
+
+    Returns:
+    - Ledger sequence number in which the trade happened
+    """
+    return paging_token_key(trade['paging_token'])[0] >> 32
+
+
+def merge_trade_lists(*trade_lists: list[dict]) -> list[dict]:
+    """
+    Merge trade lists, dropping duplicates by trade id.
+
+    Returns:
+    - List of unique trade dictionaries, newest first
+    """
+    unique_trades = {}
+    for trade_list in trade_lists:
+        for trade in trade_list:
+            unique_trades[trade['id']] = trade
+    return sorted(unique_trades.values(), key=lambda trade: paging_token_key(trade['paging_token']), reverse=True)
+
+
+async def _fetch_trade_window(
+        server: Server,
+        base_asset: Asset,
+        counter_asset: Asset,
+        start_ledger: int,
+        end_key: tuple[int, int],
+        semaphore: asyncio.Semaphore
+) -> list[dict]:
+    """Fetch, in ascending order, every trade from the start of start_ledger up to (excluding) end_key."""
+    cursor = f"{start_ledger << 32}-0"
+    window_trade_list = []
+
+    async with semaphore:
+        while True:
+            trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=False).limit(200).cursor(cursor)
+            trades = await asyncio.to_thread(trades_request.call)
+            records = trades['_embedded']['records']
+
+            for trade in records:
+                if paging_token_key(trade['paging_token']) >= end_key:
+                    return window_trade_list  # Reached the next window
+                window_trade_list.append(trade)
+
+            if len(records) < 200:
+                return window_trade_list
+
+            cursor = records[-1]['paging_token']
+
+
+async def _fetch_trade_windows(
+        server: Server,
+        base_asset: Asset,
+        counter_asset: Asset,
+        boundaries: list[int],
+        end_key: tuple[int, int],
+        max_concurrency: int
+) -> list[dict]:
+    """
+    Fetch the windows between consecutive ledger boundaries concurrently.
+    boundaries is ascending; the last window ends at end_key.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    window_end_keys = [(ledger << 32, 0) for ledger in boundaries[1:]] + [end_key]
+    windows = await asyncio.gather(*[_fetch_trade_window(server, base_asset, counter_asset, start_ledger, window_end_key, semaphore)
+                                     for start_ledger, window_end_key in zip(boundaries, window_end_keys)])
+    return merge_trade_lists(*windows)
+
+
+async def backfill_trade_list(
+        base_asset_code: str = "VELO",
+        counter_asset_code: str = "XLM",
+        num_trades: int = 500,
+        max_concurrency: int = BACKFILL_CONCURRENCY
+) -> list[dict]:
+    """
+    Fetch the last given number of trades, loading the history pages concurrently.
+
+    The newest page is fetched first to estimate how many ledgers hold the requested depth.
+    That ledger range is then split into windows of about one page each, fetched in parallel
+    with at most max_concurrency requests in flight. Rounds repeat further back until enough
+    trades have been loaded.
+
+    Parameters:
+    - base_asset_code: Base asset code (e.g., "VELO")
+    - counter_asset_code: Counter asset code (e.g., "XLM")
+    - num_trades: Number of last trades to fetch
+    - max_concurrency: Maximum number of concurrent requests
+
+    Returns:
+    - List of dictionaries containing trade data, newest first
+    """
+    server = get_server()
+    base_asset = get_asset(base_asset_code)
+    counter_asset = get_asset(counter_asset_code)
+
+    trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=True).limit(200)
+    trades = await asyncio.to_thread(trades_request.call)
+    all_trade_list = trades['_embedded']['records']
+    if len(all_trade_list) < 200 or len(all_trade_list) >= num_trades:
+        all_trade_list = all_trade_list[:num_trades]
+        get_trade_store().append(base_asset_code, counter_asset_code, all_trade_list)
+        return all_trade_list
+
+    newest_ledger = trade_ledger(all_trade_list[0])
+    end_key = paging_token_key(all_trade_list[-1]['paging_token'])
+    top_ledger = end_key[0] >> 32
+
+    for _ in range(BACKFILL_MAX_ROUNDS):
+        # Estimate the trade rate from what is loaded so far and size the next round from it
+        trades_per_ledger = max(len(all_trade_list) / (newest_ledger - top_ledger + 1), 1e-6)
+        remaining = num_trades - len(all_trade_list)
+        num_windows = min(math.ceil(remaining / 200), BACKFILL_MAX_WINDOWS)
+        window_size = max(math.ceil(remaining * 1.2 / trades_per_ledger / num_windows), 1)
+
+        start_ledger = max(top_ledger + 1 - num_windows * window_size, 1)
+        boundaries = list(range(start_ledger, top_ledger + 1, window_size))
+        window_trade_list = await _fetch_trade_windows(server, base_asset, counter_asset, boundaries, end_key, max_concurrency)
+        all_trade_list = merge_trade_lists(all_trade_list, window_trade_list)
+        logging.info(f"Backfilled {len(window_trade_list)} trades from ledger {start_ledger} in {len(boundaries)} windows.")
+
+        # Everything from start_ledger up has been loaded
+        top_ledger = start_ledger - 1
+        end_key = (start_ledger << 32, 0)
+        if len(all_trade_list) >= num_trades or start_ledger == 1:
+            break
+
+    all_trade_list = all_trade_list[:num_trades]
+    get_trade_store().append(base_asset_code, counter_asset_code, all_trade_list)
+    return all_trade_list
+
+
 def fetch_last_trade_list(
         base_asset_code:str="VELO",
         counter_asset_code:str="XLM",
@@ -34,6 +236,7 @@ def fetch_last_trade_list(
 ) -> list[dict]:
     """
     Fetch a given number of historical trade data from Stellar Horizon API.
+    The pages are fetched concurrently by backfill_trade_list.
 
     Parameters:
     - base_asset_code: Base asset code (e.g., "VELO")
@@ -43,63 +246,257 @@ def fetch_last_trade_list(
     Returns:
     - List of dictionaries containing trade data
     """
-    server = Server("https://horizon.stellar.org")
-
     logging.info(f"Fetching last {num_trades} trades for pair: {base_asset_code}/{counter_asset_code}")
 
+    try:
+        return asyncio.run(backfill_trade_list(base_asset_code=base_asset_code,
+                                               counter_asset_code=counter_asset_code,
+                                               num_trades=num_trades))
+
+    except Exception as e:
+        logging.error(f"Error fetching trade data: {e}")
+        return []
+
+
+def fetch_trades_since(
+        base_asset_code: str,
+        counter_asset_code: str,
+        cursor: str
+) -> tuple[list[dict], str]:
+    """
+    Fetch the trades that happened after a paging_token, in ascending order from that cursor.
+    Each trade is returned exactly once, and an idle poll costs a single request.
+
+    Parameters:
+    - base_asset_code: Base asset code (e.g., "VELO")
+    - counter_asset_code: Counter asset code (e.g., "XLM")
+    - cursor: paging_token of the last trade already seen
+
+    Returns:
+    - Tuple of (list of new trade dictionaries newest first, paging_token to use as the next cursor)
+    """
+    server = get_server()
+
     # Define base and counter assets
     base_asset = get_asset(base_asset_code)
     counter_asset = get_asset(counter_asset_code)
 
+    prior_cursor = cursor
     try:
         all_trade_list = []
-        cursor = None
 
-        while len(all_trade_list) < num_trades:
+        while True:
             # Fetch up to 200 trades per request (API limit)
-            trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=True).limit(200)
-            if cursor:
-                trades_request = trades_request.cursor(cursor)
-
-            trades = trades_request.call()
-
-            all_trade_list.extend(trades['_embedded']['records'])
+            trades = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=False).limit(200).cursor(cursor).call()
+            records = trades['_embedded']['records']
 
-            if len(trades['_embedded']['records']) < 200:
-                break  # Stop if fewer than 200 trades are returned
+            all_trade_list.extend(records)
+            if records:
+                cursor = records[-1]['paging_token']  # Move the cursor to the newest trade seen
 
-            cursor = trades['_embedded']['records'][-1]['paging_token']  # Update the cursor for the next request
+            if len(records) < 200:
+                break  # Caught up with the latest trade
 
-        return all_trade_list[:num_trades]
+        if all_trade_list:
+            logging.info(f"Fetched {len(all_trade_list)} new trades for pair: {base_asset_code}/{counter_asset_code} up to cursor {cursor}.")
+            get_trade_store().append(base_asset_code, counter_asset_code, all_trade_list, after_cursor=prior_cursor)
+        all_trade_list.reverse()
+        return all_trade_list, cursor
 
     except Exception as e:
-        logging.error(f"Error fetching trade data: {e}")
-        return []
+        logging.error(f"Error fetching new trade data: {e}")
+        return [], prior_cursor  # Pages fetched before the error are fetched again on the next call
 
 
-def fetch_new_trade_list(
-        base_asset_code: str,
-        counter_asset_code: str,
-        prior_fetch_time: datetime
+def load_last_trade_list(
+        base_asset_code: str = "VELO",
+        counter_asset_code: str = "XLM",
+        num_trades: int = 500
 ) -> list[dict]:
     """
-    Fetch historical trade data from Stellar Horizon API after the prior fetch time.
+    Load the last given number of trades from the local trade store and fetch only the gap
+    since the stored cursor. When the gap fits in one page, a warm start costs a single request.
 
     Parameters:
     - base_asset_code: Base asset code (e.g., "VELO")
     - counter_asset_code: Counter asset code (e.g., "XLM")
-    - prior_fetch_time: The last fetch time to get trades after that timestamp
+    - num_trades: Number of last trades to load
 
     Returns:
-    - List of dictionaries containing new trade data
+    - List of dictionaries containing trade data, newest first
     """
-    server = Server("https://horizon.stellar.org")
+    trade_store = get_trade_store()
+    stored_trade_list = trade_store.load_last_trade_list(base_asset_code, counter_asset_code, num_trades)
+    if len(stored_trade_list) < num_trades:
+        return fetch_last_trade_list(base_asset_code, counter_asset_code, num_trades)  # Cold start
 
-    logging.info(f"Fetching new trades for pair: {base_asset_code}/{counter_asset_code} after {prior_fetch_time}")
+    cursor = stored_trade_list[0]['paging_token']
+    logging.info(f"Loaded {len(stored_trade_list)} stored trades for pair: {base_asset_code}/{counter_asset_code}, fetching trades after {cursor}")
+
+    try:
+        server = get_server()
+        trades = server.trades().for_asset_pair(base=get_asset(base_asset_code), counter=get_asset(counter_asset_code)).order(desc=True).limit(200).call()
+        records = trades['_embedded']['records']
+
+        if len(records) < 200 or paging_token_key(records[-1]['paging_token']) <= paging_token_key(cursor):
+            # The newest page reaches back to the stored cursor, so it holds the whole gap
+            new_trade_list = [trade for trade in records if paging_token_key(trade['paging_token']) > paging_token_key(cursor)]
+            trade_store.append(base_asset_code, counter_asset_code, records)
+        else:
+            # Larger gap: page forward from the cursor if that is cheaper than a fresh backfill
+            trades_per_ledger = len(records) / (trade_ledger(records[0]) - trade_ledger(records[-1]) + 1)
+            estimated_gap = (trade_ledger(records[-1]) - (paging_token_key(cursor)[0] >> 32)) * trades_per_ledger
+            if estimated_gap + len(records) >= num_trades:
+                return fetch_last_trade_list(base_asset_code, counter_asset_code, num_trades)
+            new_trade_list, _ = fetch_trades_since(base_asset_code, counter_asset_code, cursor)
+
+        return merge_trade_lists(new_trade_list, stored_trade_list)[:num_trades]
+
+    except Exception as e:
+        logging.error(f"Error fetching trades since the stored cursor: {e}")
+        return stored_trade_list
+
+
+def fetch_account_balances(account_id: str) -> list[dict] | None:
+    """
+    Fetch the balances of an account in the assets listed under asset_issuers in 'config/config.yaml'.
+
+    Parameters:
+    - account_id: Public key of the account
+
+    Returns:
+    - List of {Asset, Balance} dictionaries, or None if the account could not be fetched
+    """
+    server = get_server()
+
+    try:
+        balances = server.accounts().account_id(account_id).call()['balances']
+
+        balance_data = []
+        for asset_code, asset_issuer in load_config().get('asset_issuers', {}).items():
+            for balance in balances:
+                current_asset_code = "XLM" if balance['asset_type'] == 'native' else balance.get('asset_code', 'Unknown')
+                current_asset_issuer = balance.get('asset_issuer', 'Stellar Foundation')
+                if current_asset_code == asset_code and current_asset_issuer == asset_issuer:
+                    balance_data.append({
+                        'Asset': current_asset_code,
+                        'Balance': float(balance['balance']),
+                    })
+        return balance_data
+
+    except Exception as e:
+        logging.error(f"Error fetching balances: {e}")
+        return None
+
+
+def fetch_account_offers(account_id: str) -> dict[str, dict] | None:
+    """
+    Fetch all open offers of an account from Stellar Horizon API, following every page.
+
+    Parameters:
+    - account_id: Public key of the account
+
+    Returns:
+    - Dictionary of offer dictionaries keyed by offer id, or None if the offers could not be fetched
+    """
+    server = get_server()
+
+    try:
+        offers = {}
+        cursor = None
+
+        while True:
+            # Fetch up to 200 offers per request (API limit)
+            offers_request = server.offers().for_account(account_id).order(desc=False).limit(200)
+            if cursor:
+                offers_request = offers_request.cursor(cursor)
+            records = offers_request.call()['_embedded']['records']
+            offers.update((offer['id'], offer) for offer in records)
+
+            if len(records) < 200:
+                break
+
+            cursor = records[-1]['paging_token']  # Update the cursor for the next request
+
+        logging.info(f"Fetched {len(offers)} open offers for account {account_id}")
+        return offers
+
+    except Exception as e:
+        logging.error(f"Error fetching account offers: {e}")
+        return None
+
+
+def fetch_account_trades_since(account_id: str, cursor: str) -> tuple[list[dict], str] | None:
+    """
+    Fetch the trades of an account (on any pair) that happened after a paging_token.
+
+    Parameters:
+    - account_id: Public key of the account
+    - cursor: paging_token of the last trade already seen
+
+    Returns:
+    - Tuple of (list of new trade dictionaries newest first, paging_token to use as the next cursor),
+      or None if the trades could not be fetched
+    """
+    server = get_server()
+
+    try:
+        all_trade_list = []
+
+        while True:
+            # Fetch up to 200 trades per request (API limit)
+            trades = server.trades().for_account(account_id).order(desc=False).limit(200).cursor(cursor).call()
+            records = trades['_embedded']['records']
+
+            all_trade_list.extend(records)
+            if records:
+                cursor = records[-1]['paging_token']
+
+            if len(records) < 200:
+                break
+
+        logging.info(f"Fetched {len(all_trade_list)} new trades for account {account_id} up to cursor {cursor}")
+        all_trade_list.reverse()
+        return all_trade_list, cursor
+
+    except Exception as e:
+        logging.error(f"Error fetching account trades: {e}")
+        return None
 
-    # Define base and counter assets
-    base_asset = get_asset(base_asset_code)
-    counter_asset = get_asset(counter_asset_code)
+
+def fetch_account_trade_cursor(account_id: str) -> str | None:
+    """
+    Fetch the paging_token of an account's latest trade, to follow the account's trades from.
+
+    Parameters:
+    - account_id: Public key of the account
+
+    Returns:
+    - paging_token of the latest trade ("0" if the account has none), or None if it could not be fetched
+    """
+    server = get_server()
+
+    try:
+        trades = server.trades().for_account(account_id).order(desc=True).limit(1).call()
+        records = trades['_embedded']['records']
+        return records[0]['paging_token'] if records else "0"
+
+    except Exception as e:
+        logging.error(f"Error fetching the latest account trade: {e}")
+        return None
+
+
+def fetch_offer_trades(offer_id: str) -> list[dict] | None:
+    """
+    Fetch the trades of an offer.
+
+    Parameters:
+    - offer_id: Id of the offer
+
+    Returns:
+    - List of trade dictionaries oldest first, or None if the trades could not be fetched
+    """
+    server = get_server()
 
     try:
         all_trade_list = []
@@ -107,30 +504,70 @@ def fetch_new_trade_list(
 
         while True:
             # Fetch up to 200 trades per request (API limit)
-            trades_request = server.trades().for_asset_pair(base=base_asset, counter=counter_asset).order(desc=True).limit(200)
+            call_builder = server.trades().for_offer(offer_id).order(desc=False).limit(200)
             if cursor:
-                trades_request = trades_request.cursor(cursor)
+                call_builder = call_builder.cursor(cursor)
+            records = call_builder.call()['_embedded']['records']
 
-            trades = trades_request.call()
+            all_trade_list.extend(records)
+            if records:
+                cursor = records[-1]['paging_token']
 
-            # Loop through the fetched trades
-            for trade in trades['_embedded']['records']:
-                trade_time = convert_time_to_utc(trade['ledger_close_time'])
+            if len(records) < 200:
+                break
 
-                # Only include trades that occurred after the prior_fetch_time
-                if trade_time > prior_fetch_time:
-                    all_trade_list.append(trade)
-                else:
-                    return all_trade_list  # Stop if trade is older than prior_fetch_time
+        return all_trade_list
 
-            if len(trades['_embedded']['records']) < 200:
-                break  # Stop fetching if fewer than 200 trades are returned
+    except Exception as e:
+        logging.error(f"Error fetching the trades of offer {offer_id}: {e}")
+        return None
 
-            cursor = trades['_embedded']['records'][-1]['paging_token']  # Update the cursor for the next request
 
-        logging.info(f"Fetched {len(all_trade_list)} new trades after {prior_fetch_time}.")
-        return all_trade_list
+def fetch_trade_aggregations(
+        base_asset_code: str,
+        counter_asset_code: str,
+        resolution: int,
+        start_time: int,
+        end_time: int
+) -> list[dict]:
+    """
+    Fetch OHLCV trade aggregations (candles) from Stellar Horizon API.
+
+    Parameters:
+    - base_asset_code: Base asset code (e.g., "VELO")
+    - counter_asset_code: Counter asset code (e.g., "XLM")
+    - resolution: Candle length in seconds (60, 300, 900, 3600, 86400 or 604800)
+    - start_time: Epoch seconds of the first candle
+    - end_time: Epoch seconds the last candle ends before (exclusive)
+
+    Returns:
+    - List of trade aggregation dictionaries, oldest first
+    """
+    server = get_server()
+    base_asset = get_asset(base_asset_code)
+    counter_asset = get_asset(counter_asset_code)
+
+    try:
+        all_aggregation_list = []
+
+        while start_time < end_time:
+            # Fetch up to 200 candles per request (API limit)
+            aggregations = server.trade_aggregations(base=base_asset,
+                                                     counter=counter_asset,
+                                                     resolution=resolution * 1000,
+                                                     start_time=start_time * 1000,
+                                                     end_time=end_time * 1000).limit(200).call()
+            records = [record for record in aggregations['_embedded']['records'] if int(record['timestamp']) < end_time * 1000]
+            all_aggregation_list.extend(records)
+
+            if len(aggregations['_embedded']['records']) < 200 or not records:
+                break
+
+            start_time = int(records[-1]['timestamp']) // 1000 + resolution  # Continue after the last candle
+
+        logging.info(f"Fetched {len(all_aggregation_list)} {resolution}s candles for pair: {base_asset_code}/{counter_asset_code}")
+        return all_aggregation_list
 
     except Exception as e:
-        logging.error(f"Error fetching new trade data: {e}")
+        logging.error(f"Error fetching trade aggregations: {e}")
         return []
@@ -1,7 +1,12 @@
 from datetime import datetime
+import timeit
+import numpy as np
 import pytz
 from tzlocal import get_localzone
 
+HORIZON_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+HORIZON_TIME_LENGTH = len("2024-01-01T00:00:00Z")
+
 
 def get_time_now_utc():
     return datetime.now(pytz.utc)
@@ -9,11 +14,59 @@ def get_time_now_utc():
 
 def convert_time_to_utc(timestamp):
     # Convert timestamp to UTC and then to the machine's local timezone
-    timestamp_utc = datetime.strptime(timestamp, 
-                                      "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
+    # fromisoformat is much faster than strptime for Horizon's fixed "YYYY-MM-DDTHH:MM:SSZ" format
+    timestamp_utc = datetime.fromisoformat(timestamp[:19]).replace(tzinfo=pytz.utc)
     return timestamp_utc
 
 
+def convert_times_to_epoch(timestamps: list[str]) -> np.ndarray:
+    """
+    Parse a batch of Horizon timestamps ("YYYY-MM-DDTHH:MM:SSZ") into UTC epoch seconds.
+
+    The strings are fixed-width, so their digits are read as one byte matrix and converted
+    with vectorized integer arithmetic (days-from-civil for the date part).
+
+    Parameters:
+    - timestamps: List of Horizon timestamp strings
+
+    Returns:
+    - int64 array of seconds since the epoch
+    """
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    raw = ''.join(timestamps).encode('ascii')
+    if len(raw) != HORIZON_TIME_LENGTH * len(timestamps):
+        # Not all in the fixed format, parse one by one
+        return np.array([int(convert_time_to_utc(timestamp).timestamp()) for timestamp in timestamps], dtype=np.int64)
+    chars = np.frombuffer(raw, dtype=np.uint8).reshape(-1, HORIZON_TIME_LENGTH)
+    if not ((chars[:, 4] == ord('-')) & (chars[:, 10] == ord('T')) & (chars[:, 19] == ord('Z'))).all():
+        return np.array([int(convert_time_to_utc(timestamp).timestamp()) for timestamp in timestamps], dtype=np.int64)
+
+    digits = chars.astype(np.int64) - ord('0')
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    seconds_of_day = (digits[:, 11] * 10 + digits[:, 12]) * 3600 + (digits[:, 14] * 10 + digits[:, 15]) * 60 + digits[:, 17] * 10 + digits[:, 18]
+
+    # Days since 1970-01-01 (Howard Hinnant's days_from_civil)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    return days * 86400 + seconds_of_day
+
+
+def convert_times_to_datetime64(timestamps: list[str]) -> np.ndarray:
+    """
+    Parse a batch of Horizon timestamps into a UTC datetime64[s] array.
+    """
+    return convert_times_to_epoch(timestamps).astype('datetime64[s]')
+
+
 def convert_to_local_time(timestamp_utc: datetime):
     # Get the system's local time zone
     local_tz = get_localzone()
@@ -25,3 +78,26 @@ def convert_time_to_display(timestamp: datetime) -> str:
     # Format the timestamp to display only minutes and seconds
     return timestamp.strftime('%H:%M:%S')
 
+
+def benchmark_time_conversions(num_timestamps: int = 10000, repeat: int = 5):
+    """
+    Compare the per-trade strptime parsing, convert_time_to_utc and the batch parser.
+    Run with: python -m utils.time_conversions
+    """
+    base_time = int(datetime(2024, 1, 1, tzinfo=pytz.utc).timestamp())
+    timestamps = [datetime.fromtimestamp(base_time + i * 7, pytz.utc).strftime(HORIZON_TIME_FORMAT) for i in range(num_timestamps)]
+
+    results = {
+        'strptime (previous)': lambda: [datetime.strptime(timestamp, HORIZON_TIME_FORMAT).replace(tzinfo=pytz.utc) for timestamp in timestamps],
+        'convert_time_to_utc': lambda: [convert_time_to_utc(timestamp) for timestamp in timestamps],
+        'convert_times_to_epoch': lambda: convert_times_to_epoch(timestamps),
+    }
+    baseline = None
+    for name, parse in results.items():
+        seconds = min(timeit.repeat(parse, number=1, repeat=repeat))
+        baseline = baseline or seconds
+        print(f"{name:>24}: {seconds * 1000:8.2f} ms for {num_timestamps} timestamps ({baseline / seconds:6.1f}x)")
+
+
+if __name__ == "__main__":
+    benchmark_time_conversions()
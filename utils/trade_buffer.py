@@ -0,0 +1,185 @@
+import numpy as np
+
+from utils.time_conversions import convert_times_to_epoch
+
+
+def parse_trade_list(trade_list: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse Horizon trade records into timestamp/price/volume columns.
+
+    Parameters:
+    - trade_list: List of trade dictionaries, newest first (as returned by the fetchers)
+
+    Returns:
+    - Tuple of (epoch seconds, prices, base volumes) arrays, oldest first
+    """
+    trade_list = trade_list[::-1]
+    timestamps = convert_times_to_epoch([trade['ledger_close_time'] for trade in trade_list])
+    price_n = np.array([trade['price']['n'] for trade in trade_list], dtype=np.float64)
+    price_d = np.array([trade['price']['d'] for trade in trade_list], dtype=np.float64)
+    volumes = np.array([trade.get('base_amount', 0) for trade in trade_list], dtype=np.float64)
+    return timestamps, price_n / price_d, volumes
+
+
+class RingBuffer:
+    """
+    Fixed-capacity ring buffer of named NumPy columns.
+
+    Every column is backed by an array of twice the capacity, and each value is written to
+    both halves. The live window is then always one contiguous slice, so column() returns a
+    zero-copy view, oldest row first.
+    """
+    def __init__(self, capacity: int, dtypes: dict[str, type]):
+        self.capacity = capacity
+        self._columns = {name: np.zeros(2 * capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self._end = 0  # Position of the next write
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _start(self) -> int:
+        return (self._end - self._size) % self.capacity
+
+    def column(self, name: str) -> np.ndarray:
+        start = self._start
+        return self._columns[name][start:start + self._size]
+
+    def _append(self, values: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """
+        Append k rows in O(k), evicting the oldest ones beyond the capacity.
+
+        Returns:
+        - Dictionary of column copies of the evicted rows, oldest first
+        """
+        # Only the newest `capacity` rows can remain in the window
+        values = {name: column[-self.capacity:] for name, column in values.items()}
+        num_new = len(next(iter(values.values())))
+
+        num_evicted = max(self._size + num_new - self.capacity, 0)
+        evicted = {name: self.column(name)[:num_evicted].copy() for name in self._columns}
+
+        positions = (self._end + np.arange(num_new)) % self.capacity
+        for name, column in values.items():
+            self._columns[name][positions] = column
+            self._columns[name][positions + self.capacity] = column
+
+        self._end = (self._end + num_new) % self.capacity
+        self._size = min(self._size + num_new, self.capacity)
+        return evicted
+
+    def _set_rows(self, rows: np.ndarray, values: dict[str, np.ndarray]):
+        """Overwrite the rows at the given window offsets (0 is the oldest row)."""
+        positions = (self._start + rows) % self.capacity
+        for name, column in values.items():
+            self._columns[name][positions] = column
+            self._columns[name][positions + self.capacity] = column
+
+    def _pop_oldest(self, num_rows: int):
+        self._size -= min(num_rows, self._size)
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+
+class TradeBuffer(RingBuffer):
+    """Ring buffer of the trade window: epoch-second timestamps, prices and base volumes."""
+    def __init__(self, capacity: int):
+        super().__init__(capacity, {'timestamps': np.int64, 'prices': np.float64, 'volumes': np.float64})
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.column('timestamps')
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self.column('prices')
+
+    @property
+    def volumes(self) -> np.ndarray:
+        return self.column('volumes')
+
+    def append(self,
+               timestamps: np.ndarray,
+               prices: np.ndarray,
+               volumes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Append k trades in O(k), evicting the oldest ones beyond the capacity.
+
+        Parameters:
+        - timestamps, prices, volumes: Columns of the new trades, oldest first
+
+        Returns:
+        - Tuple of (timestamps, prices, volumes) copies of the evicted trades, oldest first
+        """
+        evicted = self._append({'timestamps': timestamps, 'prices': prices, 'volumes': volumes})
+        return evicted['timestamps'], evicted['prices'], evicted['volumes']
+
+
+def group_by_second(timestamps: np.ndarray,
+                    prices: np.ndarray,
+                    volumes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group time-ordered trades by second, vectorized.
+
+    Returns:
+    - Tuple of (seconds, price sums, trade counts, volume sums) per distinct second
+    """
+    starts = np.flatnonzero(np.diff(timestamps, prepend=timestamps[:1] - 1))
+    counts = np.diff(np.append(starts, len(timestamps)))
+    return timestamps[starts], np.add.reduceat(prices, starts), counts, np.add.reduceat(volumes, starts)
+
+
+class SecondBuffer(RingBuffer):
+    """
+    Per-second aggregate of the trade window (mean price and total volume per second).
+
+    It is updated with the trades entering and leaving the window, so the work per update is
+    proportional to the number of changed trades, not to the window size.
+    """
+    def __init__(self, capacity: int):
+        super().__init__(capacity, {'seconds': np.int64, 'price_sums': np.float64, 'counts': np.int64, 'volumes': np.float64})
+
+    @property
+    def seconds(self) -> np.ndarray:
+        return self.column('seconds')
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self.column('price_sums') / self.column('counts')
+
+    @property
+    def volumes(self) -> np.ndarray:
+        return self.column('volumes')
+
+    def add(self, timestamps: np.ndarray, prices: np.ndarray, volumes: np.ndarray):
+        """Add trades newer than (or in the same second as) the newest aggregated second."""
+        if len(timestamps) == 0:
+            return
+        seconds, price_sums, counts, volume_sums = group_by_second(timestamps, prices, volumes)
+
+        if self._size and seconds[0] == self.seconds[-1]:
+            # The first second continues the newest aggregated one
+            last_row = np.array([self._size - 1])
+            self._set_rows(last_row, {'price_sums': self.column('price_sums')[-1:] + price_sums[:1],
+                                      'counts': self.column('counts')[-1:] + counts[:1],
+                                      'volumes': self.column('volumes')[-1:] + volume_sums[:1]})
+            seconds, price_sums, counts, volume_sums = seconds[1:], price_sums[1:], counts[1:], volume_sums[1:]
+
+        self._append({'seconds': seconds, 'price_sums': price_sums, 'counts': counts, 'volumes': volume_sums})
+
+    def remove(self, timestamps: np.ndarray, prices: np.ndarray, volumes: np.ndarray):
+        """Remove trades evicted from the start of the window."""
+        if len(timestamps) == 0:
+            return
+        _, price_sums, counts, volume_sums = group_by_second(timestamps, prices, volumes)
+
+        # Evicted seconds are the oldest aggregated ones, in the same order
+        rows = np.arange(len(counts))
+        remaining_counts = self.column('counts')[:len(counts)] - counts
+        self._set_rows(rows, {'price_sums': self.column('price_sums')[:len(counts)] - price_sums,
+                              'counts': remaining_counts,
+                              'volumes': self.column('volumes')[:len(counts)] - volume_sums})
+        self._pop_oldest(int(np.count_nonzero(remaining_counts == 0)))
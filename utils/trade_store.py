@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+
+from utils.utils import paging_token_key
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TRADE_STORE_PATH = "data/trades.sqlite3"
+
+_trade_stores: dict[str, "TradeStore"] = {}
+_trade_stores_lock = threading.Lock()
+
+
+class TradeStore:
+    """
+    Append-only on-disk store of Horizon trade records, keyed by asset pair.
+
+    Besides the trades, the store keeps for each pair the range of paging tokens that is known
+    to be gap-free up to the newest stored trade. Only that range is served back, so a warm
+    start never returns history with holes in it.
+    """
+    def __init__(self, db_path: str = TRADE_STORE_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trades (
+                pair TEXT NOT NULL,
+                operation_id INTEGER NOT NULL,
+                idx INTEGER NOT NULL,
+                trade TEXT NOT NULL,
+                PRIMARY KEY (pair, operation_id, idx)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS cursors (
+                pair TEXT PRIMARY KEY,
+                oldest_operation_id INTEGER NOT NULL,
+                oldest_idx INTEGER NOT NULL,
+                newest_operation_id INTEGER NOT NULL,
+                newest_idx INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def pair_key(base_asset_code: str, counter_asset_code: str) -> str:
+        return f"{base_asset_code}/{counter_asset_code}"
+
+    def _get_range(self, pair: str) -> tuple[tuple[int, int], tuple[int, int]] | None:
+        row = self._conn.execute("SELECT oldest_operation_id, oldest_idx, newest_operation_id, newest_idx FROM cursors WHERE pair = ?",
+                                 (pair,)).fetchone()
+        return ((row[0], row[1]), (row[2], row[3])) if row else None
+
+    def append(self,
+               base_asset_code: str,
+               counter_asset_code: str,
+               trade_list: list[dict],
+               after_cursor: str | None = None):
+        """
+        Write a gap-free batch of trades.
+
+        Parameters:
+        - base_asset_code: Base asset code (e.g., "VELO")
+        - counter_asset_code: Counter asset code (e.g., "XLM")
+        - trade_list: Consecutive trades (in any order), with no trade missing between them
+        - after_cursor: paging_token the batch directly follows, if it was fetched from a cursor
+        """
+        if not trade_list:
+            return
+        pair = self.pair_key(base_asset_code, counter_asset_code)
+        rows = [(pair, *paging_token_key(trade['paging_token']), json.dumps(trade)) for trade in trade_list]
+        batch_oldest = min(row[1:3] for row in rows)
+        batch_newest = max(row[1:3] for row in rows)
+
+        with self._lock:
+            stored_range = self._get_range(pair)
+            oldest, newest = batch_oldest, batch_newest
+            if stored_range:
+                stored_oldest, stored_newest = stored_range
+                after_key = paging_token_key(after_cursor) if after_cursor else None
+                # The batch extends the stored range if it overlaps it or directly follows a trade inside it
+                overlaps = batch_oldest <= stored_newest and batch_newest >= stored_oldest
+                follows = after_key is not None and stored_oldest <= after_key <= stored_newest
+                if overlaps or follows:
+                    oldest = min(stored_oldest, batch_oldest)
+                    newest = max(stored_newest, batch_newest)
+
+            self._conn.executemany("INSERT OR IGNORE INTO trades (pair, operation_id, idx, trade) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?, ?)", (pair, *oldest, *newest))
+            self._conn.commit()
+
+    def load_last_trade_list(self,
+                             base_asset_code: str,
+                             counter_asset_code: str,
+                             num_trades: int) -> list[dict]:
+        """
+        Load up to num_trades of the newest gap-free stored trades.
+
+        Returns:
+        - List of trade dictionaries, newest first
+        """
+        pair = self.pair_key(base_asset_code, counter_asset_code)
+        with self._lock:
+            stored_range = self._get_range(pair)
+            if not stored_range:
+                return []
+            (oldest_operation_id, oldest_idx), (newest_operation_id, newest_idx) = stored_range
+            rows = self._conn.execute("""
+                SELECT trade FROM trades
+                WHERE pair = ? AND (operation_id, idx) >= (?, ?) AND (operation_id, idx) <= (?, ?)
+                ORDER BY operation_id DESC, idx DESC LIMIT ?
+            """, (pair, oldest_operation_id, oldest_idx, newest_operation_id, newest_idx, num_trades)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_cursor(self,
+                   base_asset_code: str,
+                   counter_asset_code: str) -> str | None:
+        """
+        Returns:
+        - paging_token of the newest stored trade of the pair, or None when nothing is stored
+        """
+        with self._lock:
+            stored_range = self._get_range(self.pair_key(base_asset_code, counter_asset_code))
+        if not stored_range:
+            return None
+        newest_operation_id, newest_idx = stored_range[1]
+        return f"{newest_operation_id}-{newest_idx}"
+
+
+def get_trade_store(db_path: str = TRADE_STORE_PATH) -> TradeStore:
+    """
+    Get the process-wide trade store for the given database file.
+
+    Parameters:
+    - db_path: Path of the SQLite database
+
+    Returns:
+    - A TradeStore shared by all callers
+    """
+    trade_store = _trade_stores.get(db_path)
+    if trade_store is None:
+        with _trade_stores_lock:
+            trade_store = _trade_stores.get(db_path)
+            if trade_store is None:
+                trade_store = TradeStore(db_path)
+                _trade_stores[db_path] = trade_store
+                logging.info(f"Opened trade store at {db_path}")
+    return trade_store
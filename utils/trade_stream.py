@@ -0,0 +1,198 @@
+import codecs
+import http.client
+import json
+import queue
+import socket
+import threading
+import logging
+from urllib.parse import urlencode, urlsplit
+
+from utils.stellar_api import get_horizon_url, get_asset, paging_token_key
+from utils.trade_store import get_trade_store
+
+# Set up logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TradeStream:
+    """
+    Streaming (SSE) trade feed for an asset pair, backed by Horizon's trades stream.
+
+    A background thread consumes the stream and buffers incoming trades until they are
+    drained by the app loop. When the connection drops, it reconnects with exponential
+    backoff and resumes from the last received paging_token, so no trade is lost or repeated.
+    The stream is read over an HTTP connection the stream opens itself and keeps the socket of,
+    which stop() shuts down, so a stopped stream ends right away even when no trade comes in.
+
+    With an account_id, it follows the trades of that account (on any pair) instead, and the
+    trades are not written to the pair's trade store.
+    """
+    def __init__(self,
+                 base_asset_code: str,
+                 counter_asset_code: str,
+                 cursor: str = "now",
+                 account_id: str | None = None,
+                 horizon_url: str | None = None,
+                 min_backoff: float = 1.0,
+                 max_backoff: float = 60.0):
+        self.base_asset_code = base_asset_code
+        self.counter_asset_code = counter_asset_code
+        self.cursor = cursor
+        self.drained_cursor = cursor
+        self.account_id = account_id
+        self.horizon_url = horizon_url or get_horizon_url()  # The configured Horizon if None
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._trades: queue.Queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._socket: socket.socket | None = None
+
+    @property
+    def name(self) -> str:
+        return f"account: {self.account_id}" if self.account_id else f"pair: {self.base_asset_code}/{self.counter_asset_code}"
+
+    def start(self):
+        """Start consuming the stream in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name=f"TradeStream-{self.account_id or f'{self.base_asset_code}/{self.counter_asset_code}'}",
+                                        daemon=True)
+        self._thread.start()
+        logging.info(f"Started trade stream for {self.name} from cursor {self.cursor}")
+
+    def stop(self):
+        """Stop the stream thread, shutting down its connection."""
+        self._stop_event.set()
+        stream_socket = self._socket
+        if stream_socket is not None:
+            # Closing the connection would wait on the thread's blocked read; a socket shutdown ends that read instead
+            try:
+                stream_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        logging.info(f"Stopped trade stream for {self.name}")
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def drain(self) -> list[dict]:
+        """
+        Take all trades received since the last call.
+
+        Returns:
+        - List of trade dictionaries, newest first (same order as load_last_trade_list)
+        """
+        trade_list = []
+        while True:
+            try:
+                trade_list.append(self._trades.get_nowait())
+            except queue.Empty:
+                break
+
+        if trade_list and not self.account_id:
+            # Write through to the local trade store
+            get_trade_store().append(self.base_asset_code, self.counter_asset_code, trade_list,
+                                     after_cursor=self.drained_cursor if self.drained_cursor != "now" else None)
+        if trade_list:
+            self.drained_cursor = trade_list[-1]['paging_token']
+        trade_list.reverse()
+        return trade_list
+
+    def _request(self) -> tuple[str, dict]:
+        """
+        Returns:
+        - Tuple of (URL, query parameters) of the Horizon trades endpoint to stream
+        """
+        if self.account_id:
+            return f"{self.horizon_url}/accounts/{self.account_id}/trades", {}
+        params = {}
+        for prefix, asset in (('base', get_asset(self.base_asset_code)), ('counter', get_asset(self.counter_asset_code))):
+            params[f'{prefix}_asset_type'] = asset.type
+            if not asset.is_native():
+                params[f'{prefix}_asset_code'] = asset.code
+                params[f'{prefix}_asset_issuer'] = asset.issuer
+        return f"{self.horizon_url}/trades", params
+
+    def _connect(self, url: str) -> http.client.HTTPConnection:
+        """
+        Open a connection to the host of a URL and keep its socket, so stop() can shut it down.
+
+        Parameters:
+        - url: URL to be requested on the connection
+
+        Returns:
+        - Connected HTTP(S) connection, with a read timeout of 60 seconds
+        """
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=10)
+        connection.connect()
+        connection.sock.settimeout(60)
+        self._socket = connection.sock
+        return connection
+
+    def _read_events(self, response: http.client.HTTPResponse):
+        """Yield the JSON data of the server-sent events of a response, without Horizon's hello/byebye messages."""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        data_lines = []
+        while True:
+            # read1 returns what has arrived so far, so an event is handled as soon as it is complete
+            chunk = response.read1(8192)
+            if not chunk:
+                return
+            buffer += decoder.decode(chunk).replace('\r\n', '\n')
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                if line:
+                    if line.startswith('data:'):
+                        data_lines.append(line[5:].strip())
+                    continue
+                # A blank line ends an event
+                data = '\n'.join(data_lines)
+                data_lines = []
+                if data and data not in ('"hello"', '"byebye"'):
+                    yield json.loads(data)
+
+    def _run(self):
+        url, params = self._request()
+        backoff = self.min_backoff
+
+        while not self._stop_event.is_set():
+            connection = None
+            try:
+                connection = self._connect(url)
+                if self._stop_event.is_set():
+                    break
+                parts = urlsplit(url)
+                connection.request('GET', f"{parts.path}?{urlencode({**params, 'cursor': self.cursor})}",
+                                   headers={'Accept': 'text/event-stream', 'Accept-Encoding': 'identity'})
+                response = connection.getresponse()
+                if response.status != 200:
+                    raise ConnectionError(f"HTTP {response.status} {response.reason}")
+                for trade in self._read_events(response):
+                    if self._stop_event.is_set():
+                        break
+                    if self.cursor != "now" and paging_token_key(trade['paging_token']) <= paging_token_key(self.cursor):
+                        continue  # Already delivered before a reconnect
+                    self._trades.put(trade)
+                    self.cursor = trade['paging_token']
+                    backoff = self.min_backoff
+                # The server ended the stream, reconnect from the cursor
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                if isinstance(e, TimeoutError):
+                    continue  # Nothing came in for a while, reconnect right away
+                logging.warning(f"Trade stream for {self.name} disconnected: {e}. "
+                                f"Reconnecting in {backoff:.1f}s from cursor {self.cursor}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                self._socket = None
+                if connection is not None:
+                    connection.close()
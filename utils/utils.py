@@ -12,6 +12,20 @@ def load_config(config_path):
     return config
 
 
+def paging_token_key(paging_token: str) -> tuple[int, int]:
+    """
+    Convert a trade paging_token (e.g. "107449468780019713-0") into a sortable key.
+
+    Parameters:
+    - paging_token: Paging token of a trade record
+
+    Returns:
+    - Tuple (operation id, index) that orders trades the same way Horizon does
+    """
+    operation_id, _, index = paging_token.partition('-')
+    return int(operation_id), int(index or 0)
+
+
 def get_usdc_price_and_change():
     try:
         url = f"https://api.coingecko.com/api/v3/simple/price?ids=usd-coin&vs_currencies=usd&include_24hr_change=true"